@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+import carga_datos
+from esquemas import CONTADORES_MIXPANEL
+
+ARCHIVO_MIXPANEL = "mixpanel_applicants_collapsed.csv"
+
+# Dimensiones por las que se materializa el cubo
+DIMENSIONES = ("email", "area_id", "cuadricula_id", "km8_id")
+COLUMNAS_CUBO = ["user", *DIMENSIONES, *CONTADORES_MIXPANEL]
+
+
+# Cubo de agregados de Mixpanel: sumas de cada columna de evento a nivel
+# global y por email, área, cuadrícula y km8. Las tablas por dimensión son
+# None cuando el archivo no trae esa columna.
+@dataclass(frozen=True)
+class CuboMixpanel:
+    version: str
+    eventos: tuple
+    totales: pd.Series
+    usuarios: pd.Index
+    por_email: pd.DataFrame
+    por_area: pd.DataFrame
+    por_cuadricula: pd.DataFrame
+    por_km8: pd.DataFrame
+
+    # Total de un conjunto de eventos, sumando sobre las columnas
+    def total(self, columnas):
+        return self.totales[list(columnas)].sum()
+
+    # Actividad (suma de eventos) por valor de una dimensión, de mayor a menor
+    # (los empates quedan ordenados por el valor de la dimensión)
+    def actividad(self, tabla, columnas):
+        actividad = tabla[list(columnas)].sum(axis=1).sort_index(kind="stable")
+        return actividad.sort_values(ascending=False, kind="stable")
+
+
+def construir_cubo(df, version=""):
+    eventos = tuple(c for c in CONTADORES_MIXPANEL if c in df.columns)
+    eventos_cols = list(eventos)
+
+    def agrupar(dimension):
+        if dimension not in df.columns:
+            return None
+        return df.groupby(dimension)[eventos_cols].sum()
+
+    return CuboMixpanel(
+        version=version,
+        eventos=eventos,
+        totales=df[eventos_cols].sum(),
+        usuarios=pd.Index(df["user"].dropna().unique()),
+        por_email=agrupar("email"),
+        por_area=agrupar("area_id"),
+        por_cuadricula=agrupar("cuadricula_id"),
+        por_km8=agrupar("km8_id"),
+    )
+
+
+# Cubo de la versión actual del archivo de Mixpanel (se construye una vez por versión)
+def cubo_mixpanel():
+    def construir():
+        df = carga_datos.leer_entrada(ARCHIVO_MIXPANEL, COLUMNAS_CUBO)
+        return construir_cubo(df, carga_datos.version_servida([ARCHIVO_MIXPANEL])[0])
+
+    return carga_datos.calcular_derivado("cubo_mixpanel", [ARCHIVO_MIXPANEL], construir)
+
+
+# Actividad del cubo por email o por área (CuboMixpanel.actividad) para esas
+# columnas, calculada una vez por versión del archivo y no en cada rerun
+def actividad_mixpanel(dimension, columnas):
+    def calcular():
+        cubo = cubo_mixpanel()
+        tabla = getattr(cubo, f"por_{dimension}")
+        return None if tabla is None else cubo.actividad(tabla, columnas)
+
+    return carga_datos.calcular_derivado(("uso", dimension, tuple(columnas)), [ARCHIVO_MIXPANEL], calcular)
@@ -0,0 +1,181 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import carga_datos
+import consultas
+import datos_sinteticos
+import figuras
+import metricas
+import paralelo
+import refresco
+import series_tiempo
+import validacion
+
+# Benchmark de las secciones del dashboard como funciones sin Streamlit.
+# Mide tiempo y memoria máxima (tracemalloc) de cada etapa:
+#
+#     python benchmark.py                                  # inputs/ del repo
+#     python benchmark.py --datos /tmp/sinteticos          # datos generados antes
+#     python benchmark.py --generar 1000000 --eventos 5000000
+#     python benchmark.py --backend duckdb --json resultado.json
+#
+# La etapa "carga" parte con la caché vacía; las demás parten con los archivos
+# ya cargados y sin resultados derivados, así miden solo su propio cálculo.
+
+
+def etapa_carga(backend):
+    for nombre in carga_datos.ARCHIVOS_ENTRADA:
+        carga_datos.leer_entrada(nombre)
+
+
+# Validación de encabezado, muestra y claves de cada entrada (sin la memoria
+# por versión, ver validacion.py)
+def etapa_validacion(backend):
+    for ruta, huella in carga_datos.huellas_actuales().items():
+        validacion.validar_archivo(ruta.name, ruta, huella[3])
+
+
+# Versión completa de los datos como la arma el refresco, con la precarga en
+# paralelo (JARDINES_PROCESOS procesos; ver paralelo.py)
+def etapa_precarga(backend):
+    carga_datos.construir_version(refresco.precalentar, paralelo.precargar)
+
+
+def etapa_notas(backend):
+    usuarios, total, correos, sedes = backend.opciones_notas()
+    filtros = [(None, None, None), (None, None, "llamada")]
+    if correos:
+        filtros.append((correos[len(correos) // 2], None, None))
+    if sedes:
+        filtros.append((None, list(sedes)[len(sedes) // 2], None))
+    for correo, sede, texto in filtros:
+        backend.contar_notas(correo, sede, texto)
+        backend.pagina_notas(correo, sede, texto, 1, 50)
+
+
+def etapa_agregados_uso(backend):
+    metricas.seccion_uso(backend)
+
+
+def etapa_exploracion(backend):
+    metricas.seccion_exploracion()
+
+
+def etapa_favoritos(backend):
+    metricas.seccion_favoritos(backend)
+    metricas.seccion_historial_favoritos()
+
+
+def etapa_rotacion(backend):
+    metricas.seccion_rotacion()
+
+
+def etapa_series(backend):
+    for fuente in metricas.FUENTES_SERIES.values():
+        metricas.seccion_series(fuente, "hora", "area_id")
+    metricas.seccion_cohortes()
+
+
+def etapa_mapa(backend):
+    import plotly.express as px
+
+    df = metricas.mapa_favoritos()
+    figura = px.scatter_mapbox(df, lat="lat", lon="lng", size="total_favorites",
+                               color="total_favorites", hover_name="celda", zoom=10)
+    return len(figura.to_json())
+
+
+# Serie horaria completa por área como figura compactada, como en la app
+# (figuras.py: las áreas con más eventos y el resto en "Otros")
+def etapa_figuras(backend):
+    import plotly.express as px
+
+    serie = metricas.seccion_series("favoritos", "hora", "area_id")
+    serie = figuras.top_n_grupos(serie, "area_id", ["agregados", "removidos"])
+    serie = series_tiempo.completar_periodos(serie, "favoritos", "hora", ["area_id"])
+    larga = serie.melt(id_vars=["periodo", "area_id"], value_vars=["agregados", "removidos"],
+                       var_name="evento", value_name="eventos")
+    figura = figuras.compactar(px.line(larga, x="periodo", y="eventos", color="area_id", line_dash="evento"))
+    return len(figura.to_json())
+
+
+ETAPAS = {
+    "validacion": etapa_validacion,
+    "carga": etapa_carga,
+    "notas": etapa_notas,
+    "agregados_uso": etapa_agregados_uso,
+    "exploracion": etapa_exploracion,
+    "favoritos": etapa_favoritos,
+    "mapa": etapa_mapa,
+    "rotacion": etapa_rotacion,
+    "series": etapa_series,
+    "figuras": etapa_figuras,
+    "precarga": etapa_precarga,
+}
+
+
+# Ejecutar una etapa y medir tiempo (s) y memoria máxima (MB)
+def medir(nombre, funcion, backend, memoria=True):
+    if memoria:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    funcion(backend)
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return {"etapa": nombre, "segundos": round(segundos, 4),
+            "pico_mb": None if pico is None else round(pico, 1)}
+
+
+def ejecutar(nombre_backend="pandas", etapas=None, memoria=True):
+    backend = consultas.ConsultasDuckDB() if nombre_backend == "duckdb" else consultas.ConsultasPandas()
+    resultados = []
+    carga_datos.limpiar_cache()
+    for nombre in etapas or ETAPAS:
+        carga_datos.limpiar_derivados()
+        series_tiempo.limpiar()
+        resultados.append(medir(nombre, ETAPAS[nombre], backend, memoria))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las secciones del dashboard")
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    parser.add_argument("--generar", type=int, metavar="APLICANTES",
+                        help="generar datos sintéticos con este número de postulantes")
+    parser.add_argument("--eventos", type=int, default=None)
+    parser.add_argument("--backend", choices=["pandas", "duckdb"], default="pandas")
+    parser.add_argument("--etapas", nargs="*", choices=list(ETAPAS))
+    parser.add_argument("--sin-memoria", action="store_true", help="no medir memoria (más rápido)")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    carpeta = args.datos
+    if args.generar:
+        carpeta = carpeta or tempfile.mkdtemp(prefix="jardines_bench_")
+        datos_sinteticos.generar(carpeta, args.generar, args.eventos)
+    if carpeta:
+        carga_datos.usar_carpeta_entradas(carpeta)
+
+    resultados = ejecutar(args.backend, args.etapas, memoria=not args.sin_memoria)
+
+    print(f"{'etapa':<16}{'segundos':>10}{'pico MB':>10}")
+    for r in resultados:
+        pico = "-" if r["pico_mb"] is None else f"{r['pico_mb']:.1f}"
+        print(f"{r['etapa']:<16}{r['segundos']:>10.3f}{pico:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "datos": str(carga_datos.BASE_PATH_INPUTS),
+                       "etapas": resultados}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+import contextlib
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import compartido
+import esquemas
+import instrumentacion
+import snapshots
+import validacion
+
+# Configuración de rutas
+BASE_PATH = Path(__file__).parent.resolve()
+BASE_PATH_INPUTS = BASE_PATH / "inputs"
+# Estado persistente de la ingesta incremental
+BASE_PATH_ALMACEN = BASE_PATH_INPUTS / "almacen"
+
+# Archivos de entrada que consume el dashboard
+ARCHIVOS_ENTRADA = (
+    "mongo_applicants_merged.csv",
+    "mixpanel_applicants_collapsed.csv",
+    "explored_campus_collapsed.csv",
+    "favorite_collapsed.csv",
+    "favorite.csv",
+    "favorite_campus_history.csv",
+)
+
+# Caché compartida por todo el proceso (todas las sesiones de Streamlit).
+# frames: (ruta, columnas) -> (hash del contenido, DataFrame)
+# derivados: clave -> (hashes de las entradas, resultado)
+# fijadas: ruta -> huella. Si no es None, la caché sirve esa versión de las
+# entradas sin mirar los archivos (la publica refresco.py en segundo plano).
+class _Cache:
+    def __init__(self, fijadas=None):
+        self.frames = {}
+        self.derivados = {}
+        self.fijadas = fijadas
+        self.locks = {}
+
+
+# _hashes: ruta -> ((mtime_ns, tamaño), hash del contenido); depende solo del
+# archivo, así que se comparte entre versiones de la caché
+_hashes = {}
+_publicada = _Cache()
+_lock_global = threading.Lock()
+# Caché en construcción del hilo actual (ver construir_version)
+_local = threading.local()
+
+
+def _cache():
+    return getattr(_local, "cache", None) or _publicada
+
+
+def _lock_de(clave):
+    cache = _cache()
+    with _lock_global:
+        return cache.locks.setdefault(clave, threading.Lock())
+
+
+def _hash_contenido(ruta):
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def ruta_entrada(nombre):
+    return BASE_PATH_INPUTS / nombre
+
+
+# Huella de un archivo: (ruta, mtime, tamaño, hash del contenido).
+# El hash solo se recalcula cuando cambia el mtime o el tamaño, así que en un
+# rerun normal el costo es un stat().
+def huella_archivo(ruta):
+    ruta = Path(ruta)
+    info = ruta.stat()
+    firma = (info.st_mtime_ns, info.st_size)
+    previo = _hashes.get(ruta)
+    if previo is None or previo[0] != firma:
+        instrumentacion.fallo("huellas")
+        with instrumentacion.medir(f"hash.{ruta.name}"):
+            previo = (firma, _hash_contenido(ruta))
+        _hashes[ruta] = previo
+    else:
+        instrumentacion.acierto("huellas")
+    return (str(ruta), info.st_mtime_ns, info.st_size, previo[1])
+
+
+# Huella de la versión que se está sirviendo: la fijada en la caché si la hay,
+# si no la del archivo actual
+def huella_servida(ruta):
+    fijadas = _cache().fijadas
+    if fijadas is not None and Path(ruta) in fijadas:
+        return fijadas[Path(ruta)]
+    return huella_archivo(ruta)
+
+
+# La versión servida de una entrada ya no está en disco: el CSV cambió después
+# de fijarla y no hay snapshot ni frame compartido con ese hash. No se lee el
+# archivo nuevo en su lugar (mezclaría versiones y se saltaría la validación);
+# refresco.py publica la versión nueva en su siguiente vuelta.
+class VersionNoDisponible(RuntimeError):
+    def __init__(self, ruta, hash_csv):
+        super().__init__(f"{Path(ruta).name} cambió desde la versión que se está sirviendo; "
+                         "los datos nuevos se publican en el próximo refresco")
+        self.ruta = ruta
+        self.hash_csv = hash_csv
+
+
+# Ruta del CSV de una entrada, comprobando que su contenido sea el de la
+# versión servida (o el del hash dado)
+def ruta_lectura(nombre, hash_csv=None):
+    ruta = ruta_entrada(nombre)
+    if hash_csv is None:
+        hash_csv = huella_servida(ruta)[3]
+    if huella_archivo(ruta)[3] != hash_csv:
+        raise VersionNoDisponible(ruta, hash_csv)
+    return ruta
+
+
+# Columnas de una entrada en la versión servida, sin leer los datos
+def columnas_entrada(nombre):
+    ruta = ruta_entrada(nombre)
+    hash_csv = huella_servida(ruta)[3]
+    columnas = snapshots.columnas_snapshot(ruta, hash_csv)
+    if columnas is None:
+        columnas = list(pd.read_csv(ruta_lectura(nombre, hash_csv), nrows=0).columns)
+    return columnas
+
+
+# Leer un CSV aplicando los tipos declarados en esquemas.py.
+# Con columnas, solo se parsean esas (las que no existan en el archivo se ignoran).
+# Solo se lee la versión servida: si el archivo cambia antes o durante la
+# lectura se lanza VersionNoDisponible.
+def leer_csv_tipado(nombre, columnas=None, hash_csv=None):
+    if hash_csv is None:
+        hash_csv = huella_servida(ruta_entrada(nombre))[3]
+    ruta = ruta_lectura(nombre, hash_csv)
+    usecols = None
+    if columnas is not None:
+        seleccion = set(columnas)
+        usecols = lambda c: c in seleccion
+    df = pd.read_csv(ruta, usecols=usecols, dtype=esquemas.tipos_lectura(nombre, columnas))
+    ruta_lectura(nombre, hash_csv)
+    return esquemas.aplicar_esquema(df, nombre)
+
+
+# Leer un CSV por bloques, con los tipos declarados, sin cargarlo completo en
+# memoria. Como leer_csv_tipado, el último bloque sale después de comprobar que
+# el archivo no cambió mientras se leía.
+def leer_por_bloques(nombre, columnas=None, filas_por_bloque=100_000):
+    hash_csv = huella_servida(ruta_entrada(nombre))[3]
+    ruta = ruta_lectura(nombre, hash_csv)
+    usecols = None
+    if columnas is not None:
+        seleccion = set(columnas)
+        usecols = lambda c: c in seleccion
+    lector = pd.read_csv(ruta, usecols=usecols, dtype=esquemas.tipos_lectura(nombre, columnas),
+                         chunksize=filas_por_bloque)
+    with lector:
+        anterior = None
+        for bloque in lector:
+            if anterior is not None:
+                yield anterior
+            anterior = esquemas.aplicar_esquema(bloque, nombre)
+    ruta_lectura(nombre, hash_csv)
+    if anterior is not None:
+        yield anterior
+
+
+# Frame tipado y compactado de un archivo en la versión hash_csv: el snapshot
+# Parquet de ese hash si existe; si no, el CSV, solo si sigue siendo esa versión
+def _cargar(nombre, ruta, hash_csv, columnas):
+    df = snapshots.leer_snapshot(ruta, hash_csv, columnas)
+    if df is None:
+        df = leer_csv_tipado(nombre, columnas, hash_csv)
+    else:
+        df = esquemas.aplicar_esquema(df, nombre)
+    return esquemas.compactar(df, nombre)
+
+
+# Igual que _cargar, pero a través del frame compartido entre procesos
+# (compartido.py): el primer proceso lo escribe y todos lo abren con memory map.
+# Al escribir no se borran las versiones que este proceso sirve o construye.
+def _cargar_compartido(nombre, ruta, hash_csv, columnas):
+    df = compartido.leer_compartido(ruta, hash_csv, columnas)
+    if df is None:
+        fijados = {c.fijadas[ruta][3] for c in (_publicada, _cache()) if c.fijadas and ruta in c.fijadas}
+        compartido.escribir_compartido(ruta, hash_csv, _cargar(nombre, ruta, hash_csv, None), fijados)
+        df = compartido.leer_compartido(ruta, hash_csv, columnas)
+    return df
+
+
+# Leer un archivo de inputs/ una sola vez por cambio real de contenido.
+# El frame (tipado y compactado, ver esquemas.compactar) se guarda una sola vez
+# por proceso y se comparte entre todas las sesiones: cada llamada devuelve una
+# vista sin copia, y con copy-on-write lo que una sesión modifique en su vista
+# no alcanza al frame compartido.
+def leer_entrada(nombre, columnas=None):
+    ruta = ruta_entrada(nombre)
+    clave = (ruta, tuple(columnas) if columnas is not None else None)
+    cache = _cache()
+    with _lock_de(clave):
+        huella = huella_servida(ruta)
+        en_cache = cache.frames.get(clave)
+        if en_cache is None or en_cache[0] != huella[3]:
+            instrumentacion.fallo("frames")
+            # Un archivo que no cumple su esquema no se carga (validacion.py)
+            validacion.exigir_valida(nombre, ruta, huella[3])
+            cargar = _cargar_compartido if compartido.activo() else _cargar
+            inicio = time.perf_counter()
+            df = cargar(nombre, ruta, huella[3], columnas)
+            instrumentacion.registrar_tiempo(f"carga.{nombre}", time.perf_counter() - inicio,
+                                             int(df.memory_usage(deep=True).sum()))
+            en_cache = (huella[3], df)
+            cache.frames[clave] = en_cache
+        else:
+            instrumentacion.acierto("frames")
+        return en_cache[1].copy(deep=False)
+
+
+# Versión de datos de un conjunto de entradas: tupla con sus hashes de contenido
+def version_entradas(nombres):
+    return tuple(huella_archivo(ruta_entrada(n))[3] for n in nombres)
+
+
+# Versión de las entradas que se está sirviendo (ver huella_servida)
+def version_servida(nombres):
+    return tuple(huella_servida(ruta_entrada(n))[3] for n in nombres)
+
+
+# Calcular un resultado derivado de una o más entradas una sola vez por
+# versión de datos. funcion() se vuelve a llamar solo si cambia alguna entrada.
+def calcular_derivado(clave, nombres, funcion):
+    cache = _cache()
+    with _lock_de(("derivado", clave)):
+        version = version_servida(nombres)
+        en_cache = cache.derivados.get(clave)
+        if en_cache is not None and en_cache[0] == version:
+            instrumentacion.acierto("derivados")
+            return en_cache[1]
+        instrumentacion.fallo("derivados")
+        with instrumentacion.medir(f"derivado.{clave[0] if isinstance(clave, tuple) else clave}"):
+            resultado = funcion()
+        cache.derivados[clave] = (version, resultado)
+        return resultado
+
+
+# Huellas actuales de las entradas que existen
+def huellas_actuales():
+    fijadas = {}
+    for nombre in ARCHIVOS_ENTRADA:
+        ruta = ruta_entrada(nombre)
+        if ruta.exists():
+            fijadas[ruta] = huella_archivo(ruta)
+    return fijadas
+
+
+# Construir una versión nueva de la caché sin tocar la que se sirve: fija las
+# huellas actuales de las entradas (o las dadas) y ejecuta precalentar() en
+# este hilo, que lee y calcula sobre la caché nueva. Los lectores siguen usando
+# la publicada (y sus locks) mientras tanto.
+#
+# precarga(fijadas), si se da, devuelve pares (frames, derivados) ya
+# calculados en otros procesos para esas mismas huellas (ver paralelo.py); se
+# incorporan antes de precalentar(), que entonces solo calcula lo que falte.
+def construir_version(precalentar, precarga=None, fijadas=None):
+    if fijadas is None:
+        fijadas = huellas_actuales()
+    nueva = _Cache(fijadas)
+    if precarga is not None:
+        for frames, derivados in precarga(fijadas):
+            nueva.frames.update(frames)
+            nueva.derivados.update(derivados)
+    with _usando(nueva):
+        precalentar()
+    return nueva
+
+
+@contextlib.contextmanager
+def _usando(cache):
+    previa = getattr(_local, "cache", None)
+    _local.cache = cache
+    try:
+        yield cache
+    finally:
+        _local.cache = previa
+
+
+# Leer y calcular en este hilo sobre una caché aparte con estas huellas (por
+# defecto las actuales), sin publicarla: para trabajos como la ingesta, que
+# escriben resultados rotulados con la versión de las entradas que leyeron
+def usando_version(fijadas=None):
+    return _usando(_Cache(huellas_actuales() if fijadas is None else fijadas))
+
+
+# Publicar una versión construida: una sola asignación, así cada lectura ve la
+# versión anterior completa o la nueva completa
+def publicar_version(cache):
+    global _publicada
+    _publicada = cache
+
+
+# Huellas de la versión publicada (None si se sirven los archivos actuales)
+def version_publicada():
+    return _publicada.fijadas
+
+
+# Vaciar la caché completa (vuelve a servir los archivos actuales)
+def limpiar_cache():
+    global _publicada
+    with _lock_global:
+        _hashes.clear()
+        _publicada = _Cache()
+
+
+# Vaciar solo los resultados derivados (los archivos siguen cacheados)
+def limpiar_derivados():
+    with _lock_global:
+        _publicada.derivados.clear()
+
+
+# Cambiar la carpeta de entradas (benchmarks o jobs sobre otros datos)
+def usar_carpeta_entradas(carpeta):
+    global BASE_PATH_INPUTS, BASE_PATH_ALMACEN
+    BASE_PATH_INPUTS = Path(carpeta).resolve()
+    BASE_PATH_ALMACEN = BASE_PATH_INPUTS / "almacen"
+    limpiar_cache()
+
+
+# Memoria (bytes) de los frames en la caché publicada, por archivo
+def memoria_residente():
+    memoria = {}
+    for (ruta, _columnas), (_hash, df) in list(_publicada.frames.items()):
+        nombre = Path(ruta).name
+        memoria[nombre] = memoria.get(nombre, 0) + int(df.memory_usage(deep=True).sum())
+    return memoria
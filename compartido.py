@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Frames compartidos entre procesos: con JARDINES_COMPARTIDO=1, cada archivo de
+# inputs/ ya tipado y compactado se guarda una vez como Arrow IPC sin
+# comprimir (inputs/compartido/<archivo>-<hash>.arrow) y cada proceso lo abre
+# con memory map. Los buffers viven en el page cache del sistema operativo, así
+# que varios workers de Streamlit comparten la misma memoria para los datos.
+VARIABLE_COMPARTIDO = "JARDINES_COMPARTIDO"
+CARPETA_COMPARTIDO = "compartido"
+# Versiones de cada CSV que se conservan además de las fijadas en este proceso:
+# otros workers pueden seguir sirviendo una versión anterior hasta su refresco
+MAXIMO_VERSIONES = 3
+
+
+def activo():
+    return os.environ.get(VARIABLE_COMPARTIDO, "") == "1"
+
+
+def ruta_compartida(ruta_csv, hash_csv):
+    ruta_csv = Path(ruta_csv)
+    return ruta_csv.parent / CARPETA_COMPARTIDO / f"{ruta_csv.stem}-{hash_csv}.arrow"
+
+
+# Texto como pd.StringDtype("pyarrow"): el frame apunta a los buffers Arrow
+# en vez de copiarlos a objetos de Python
+def _tipo_pandas(tipo):
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+# Abrir (memory map) el frame compartido de esta versión del CSV; None si no existe.
+# La proyección de columnas no copia datos, y al pasar a pandas quedan sin
+# copia las columnas numéricas y de texto; las categóricas sí copian sus
+# códigos (enteros pequeños), no las categorías.
+def leer_compartido(ruta_csv, hash_csv, columnas=None):
+    ruta = ruta_compartida(ruta_csv, hash_csv)
+    if not ruta.exists():
+        return None
+    tabla = ipc.open_file(pa.memory_map(str(ruta), "r")).read_all()
+    if columnas is not None:
+        tabla = tabla.select([c for c in columnas if c in tabla.column_names])
+    return tabla.to_pandas(split_blocks=True, types_mapper=_tipo_pandas)
+
+
+# Escribir el frame compartido (archivo temporal + os.replace) y borrar los de
+# versiones anteriores del mismo CSV, salvo las de conservar (hashes fijados
+# por este proceso) y las MAXIMO_VERSIONES más recientes
+def escribir_compartido(ruta_csv, hash_csv, df, conservar=()):
+    ruta = ruta_compartida(ruta_csv, hash_csv)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    temporal = ruta.with_suffix(f".arrow.{os.getpid()}.tmp")
+    with pa.OSFile(str(temporal), "wb") as salida, ipc.new_file(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    os.replace(temporal, ruta)
+    _podar(ruta_csv, {hash_csv, *conservar})
+    return ruta
+
+
+def _podar(ruta_csv, conservar):
+    carpeta = ruta_compartida(ruta_csv, "").parent
+    versiones = []
+    for archivo in carpeta.glob(f"{Path(ruta_csv).stem}-*.arrow"):
+        try:
+            versiones.append((archivo.stat().st_mtime_ns, archivo))
+        except FileNotFoundError:
+            continue
+    versiones.sort(reverse=True)
+    for _mtime, archivo in versiones[MAXIMO_VERSIONES:]:
+        if archivo.stem.rsplit("-", 1)[1] not in conservar:
+            archivo.unlink(missing_ok=True)
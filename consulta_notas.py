@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import carga_datos
+import texto_notas
+
+ARCHIVO_NOTAS = "mongo_applicants_merged.csv"
+
+# Columnas de la tabla de notas y su nombre para mostrar
+COLUMNAS_NOTAS = {
+    'timestamp': 'Fecha',
+    'user': 'Usuario',
+    'email': 'Correo',
+    'data': 'Nota',
+    'campus_name': 'Nombre sede',
+    'campusId': 'campus_code',
+}
+
+
+# Índice de notas: la tabla ya ordenada por fecha (más reciente primero) y,
+# por correo y por sede, las posiciones de sus filas en ese orden; el texto de
+# las notas con su índice invertido por palabra (texto_notas.IndiceTexto).
+@dataclass(frozen=True)
+class IndiceNotas:
+    notas: pd.DataFrame
+    texto: texto_notas.IndiceTexto
+    por_correo: dict
+    por_sede: dict
+    correos: list
+    sedes: dict
+    usuarios_unicos: int
+
+    @property
+    def total_notas(self):
+        return len(self.notas)
+
+    # Posiciones (en orden de fecha) que cumplen los filtros
+    def posiciones(self, correo=None, sede=None, texto=None):
+        posiciones = None
+        for indice, valor in ((self.por_correo, correo), (self.por_sede, sede)):
+            if valor is None:
+                continue
+            filas = indice.get(valor, np.empty(0, dtype=np.intp))
+            posiciones = filas if posiciones is None else np.intersect1d(posiciones, filas, assume_unique=True)
+        if texto:
+            return self.texto.buscar(texto, posiciones)
+        if posiciones is None:
+            posiciones = np.arange(len(self.notas))
+        return posiciones
+
+    # Filas de una página dentro de las posiciones filtradas (las columnas
+    # categóricas del índice se entregan como texto)
+    def pagina(self, posiciones, pagina=1, tamaño_pagina=50):
+        inicio = (max(pagina, 1) - 1) * tamaño_pagina
+        filas = self.notas.iloc[posiciones[inicio:inicio + tamaño_pagina]]
+        categoricas = {c: "string" for c, t in filas.dtypes.items() if isinstance(t, pd.CategoricalDtype)}
+        return filas.astype(categoricas) if categoricas else filas
+
+    # Una página de resultados y el total de filas que cumplen los filtros
+    def consultar(self, correo=None, sede=None, texto=None, pagina=1, tamaño_pagina=50):
+        posiciones = self.posiciones(correo, sede, texto)
+        return self.pagina(posiciones, pagina, tamaño_pagina), len(posiciones)
+
+
+# payloads: la columna data ya parseada (texto_notas.parsear_payloads, con el
+# índice de df); si no se da, se parsea acá. La nota se muestra con su
+# contenido y las demás claves del payload como columnas adicionales.
+def construir_indice(df, payloads=None):
+    if payloads is None:
+        payloads = texto_notas.parsear_payloads(df['data'])
+    # Solo las filas que tienen email (excluir None, NaN, vacíos)
+    df_con_email = df.dropna(subset=['email'])
+    payloads = payloads.loc[df_con_email.index]
+    extras = {c: payloads[c].astype('string') for c in payloads.columns if c != texto_notas.CLAVE_CONTENIDO}
+    notas = (
+        df_con_email[list(COLUMNAS_NOTAS)]
+        .assign(data=payloads[texto_notas.CLAVE_CONTENIDO], **extras)
+        .rename(columns=COLUMNAS_NOTAS)
+        .sort_values('Fecha', ascending=False, kind='stable')
+        .reset_index(drop=True)
+    )
+    # Nombre de cada sede (el de su nota más reciente), ordenadas por nombre
+    sedes = notas[['campus_code', 'Nombre sede']].dropna(subset=['campus_code']).drop_duplicates('campus_code')
+    nombres_sedes = sedes['Nombre sede'].astype('string').fillna(sedes['campus_code'].astype('string'))
+    return IndiceNotas(
+        notas=notas,
+        texto=texto_notas.IndiceTexto(notas['Nota']),
+        por_correo=notas.groupby('Correo', sort=False).indices,
+        por_sede=notas.groupby('campus_code', sort=False).indices,
+        correos=sorted(notas['Correo'].dropna().unique()),
+        sedes=dict(sorted(zip(sedes['campus_code'], nombres_sedes), key=lambda sede: (sede[1], sede[0]))),
+        usuarios_unicos=df_con_email['user'].nunique(),
+    )
+
+
+# Payloads de la columna data parseados (una vez por versión del export)
+def payloads_notas():
+    return carga_datos.calcular_derivado(
+        "payloads_notas", [ARCHIVO_NOTAS],
+        lambda: texto_notas.parsear_payloads(carga_datos.leer_entrada(ARCHIVO_NOTAS, ['data'])['data']),
+    )
+
+
+# Índice de la versión actual del export de notas
+def indice_notas():
+    return carga_datos.calcular_derivado(
+        "indice_notas", [ARCHIVO_NOTAS],
+        lambda: construir_indice(carga_datos.leer_entrada(ARCHIVO_NOTAS, list(COLUMNAS_NOTAS)),
+                                 payloads_notas()),
+    )
@@ -0,0 +1,359 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+
+import agregados
+import carga_datos
+import consulta_notas
+import esquemas
+import instrumentacion
+import snapshots
+import texto_notas
+
+logger = logging.getLogger(__name__)
+
+# Backend de consultas del dashboard: "pandas" (por defecto) o "duckdb".
+# Se elige con la variable de entorno JARDINES_BACKEND; si duckdb no está
+# instalado se usa pandas. Ambos devuelven exactamente los mismos resultados.
+VARIABLE_BACKEND = "JARDINES_BACKEND"
+
+ARCHIVO_FAVORITOS_COLAPSADO = "favorite_collapsed.csv"
+
+# Conjuntos de eventos que usa la pestaña de estadísticas
+COLUMNAS_INTERACCIONES = ['click_dashboard_menu', 'click_reg_user-log-in_log-in-button',
+                          'click_school_pin', 'open_school_profile', 'favorite_school_from_list']
+COLUMNAS_COMPORTAMIENTO = ['click_dashboard_menu', 'click_reg_user-log-in_log-in-button', 'click_school_pin',
+                           'open_school_profile', 'close_school_profile', 'favorite_school_from_list',
+                           'remove_favorite_school_from_list', 'login', 'map_filter_click', 'map_grade_click']
+COLUMNAS_ACTIVIDAD = ['click_dashboard_menu', 'click_school_pin', 'open_school_profile', 'favorite_school_from_list']
+COLUMNAS_CONTENIDO = ['sp_school_leadership', 'sp_school_performance', 'sp_school_photo',
+                      'sp_school_price', 'sp_school_programs', 'sp_school_students']
+
+# Rangos de la distribución de favoritos (intervalos (a, b] como pd.cut)
+BINS_FAVORITOS = [0, 5, 10, 20, 30, 50, 100]
+LABELS_FAVORITOS = ['0-5', '6-10', '11-20', '21-30', '31-50', '50+']
+
+
+# Medir cada consulta pública del backend (instrumentacion.py)
+def _instrumentar(clase):
+    for nombre, metodo in list(vars(clase).items()):
+        if callable(metodo) and not nombre.startswith("_"):
+            setattr(clase, nombre, instrumentacion.medido(f"{clase.nombre}.{nombre}")(metodo))
+    return clase
+
+
+@_instrumentar
+class ConsultasPandas:
+    nombre = "pandas"
+
+    # indice_notas: función que devuelve el índice de notas vigente (por defecto
+    # el de inputs/; precalculados.py pasa el del paquete de resultados)
+    def __init__(self, indice_notas=None):
+        self._indice_notas = indice_notas or consulta_notas.indice_notas
+        self._ultima_busqueda = None
+
+    # --- Notas ---
+    def opciones_notas(self):
+        indice = self._indice_notas()
+        return indice.usuarios_unicos, indice.total_notas, indice.correos, indice.sedes
+
+    def _posiciones(self, correo, sede, texto):
+        indice = self._indice_notas()
+        clave = (id(indice), correo, sede, texto)
+        ultima = self._ultima_busqueda
+        if ultima is not None and ultima[0] == clave:
+            return indice, ultima[1]
+        posiciones = indice.posiciones(correo, sede, texto)
+        self._ultima_busqueda = (clave, posiciones)
+        return indice, posiciones
+
+    def contar_notas(self, correo=None, sede=None, texto=None):
+        return len(self._posiciones(correo, sede, texto)[1])
+
+    def pagina_notas(self, correo=None, sede=None, texto=None, pagina=1, tamaño_pagina=50):
+        indice, posiciones = self._posiciones(correo, sede, texto)
+        return indice.pagina(posiciones, pagina, tamaño_pagina)
+
+    # --- Mixpanel ---
+    def usuarios_mixpanel(self):
+        return set(agregados.cubo_mixpanel().usuarios)
+
+    def totales(self, columnas):
+        return agregados.cubo_mixpanel().totales[list(columnas)]
+
+    def comportamiento_por_usuario(self, columnas):
+        def calcular():
+            total = agregados.actividad_mixpanel("email", columnas)
+            tabla = agregados.cubo_mixpanel().por_email.loc[total.index, list(columnas)].reset_index()
+            tabla['total_interacciones'] = total.to_numpy()
+            return tabla
+
+        return carga_datos.calcular_derivado(("uso.comportamiento", tuple(columnas)),
+                                             [agregados.ARCHIVO_MIXPANEL], calcular)
+
+    def actividad_por_email(self, columnas, limite=None):
+        actividad = agregados.actividad_mixpanel("email", columnas)
+        return actividad if limite is None else actividad.head(limite)
+
+    def actividad_por_area(self, columnas):
+        return agregados.actividad_mixpanel("area", columnas)
+
+    # --- Favoritos ---
+    def distribucion_favoritos(self):
+        df = carga_datos.leer_entrada(ARCHIVO_FAVORITOS_COLAPSADO, ['total_favorites'])
+        rangos = pd.cut(df['total_favorites'], bins=BINS_FAVORITOS, labels=LABELS_FAVORITOS)
+        return rangos.value_counts().sort_index()
+
+
+@_instrumentar
+class ConsultasDuckDB:
+    nombre = "duckdb"
+
+    # Nombre de la vista SQL de cada archivo de inputs/
+    TABLAS = {
+        "mongo_applicants_merged.csv": "notas",
+        "mixpanel_applicants_collapsed.csv": "mixpanel",
+        "explored_campus_collapsed.csv": "explorado",
+        "favorite_collapsed.csv": "favoritos_colapsado",
+        "favorite.csv": "favoritos",
+        "favorite_campus_history.csv": "historial_favoritos",
+    }
+
+    def __init__(self):
+        import duckdb
+
+        self._conexion = duckdb.connect()
+        self._versiones = {}
+        self._lock = threading.Lock()
+
+    # Registrar (o re-registrar si cambió el archivo) las vistas sobre los
+    # snapshots Parquet o, si no hay snapshot vigente, sobre el CSV. Los datos
+    # se leen al consultar, con filtros y proyección empujados al lector.
+    def _cursor(self, *nombres):
+        with self._lock:
+            for nombre in nombres:
+                ruta = carga_datos.ruta_entrada(nombre)
+                version = carga_datos.huella_servida(ruta)[3]
+                if self._versiones.get(nombre) == version:
+                    continue
+                if snapshots.hash_fuente(ruta) == version:
+                    fuente = f"read_parquet('{snapshots.ruta_snapshot(ruta)}')"
+                else:
+                    # DuckDB lee el CSV al consultar: solo si sigue siendo la versión servida
+                    ruta = carga_datos.ruta_lectura(nombre, version)
+                    fuente = f"read_csv('{ruta}', header = true, types = {self._tipos_csv(nombre, ruta)})"
+                vista = f"SELECT *, row_number() OVER () AS _fila FROM {fuente}"
+                if nombre == consulta_notas.ARCHIVO_NOTAS:
+                    vista = self._vista_notas(vista)
+                self._conexion.execute(f"CREATE OR REPLACE VIEW {self.TABLAS[nombre]} AS {vista}")
+                self._versiones[nombre] = version
+            return self._conexion.cursor()
+
+    # Las notas llevan los payloads de data ya parseados en pandas
+    # (consulta_notas.payloads_notas), copiados a una tabla y unidos por número
+    # de fila como "data.<clave>"
+    def _vista_notas(self, vista):
+        payloads = consulta_notas.payloads_notas()
+        self._claves_payload = list(payloads.columns)
+        self._conexion.register("_payloads", payloads.add_prefix("data.").assign(_fila=range(1, len(payloads) + 1)))
+        self._conexion.execute("CREATE OR REPLACE TABLE payloads_notas AS SELECT * FROM _payloads")
+        self._conexion.unregister("_payloads")
+        return (f"SELECT n.*, p.* EXCLUDE (_fila) FROM ({vista}) n "
+                f"LEFT JOIN payloads_notas p USING (_fila)")
+
+    # Tipos SQL declarados (esquemas.py) para las columnas presentes en el CSV,
+    # así los códigos se leen como texto igual que en pandas
+    @staticmethod
+    def _tipos_csv(nombre, ruta):
+        tipos_sql = {"string": "VARCHAR", "int64": "BIGINT", "Int64": "BIGINT",
+                     "float64": "DOUBLE", "bool": "BOOLEAN"}
+        esquema = esquemas.ESQUEMAS.get(nombre, {"tipos": {}, "fechas": {}})
+        presentes = set(pd.read_csv(ruta, nrows=0).columns)
+        tipos = {c: tipos_sql[t] for c, t in esquema["tipos"].items() if c in presentes}
+        tipos.update({c: "TIMESTAMPTZ" if zona else "TIMESTAMP"
+                      for c, zona in esquema["fechas"].items() if c in presentes})
+        return "{" + ", ".join(f"'{c}': '{t}'" for c, t in tipos.items()) + "}"
+
+    def _df(self, nombres, sql, parametros=None):
+        return self._cursor(*nombres).execute(sql, parametros or []).df()
+
+    @staticmethod
+    def _columnas_sql(columnas):
+        return ", ".join(f'CAST(SUM("{c}") AS BIGINT) AS "{c}"' for c in columnas)
+
+    @staticmethod
+    def _suma_filas(columnas):
+        return " + ".join(f'"{c}"' for c in columnas)
+
+    # --- Notas ---
+    def _filtro_notas(self, correo, sede, texto):
+        condiciones, parametros = ["email IS NOT NULL"], []
+        if correo is not None:
+            condiciones.append("email = ?")
+            parametros.append(correo)
+        if sede is not None:
+            condiciones.append("campusId = ?")
+            parametros.append(sede)
+        if texto:
+            condiciones.append(f'contains(lower("data.{texto_notas.CLAVE_CONTENIDO}"), ?)')
+            parametros.append(texto.lower())
+        return " AND ".join(condiciones), parametros
+
+    def opciones_notas(self):
+        nombres = [consulta_notas.ARCHIVO_NOTAS]
+        conteos = self._df(nombres, "SELECT COUNT(DISTINCT \"user\") AS usuarios, COUNT(*) AS notas "
+                                    "FROM notas WHERE email IS NOT NULL")
+        correos = self._df(nombres, "SELECT DISTINCT email FROM notas WHERE email IS NOT NULL ORDER BY email")
+        sedes = self._df(nombres, """
+            SELECT campusId AS campus_code,
+                   coalesce(first(campus_name ORDER BY "timestamp" DESC, _fila), campusId) AS nombre
+            FROM notas WHERE email IS NOT NULL AND campusId IS NOT NULL
+            GROUP BY campusId ORDER BY nombre, campus_code
+        """)
+        return (int(conteos['usuarios'][0]), int(conteos['notas'][0]), correos['email'].tolist(),
+                dict(zip(sedes['campus_code'], sedes['nombre'])))
+
+    def contar_notas(self, correo=None, sede=None, texto=None):
+        condicion, parametros = self._filtro_notas(correo, sede, texto)
+        return int(self._df([consulta_notas.ARCHIVO_NOTAS],
+                            f"SELECT COUNT(*) AS n FROM notas WHERE {condicion}", parametros)['n'][0])
+
+    def pagina_notas(self, correo=None, sede=None, texto=None, pagina=1, tamaño_pagina=50):
+        condicion, parametros = self._filtro_notas(correo, sede, texto)
+        self._cursor(consulta_notas.ARCHIVO_NOTAS)
+        origenes = {
+            f"data.{texto_notas.CLAVE_CONTENIDO}" if origen == 'data' else origen: destino
+            for origen, destino in consulta_notas.COLUMNAS_NOTAS.items()
+        }
+        origenes.update({f"data.{c}": c for c in self._claves_payload if c != texto_notas.CLAVE_CONTENIDO})
+        columnas = ", ".join(f'"{origen}" AS "{destino}"' for origen, destino in origenes.items())
+        df = self._df([consulta_notas.ARCHIVO_NOTAS], f"""
+            SELECT {columnas} FROM notas WHERE {condicion}
+            ORDER BY "timestamp" DESC, _fila LIMIT ? OFFSET ?
+        """, parametros + [tamaño_pagina, (max(pagina, 1) - 1) * tamaño_pagina])
+        return df.astype({c: "string" for c in df.columns if c != 'Fecha'})
+
+    # --- Mixpanel ---
+    def usuarios_mixpanel(self):
+        df = self._df([agregados.ARCHIVO_MIXPANEL],
+                      'SELECT DISTINCT "user" FROM mixpanel WHERE "user" IS NOT NULL')
+        return set(df['user'])
+
+    def totales(self, columnas):
+        df = self._df([agregados.ARCHIVO_MIXPANEL], f"SELECT {self._columnas_sql(columnas)} FROM mixpanel")
+        return df.iloc[0].astype("int64")
+
+    def _por_dimension(self, dimension, columnas):
+        return f"""
+            SELECT {dimension}, {self._columnas_sql(columnas)}
+            FROM mixpanel WHERE {dimension} IS NOT NULL GROUP BY {dimension}
+        """
+
+    def comportamiento_por_usuario(self, columnas):
+        df = self._df([agregados.ARCHIVO_MIXPANEL], f"""
+            SELECT *, {self._suma_filas(columnas)} AS total_interacciones
+            FROM ({self._por_dimension('email', columnas)})
+            ORDER BY total_interacciones DESC, email
+        """)
+        return df.astype({c: "int64" for c in [*columnas, 'total_interacciones']})
+
+    def _actividad(self, dimension, columnas, limite=None):
+        limite_sql = "" if limite is None else f"LIMIT {int(limite)}"
+        df = self._df([agregados.ARCHIVO_MIXPANEL], f"""
+            SELECT {dimension}, {self._suma_filas(columnas)} AS actividad
+            FROM ({self._por_dimension(dimension, columnas)})
+            ORDER BY actividad DESC, {dimension} {limite_sql}
+        """)
+        return df.set_index(dimension)['actividad'].astype("int64").rename(None)
+
+    def actividad_por_email(self, columnas, limite=None):
+        return self._actividad("email", columnas, limite)
+
+    def actividad_por_area(self, columnas):
+        existe = self._df([agregados.ARCHIVO_MIXPANEL],
+                          "SELECT COUNT(*) AS n FROM (DESCRIBE mixpanel) WHERE column_name = 'area_id'")
+        if existe['n'][0] == 0:
+            return None
+        return self._actividad("area_id", columnas)
+
+    # --- Favoritos ---
+    def distribucion_favoritos(self):
+        casos = " ".join(
+            f"WHEN total_favorites > {inferior} AND total_favorites <= {superior} THEN '{label}'"
+            for inferior, superior, label in zip(BINS_FAVORITOS, BINS_FAVORITOS[1:], LABELS_FAVORITOS)
+        )
+        df = self._df([ARCHIVO_FAVORITOS_COLAPSADO], f"""
+            SELECT rango, COUNT(*) AS n FROM (
+                SELECT CASE {casos} END AS rango FROM favoritos_colapsado
+            ) WHERE rango IS NOT NULL GROUP BY rango
+        """)
+        conteo = df.set_index('rango')['n'].reindex(LABELS_FAVORITOS, fill_value=0).astype("int64")
+        conteo.index = pd.CategoricalIndex(LABELS_FAVORITOS, categories=LABELS_FAVORITOS, ordered=True,
+                                           name='total_favorites')
+        return conteo.rename('count')
+
+
+_backend = None
+_lock_backend = threading.Lock()
+
+
+# Backend del proceso (uno compartido por todas las sesiones)
+def backend():
+    global _backend
+    with _lock_backend:
+        if _backend is None:
+            elegido = os.environ.get(VARIABLE_BACKEND, "pandas").lower()
+            if elegido == "duckdb":
+                try:
+                    _backend = ConsultasDuckDB()
+                except ImportError:
+                    logger.warning("duckdb no está instalado; se usa el backend pandas")
+            if _backend is None:
+                _backend = ConsultasPandas()
+        return _backend
+
+
+# Ejecutar las consultas del dashboard en ambos backends y devolver la lista de
+# diferencias encontradas (vacía si los resultados son idénticos)
+def comparar_backends(pandas_=None, duckdb_=None):
+    pandas_ = pandas_ or ConsultasPandas()
+    duckdb_ = duckdb_ or ConsultasDuckDB()
+    usuarios, notas, correos, sedes = pandas_.opciones_notas()
+    filtros = [(None, None, None), (None, None, "llamada")]
+    if correos:
+        filtros.append((correos[0], None, None))
+    if sedes:
+        filtros.append((None, next(iter(sedes)), None))
+    consultas = [
+        ("opciones_notas", ()),
+        ("usuarios_mixpanel", ()),
+        ("totales", (COLUMNAS_COMPORTAMIENTO + COLUMNAS_CONTENIDO,)),
+        ("comportamiento_por_usuario", (COLUMNAS_COMPORTAMIENTO,)),
+        ("actividad_por_email", (COLUMNAS_ACTIVIDAD, 10)),
+        ("actividad_por_area", (COLUMNAS_ACTIVIDAD,)),
+        ("distribucion_favoritos", ()),
+    ]
+    for correo, sede, texto in filtros:
+        consultas.append(("contar_notas", (correo, sede, texto)))
+        consultas.append(("pagina_notas", (correo, sede, texto, 1, 50)))
+        consultas.append(("pagina_notas", (correo, sede, texto, 2, 50)))
+
+    diferencias = []
+    for metodo, argumentos in consultas:
+        esperado = getattr(pandas_, metodo)(*argumentos)
+        obtenido = getattr(duckdb_, metodo)(*argumentos)
+        try:
+            if isinstance(esperado, pd.DataFrame):
+                pd.testing.assert_frame_equal(esperado.reset_index(drop=True), obtenido.reset_index(drop=True),
+                                              check_dtype=False)
+            elif isinstance(esperado, pd.Series):
+                pd.testing.assert_series_equal(esperado, obtenido, check_dtype=False,
+                                               check_index_type=False, check_names=False,
+                                               check_categorical=False)
+            elif esperado != obtenido:
+                raise AssertionError(f"{esperado!r} != {obtenido!r}")
+        except AssertionError as e:
+            diferencias.append(f"{metodo}{argumentos}: {e}")
+    return diferencias
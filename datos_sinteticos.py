@@ -0,0 +1,200 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from esquemas import CONTADORES_EXPLORACION, CONTADORES_MIXPANEL
+
+# Generador de datos sintéticos con los mismos esquemas que los seis archivos
+# de inputs/, para medir el dashboard a escala de temporada de postulación:
+#
+#     python datos_sinteticos.py /tmp/sinteticos --aplicantes 1000000 --eventos 5000000
+#
+# Las filas se generan y escriben por bloques, así que la memoria no crece con
+# la escala pedida.
+
+FILAS_POR_BLOQUE = 200_000
+INICIO = pd.Timestamp("2025-07-01", tz="UTC")
+DIAS_TEMPORADA = 60
+
+
+def _uuid(numeros, prefijo):
+    hexa = pd.Series(numeros).map("{:012x}".format)
+    return f"{prefijo:08x}-0000-4000-8000-" + hexa
+
+
+def _correo(numeros):
+    return "users_produccion_jardines" + pd.Series(numeros).astype(str) + "@yopmail.com"
+
+
+def _fechas(rng, n):
+    segundos = rng.integers(0, DIAS_TEMPORADA * 86_400, n)
+    microsegundos = rng.integers(0, 1_000_000, n)
+    return INICIO + pd.to_timedelta(segundos, unit="s") + pd.to_timedelta(microsegundos, unit="us")
+
+
+def _texto_fechas(fechas, con_zona=True):
+    formato = "%Y-%m-%d %H:%M:%S.%f"
+    texto = pd.Series(fechas.strftime(formato))
+    return texto + "+00:00" if con_zona else texto.str[:-3]
+
+
+# Columnas de ubicación/postulante (como en los archivos *_collapsed.csv)
+def _postulantes(rng, ids):
+    n = len(ids)
+    lat = rng.uniform(4.45, 4.80, n)
+    lng = rng.uniform(-74.20, -74.00, n)
+    # Celdas consistentes con la posición: cuadrícula fina y km8 más gruesa
+    cuadricula = ((lat - 4.45) / 0.0125).astype(int) * 16 + ((lng + 74.20) / 0.0125).astype(int)
+    km8 = ((lat - 4.45) / 0.07).astype(int) * 3 + ((lng + 74.20) / 0.07).astype(int) + 100
+    return pd.DataFrame({
+        "Unnamed: 0": ids,
+        "day": rng.integers(1, 31, n),
+        "has_5": rng.integers(0, 2, n),
+        "km8_id": km8,
+        "cuadricula_id": cuadricula,
+        "area_id": rng.integers(1, 600, n),
+        "profile": rng.integers(1, 6, n),
+        "point_id": rng.integers(1, 20_000, n),
+        "lng": lng.round(7),
+        "lat": lat.round(7),
+        "formatted_address": "Cl. " + pd.Series(rng.integers(1, 200, n)).astype(str) + " # "
+                             + pd.Series(rng.integers(1, 100, n)).astype(str) + ", Bogotá, Colombia",
+        "location_type": "ROOFTOP",
+        "applicant_id": ids + 230_000,
+        "user": _uuid(ids, 1),
+        "legal_guardian_id": ids + 210_000,
+        "email": _correo(ids),
+    })
+
+
+class _Escritor:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.primero = True
+
+    def escribir(self, df):
+        df.to_csv(self.ruta, mode="w" if self.primero else "a", header=self.primero, index=False)
+        self.primero = False
+
+
+def _bloques(total):
+    for inicio in range(0, total, FILAS_POR_BLOQUE):
+        yield np.arange(inicio, min(total, inicio + FILAS_POR_BLOQUE))
+
+
+def generar(carpeta, aplicantes=10_000, eventos=None, notas=None, semilla=0):
+    eventos = aplicantes * 2 if eventos is None else eventos
+    notas = max(1, eventos // 10) if notas is None else notas
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+
+    # Catálogo de sedes: código (12 dígitos), institución y nombre
+    n_sedes = max(100, aplicantes // 50)
+    codigos_sedes = pd.Series(10**11 + np.arange(n_sedes) * 7_919 + rng.integers(0, 7_919, n_sedes)).astype(str)
+    instituciones = codigos_sedes.str[:-3] + "000"
+    nombres_sedes = "Jardín Infantil " + pd.Series(np.arange(n_sedes)).astype(str)
+
+    escritores = {nombre: _Escritor(carpeta / nombre) for nombre in (
+        "mixpanel_applicants_collapsed.csv", "explored_campus_collapsed.csv", "favorite_collapsed.csv",
+        "favorite.csv", "favorite_campus_history.csv", "mongo_applicants_merged.csv",
+    )}
+
+    # Archivos colapsados: una fila por postulante activo
+    for ids in _bloques(aplicantes):
+        base = _postulantes(rng, ids)
+        n = len(ids)
+        contadores = rng.poisson(3, (n, len(CONTADORES_MIXPANEL))) * 5
+        escritores["mixpanel_applicants_collapsed.csv"].escribir(
+            pd.concat([base, pd.DataFrame(contadores, columns=CONTADORES_MIXPANEL)], axis=1))
+        explorados = rng.random(n) < 0.8
+        exploracion = pd.DataFrame(rng.poisson(20, (explorados.sum(), 2)), columns=CONTADORES_EXPLORACION)
+        escritores["explored_campus_collapsed.csv"].escribir(
+            pd.concat([base[explorados].reset_index(drop=True), exploracion], axis=1))
+        con_favoritos = rng.random(n) < 0.6
+        escritores["favorite_collapsed.csv"].escribir(
+            base[con_favoritos].assign(total_favorites=rng.geometric(0.08, con_favoritos.sum())))
+
+    # Eventos de favoritos: tabla vigente e historial de altas/bajas/cambios de posición
+    for ids in _bloques(eventos):
+        n = len(ids)
+        usuarios = rng.integers(0, aplicantes, n)
+        sedes = rng.integers(0, n_sedes, n)
+        creados = _fechas(rng, n)
+        modificados = creados + pd.to_timedelta(rng.integers(0, 3_600_000_000, n), unit="us")
+        escritores["favorite.csv"].escribir(pd.DataFrame({
+            "favorite_rank": np.minimum(rng.geometric(0.45, n), 30),
+            "id": ids + 1,
+            "user": _uuid(usuarios, 1),
+            "campus_code": codigos_sedes.to_numpy()[sedes],
+            "institution_code": instituciones.to_numpy()[sedes],
+            "created": _texto_fechas(creados),
+            "modified": _texto_fechas(modificados),
+        }))
+        tipo = rng.choice(3, n, p=[0.79, 0.13, 0.08])  # alta, cambio de posición, baja
+        accion = np.where(tipo == 0, "DOWN", np.where(tipo == 1, np.where(rng.random(n) < 0.5, "UP", "DOWN"), ""))
+        escritores["favorite_campus_history.csv"].escribir(pd.DataFrame({
+            "created": _texto_fechas(creados),
+            "modified": _texto_fechas(creados),
+            "id": ids + 40_000,
+            "user": _uuid(usuarios, 1),
+            "favorite_rank_action": accion,
+            "favorite_added": tipo == 0,
+            "favorite_removed": tipo == 2,
+            "campus_code": codigos_sedes.to_numpy()[sedes],
+            "institution_code": "",
+        }))
+
+    # Notas de campus (export de Mongo cruzado con postulantes)
+    for ids in _bloques(notas):
+        n = len(ids)
+        usuarios = rng.integers(0, aplicantes, n)
+        sedes = rng.integers(0, n_sedes, n)
+        creados = _fechas(rng, n)
+        actualizados = creados + pd.to_timedelta(rng.integers(0, 86_400_000, n), unit="ms")
+        base = _postulantes(rng, usuarios)
+        sin_cruce = rng.random(n) < 0.03
+        base.loc[sin_cruce] = None
+        texto_creado = _texto_fechas(creados, con_zona=False)
+        notas_df = pd.DataFrame({
+            "type": "campus_note",
+            "userId": _uuid(usuarios, 1),
+            "campusId": codigos_sedes.to_numpy()[sedes],
+            "tenantCode": "co",
+            "deleted": False,
+            "timestamp": texto_creado,
+            "createdAt": texto_creado,
+            "updatedAt": _texto_fechas(actualizados, con_zona=False),
+            "data": "{'content': 'Llamada " + pd.Series(ids).astype(str) + ": disponibilidad "
+                    + pd.Series(rng.integers(1, 6, n)).astype(str) + "'}",
+            "event": "campus_note",
+            "time": texto_creado,
+        })
+        notas_df = pd.concat([notas_df, base], axis=1)
+        notas_df["_merge"] = np.where(sin_cruce, "left_only", "both")
+        notas_df["campus_code"] = codigos_sedes.to_numpy()[sedes]
+        notas_df["campus_name"] = nombres_sedes.to_numpy()[sedes]
+        escritores["mongo_applicants_merged.csv"].escribir(notas_df)
+
+    return carpeta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera inputs/*.csv sintéticos a escala")
+    parser.add_argument("carpeta")
+    parser.add_argument("--aplicantes", type=int, default=10_000)
+    parser.add_argument("--eventos", type=int, default=None, help="filas de favorite.csv y del historial")
+    parser.add_argument("--notas", type=int, default=None)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+    carpeta = generar(args.carpeta, args.aplicantes, args.eventos, args.notas, args.semilla)
+    for ruta in sorted(carpeta.glob("*.csv")):
+        print(f"{ruta.name}: {ruta.stat().st_size:,} B")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
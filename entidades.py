@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+import carga_datos
+
+# Índice de entidades compartido por los archivos de inputs/: cada usuario con
+# sus datos de postulante (applicant_id, email, área...) y cada sede
+# (campus_code) con su nombre e institución, más los conteos de notas,
+# favoritos y eventos del historial de cada una. Se calcula una vez por
+# versión de las entradas y se guarda en inputs/almacen/entidades/; las vistas
+# que cruzan archivos (notas por sede favorita, favoritos por área) son
+# búsquedas sobre el índice en vez de merges repetidos.
+#
+# La cobertura de cada cruce (filas y claves con coincidencia) se guarda junto
+# al índice y se informa en cada refresco:
+#
+#     python entidades.py
+
+ARCHIVO_NOTAS = "mongo_applicants_merged.csv"
+ARCHIVO_FAVORITOS = "favorite.csv"
+ARCHIVO_HISTORIAL = "favorite_campus_history.csv"
+ARCHIVO_MIXPANEL = "mixpanel_applicants_collapsed.csv"
+ARCHIVO_EXPLORADO = "explored_campus_collapsed.csv"
+ARCHIVO_FAVORITOS_COLAPSADO = "favorite_collapsed.csv"
+
+# Archivos de postulantes (uno por usuario): de aquí salen sus datos
+ARCHIVOS_POSTULANTES = [ARCHIVO_MIXPANEL, ARCHIVO_EXPLORADO, ARCHIVO_FAVORITOS_COLAPSADO]
+ARCHIVOS_ENTIDADES = [*ARCHIVOS_POSTULANTES, ARCHIVO_NOTAS, ARCHIVO_FAVORITOS, ARCHIVO_HISTORIAL]
+
+COLUMNAS_POSTULANTE = ["applicant_id", "legal_guardian_id", "email", "area_id", "profile", "has_5", "day"]
+
+# Fuentes con usuario y sede: columna de usuario y de sede en cada archivo
+FUENTES_CRUCE = {
+    "notas": (ARCHIVO_NOTAS, "userId", "campusId"),
+    "favoritos": (ARCHIVO_FAVORITOS, "user", "campus_code"),
+    "historial": (ARCHIVO_HISTORIAL, "user", "campus_code"),
+}
+
+COLUMNAS_COBERTURA = ["cruce", "filas", "filas_con_dato", "claves", "claves_con_dato", "cobertura"]
+
+
+def carpeta_entidades():
+    return carga_datos.BASE_PATH_ALMACEN / "entidades"
+
+
+# Índice de entidades de una versión de las entradas.
+# usuarios: user -> datos del postulante (NA si no es postulante) y conteos
+# de notas, favoritos y eventos del historial; campus: campus_code -> nombre,
+# institución y los mismos conteos; cobertura: una fila por cruce.
+@dataclass(frozen=True)
+class IndiceEntidades:
+    usuarios: pd.DataFrame
+    campus: pd.DataFrame
+    cobertura: pd.DataFrame
+
+    # Favoritos vigentes por área del postulante (NA: usuarios sin postulante)
+    def favoritos_por_area(self):
+        grupos = self.usuarios.groupby("area_id", dropna=False)
+        return pd.DataFrame({
+            "favoritos": grupos["favoritos"].sum(),
+            "usuarios": grupos["favoritos"].agg(lambda f: int((f > 0).sum())),
+            "notas": grupos["notas"].sum(),
+        }).sort_index()
+
+
+# Datos de cada usuario según los archivos de postulantes
+def postulantes():
+    def calcular():
+        partes = [carga_datos.leer_entrada(n, ["user", *COLUMNAS_POSTULANTE]) for n in ARCHIVOS_POSTULANTES]
+        df = pd.concat(partes, ignore_index=True).dropna(subset=["user"]).drop_duplicates(subset="user")
+        tipos = {c: "Int64" for c in COLUMNAS_POSTULANTE if c != "email"}
+        return df.astype({"user": "string", "email": "string", **tipos}).set_index("user")[COLUMNAS_POSTULANTE]
+
+    return carga_datos.calcular_derivado("postulantes", ARCHIVOS_POSTULANTES, calcular)
+
+
+def _conteos(serie):
+    return serie.astype("string").dropna().value_counts()
+
+
+def _tabla(conteos, nombre_indice):
+    tabla = pd.DataFrame(conteos).fillna(0).astype("int64")
+    tabla.index = tabla.index.astype("string")
+    tabla.index.name = nombre_indice
+    return tabla
+
+
+# Cobertura de un cruce: conteos por clave y qué claves tienen dato
+def _cobertura(cruce, conteos, con_dato):
+    con_dato = con_dato.reindex(conteos.index, fill_value=False).to_numpy(dtype=bool)
+    filas = int(conteos.sum())
+    filas_con_dato = int(conteos[con_dato].sum())
+    return {
+        "cruce": cruce,
+        "filas": filas,
+        "filas_con_dato": filas_con_dato,
+        "claves": len(conteos),
+        "claves_con_dato": int(con_dato.sum()),
+        "cobertura": filas_con_dato / filas if filas else 1.0,
+    }
+
+
+# Armar el índice desde los archivos actuales
+def construir_indice():
+    lecturas = {
+        fuente: carga_datos.leer_entrada(archivo, [usuario, sede])
+        for fuente, (archivo, usuario, sede) in FUENTES_CRUCE.items()
+    }
+    catalogo = carga_datos.leer_entrada(ARCHIVO_NOTAS, ["campus_code", "campus_name"])
+    instituciones = pd.concat([
+        carga_datos.leer_entrada(archivo, ["campus_code", "institution_code"])
+        for archivo in (ARCHIVO_FAVORITOS, ARCHIVO_HISTORIAL)
+    ], ignore_index=True)
+
+    por_usuario = {f: _conteos(df[FUENTES_CRUCE[f][1]]) for f, df in lecturas.items()}
+    por_sede = {f: _conteos(df[FUENTES_CRUCE[f][2]]) for f, df in lecturas.items()}
+    conteos_usuario = _tabla(por_usuario, "user")
+    conteos_sede = _tabla(por_sede, "campus_code")
+
+    datos_postulante = postulantes()
+    usuarios = datos_postulante.join(conteos_usuario, how="outer")
+    usuarios[list(por_usuario)] = usuarios[list(por_usuario)].fillna(0).astype("int64")
+
+    nombres = (catalogo.dropna().astype("string").drop_duplicates(subset="campus_code")
+               .set_index("campus_code")["campus_name"])
+    institucion = (instituciones.dropna().astype("string").drop_duplicates(subset="campus_code")
+                   .set_index("campus_code")["institution_code"])
+    campus = pd.concat([nombres, institucion, conteos_sede], axis=1)
+    campus[list(por_sede)] = campus[list(por_sede)].fillna(0).astype("int64")
+    campus.index = campus.index.astype("string")
+    campus.index.name = "campus_code"
+
+    es_postulante = usuarios["applicant_id"].notna()
+    con_nombre = campus["campus_name"].notna()
+    con_institucion = campus["institution_code"].notna()
+    cobertura = pd.DataFrame([
+        _cobertura("notas → postulante", por_usuario["notas"], es_postulante),
+        _cobertura("notas → nombre de sede", por_sede["notas"], con_nombre),
+        _cobertura("notas → institución", por_sede["notas"], con_institucion),
+        _cobertura("favoritos → postulante", por_usuario["favoritos"], es_postulante),
+        _cobertura("favoritos → nombre de sede", por_sede["favoritos"], con_nombre),
+        _cobertura("historial → postulante", por_usuario["historial"], es_postulante),
+        _cobertura("historial → nombre de sede", por_sede["historial"], con_nombre),
+    ], columns=COLUMNAS_COBERTURA)
+    return IndiceEntidades(usuarios=usuarios.sort_index(), campus=campus.sort_index(), cobertura=cobertura)
+
+
+# Persistir un índice (tablas Parquet + versiones de las entradas). El JSON se
+# escribe al final: sin él el índice guardado no se usa.
+def guardar_indice(indice, carpeta, versiones):
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    (carpeta / "entidades.json").unlink(missing_ok=True)
+    _escribir_tabla(indice.usuarios, carpeta / "usuarios.parquet")
+    _escribir_tabla(indice.campus, carpeta / "campus.parquet")
+    _escribir_tabla(indice.cobertura, carpeta / "cobertura.parquet")
+    temporal = carpeta / f"entidades.json.{os.getpid()}.tmp"
+    temporal.write_text(json.dumps({"versiones": list(versiones)}))
+    os.replace(temporal, carpeta / "entidades.json")
+
+
+# Archivo temporal propio de este proceso + os.replace: un lector nunca abre un
+# Parquet a medio escribir, aunque otro worker guarde el mismo índice a la vez
+def _escribir_tabla(df, ruta):
+    temporal = ruta.with_suffix(f".parquet.{os.getpid()}.tmp")
+    df.to_parquet(temporal)
+    os.replace(temporal, ruta)
+
+
+# Cargar un índice persistido; None si no existe o no corresponde a las versiones
+def cargar_indice(carpeta, versiones=None):
+    carpeta = Path(carpeta)
+    archivo_meta = carpeta / "entidades.json"
+    if not archivo_meta.exists():
+        return None
+    meta = json.loads(archivo_meta.read_text())
+    if versiones is not None and meta["versiones"] != list(versiones):
+        return None
+    return IndiceEntidades(
+        usuarios=pd.read_parquet(carpeta / "usuarios.parquet"),
+        campus=pd.read_parquet(carpeta / "campus.parquet"),
+        cobertura=pd.read_parquet(carpeta / "cobertura.parquet"),
+    )
+
+
+# Índice de la versión actual de las entradas: el guardado si corresponde a
+# esa versión; si no, se arma y se guarda para los procesos siguientes
+def indice_entidades():
+    def calcular():
+        versiones = carga_datos.version_servida(ARCHIVOS_ENTIDADES)
+        indice = cargar_indice(carpeta_entidades(), versiones)
+        if indice is None:
+            indice = construir_indice()
+            guardar_indice(indice, carpeta_entidades(), versiones)
+        return indice
+
+    return carga_datos.calcular_derivado("indice_entidades", ARCHIVOS_ENTIDADES, calcular)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arma el índice de entidades e informa la cobertura de los cruces")
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    args = parser.parse_args(argv)
+    if args.datos:
+        carga_datos.usar_carpeta_entradas(Path(args.datos))
+    indice = indice_entidades()
+    print(f"{len(indice.usuarios):,} usuarios · {len(indice.campus):,} sedes")
+    print(indice.cobertura.to_string(index=False, formatters={"cobertura": "{:.1%}".format}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
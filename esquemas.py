@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+# Columnas de ubicación/postulante compartidas por los archivos *_collapsed.csv
+_COLUMNAS_POSTULANTE = {
+    "Unnamed: 0": "int64",
+    "day": "int64",
+    "has_5": "int64",
+    "km8_id": "int64",
+    "cuadricula_id": "int64",
+    "area_id": "int64",
+    "profile": "int64",
+    "point_id": "int64",
+    "lng": "float64",
+    "lat": "float64",
+    "formatted_address": "string",
+    "location_type": "string",
+    "applicant_id": "int64",
+    "user": "string",
+    "legal_guardian_id": "int64",
+    "email": "string",
+}
+
+# Contadores de eventos de Mixpanel (una columna por evento)
+CONTADORES_MIXPANEL = [
+    "click_dashboard_menu",
+    "click_reg_user-log-in_log-in-button",
+    "click_school_pin",
+    "close_school_profile",
+    "favorite_school_from_list",
+    "favorite_school_from_listFavorites",
+    "login",
+    "map_filter_click",
+    "map_grade_click",
+    "menu_explore",
+    "menu_favorites",
+    "open_school_profile",
+    "open_school_profile3",
+    "outside_close_school_profile",
+    "remove_favorite_school_from_list",
+    "remove_favorite_school_from_listFavorites",
+    "sp_school_leadership",
+    "sp_school_performance",
+    "sp_school_photo",
+    "sp_school_price",
+    "sp_school_programs",
+    "sp_school_students",
+]
+
+CONTADORES_EXPLORACION = ["click_campus_card", "click_campus_pin"]
+
+# Columnas que no se cargan en memoria (índice exportado por pandas)
+_DESCARTAR = ["Unnamed: 0"]
+
+# Columnas de postulante que no pueden venir vacías en los archivos *_collapsed.csv
+_SIN_NULOS_POSTULANTE = {"user": 0.0, "email": 0.0, "applicant_id": 0.0}
+
+# Esquema declarado de cada archivo de inputs/.
+# "tipos": dtype de pandas por columna; "fechas": columna -> zona horaria
+# (None si el texto no trae offset y se deja como fecha sin zona).
+# Para los frames residentes (ver compactar): "descartar", columnas que no se
+# cargan, y "categorias", columnas de texto con valores muy repetidos.
+# Para validar cada archivo antes de cargarlo (validacion.py): "claves",
+# columnas que no se repiten, y "nulos_maximos", fracción máxima de vacíos por
+# columna. Todas las columnas declaradas (salvo las descartadas) son obligatorias.
+ESQUEMAS = {
+    "mongo_applicants_merged.csv": {
+        "tipos": {
+            "type": "string",
+            "userId": "string",
+            "campusId": "string",
+            "tenantCode": "string",
+            "deleted": "bool",
+            "data": "string",
+            "event": "string",
+            # Columnas del cruce con postulantes: vacías en las filas left_only
+            **{c: ("Int64" if t == "int64" else t) for c, t in _COLUMNAS_POSTULANTE.items()},
+            "_merge": "string",
+            "campus_code": "string",
+            "campus_name": "string",
+        },
+        "fechas": {"timestamp": None, "createdAt": None, "updatedAt": None, "time": None},
+        "descartar": _DESCARTAR,
+        "categorias": ["type", "userId", "campusId", "tenantCode", "event", "location_type", "user",
+                       "email", "_merge", "campus_code", "campus_name"],
+        "claves": [],
+        # Las notas sin postulante (left_only) no traen email
+        "nulos_maximos": {"userId": 0.0, "deleted": 0.0, "createdAt": 0.0, "email": 0.5},
+    },
+    "mixpanel_applicants_collapsed.csv": {
+        "tipos": {**_COLUMNAS_POSTULANTE, **{c: "int64" for c in CONTADORES_MIXPANEL}},
+        "fechas": {},
+        "descartar": _DESCARTAR,
+        "categorias": ["location_type"],
+        "claves": ["user"],
+        "nulos_maximos": {**_SIN_NULOS_POSTULANTE, **{c: 0.0 for c in CONTADORES_MIXPANEL}},
+    },
+    "explored_campus_collapsed.csv": {
+        "tipos": {**_COLUMNAS_POSTULANTE, **{c: "int64" for c in CONTADORES_EXPLORACION}},
+        "fechas": {},
+        "descartar": _DESCARTAR,
+        "categorias": ["location_type"],
+        "claves": ["user"],
+        "nulos_maximos": {**_SIN_NULOS_POSTULANTE, **{c: 0.0 for c in CONTADORES_EXPLORACION}},
+    },
+    "favorite_collapsed.csv": {
+        "tipos": {**_COLUMNAS_POSTULANTE, "total_favorites": "int64"},
+        "fechas": {},
+        "descartar": _DESCARTAR,
+        "categorias": ["location_type"],
+        "claves": ["user"],
+        "nulos_maximos": {**_SIN_NULOS_POSTULANTE, "total_favorites": 0.0},
+    },
+    "favorite.csv": {
+        "tipos": {
+            "favorite_rank": "int64",
+            "id": "int64",
+            "user": "string",
+            "campus_code": "string",
+            "institution_code": "string",
+        },
+        "fechas": {"created": "UTC", "modified": "UTC"},
+        "categorias": ["user", "campus_code", "institution_code"],
+        "claves": ["id"],
+        "nulos_maximos": {"user": 0.0, "campus_code": 0.0, "favorite_rank": 0.0, "created": 0.0},
+    },
+    "favorite_campus_history.csv": {
+        "tipos": {
+            "id": "int64",
+            "user": "string",
+            "favorite_rank_action": "string",
+            "favorite_added": "bool",
+            "favorite_removed": "bool",
+            "campus_code": "string",
+            "institution_code": "string",
+        },
+        "fechas": {"created": "UTC", "modified": "UTC"},
+        "categorias": ["user", "favorite_rank_action", "campus_code", "institution_code"],
+        "claves": ["id"],
+        "nulos_maximos": {"user": 0.0, "campus_code": 0.0, "created": 0.0,
+                          "favorite_added": 0.0, "favorite_removed": 0.0},
+    },
+}
+
+
+# Columnas que un archivo debe traer: las declaradas, salvo las que no se cargan
+def columnas_requeridas(nombre):
+    esquema = ESQUEMAS.get(nombre, {})
+    descartar = set(esquema.get("descartar", []))
+    return [c for c in [*esquema.get("tipos", {}), *esquema.get("fechas", {})] if c not in descartar]
+
+
+# Tipos declarados para leer el CSV (solo las columnas presentes en la lectura)
+def tipos_lectura(nombre, columnas=None):
+    tipos = ESQUEMAS.get(nombre, {}).get("tipos", {})
+    if columnas is not None:
+        tipos = {c: t for c, t in tipos.items() if c in columnas}
+    return tipos
+
+
+# Convertir las columnas de fecha declaradas y asegurar el resto de los tipos.
+# Es idempotente, así que sirve tanto para CSV como para snapshots.
+def aplicar_esquema(df, nombre):
+    esquema = ESQUEMAS.get(nombre)
+    if esquema is None:
+        return df
+    for columna, zona in esquema["fechas"].items():
+        if columna in df.columns and not pd.api.types.is_datetime64_any_dtype(df[columna]):
+            df[columna] = pd.to_datetime(df[columna], format="ISO8601", utc=zona == "UTC")
+    faltantes = {
+        c: t for c, t in esquema["tipos"].items()
+        if c in df.columns and str(df[c].dtype) != str(pd.api.types.pandas_dtype(t))
+    }
+    if faltantes:
+        df = df.astype(faltantes)
+    return df
+
+
+_ENTEROS = ["int8", "int16", "int32", "int64"]
+
+
+# Entero más angosto que contiene los valores de la columna (con NA si es nullable)
+def _entero_minimo(serie):
+    nullable = isinstance(serie.dtype, pd.Int64Dtype)
+    if serie.isna().all():
+        return None
+    minimo, maximo = serie.min(), serie.max()
+    for tipo in _ENTEROS:
+        info = np.iinfo(tipo)
+        if info.min <= minimo and maximo <= info.max:
+            return tipo.capitalize() if nullable else tipo
+    return None
+
+
+# Normalización compacta para los frames que quedan en memoria: descarta las
+# columnas declaradas, pasa a categoría los textos repetidos y reduce cada
+# entero al ancho mínimo. Las sumas de pandas (sum, groupby) siguen siendo
+# int64; las sumas fila a fila entre columnas deben convertir antes a int64.
+def compactar(df, nombre):
+    esquema = ESQUEMAS.get(nombre)
+    if esquema is None:
+        return df
+    descartar = [c for c in esquema.get("descartar", []) if c in df.columns]
+    if descartar:
+        df = df.drop(columns=descartar)
+    categorias = set(esquema.get("categorias", []))
+    conversiones = {}
+    for columna in df.columns:
+        if columna in categorias:
+            conversiones[columna] = "category"
+        elif esquema["tipos"].get(columna) in ("int64", "Int64"):
+            tipo = _entero_minimo(df[columna])
+            if tipo is not None and tipo != str(df[columna].dtype):
+                conversiones[columna] = tipo
+    if conversiones:
+        df = df.astype(conversiones)
+    return df
+
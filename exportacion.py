@@ -0,0 +1,326 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import pandas as pd
+
+import carga_datos
+import metricas
+import precalculados
+import refresco
+import validacion
+import version_datos
+
+logger = logging.getLogger(__name__)
+
+# Exportación de solo lectura de las tablas del dashboard, sin Streamlit: los
+# mismos agregados cacheados que muestra la app (metricas.py, o el paquete de
+# precalculados.py con JARDINES_PRECALCULADO=1) en CSV, JSON o Parquet.
+#
+#     python exportacion.py --listar
+#     python exportacion.py comportamiento_por_usuario --formato csv > comportamiento.csv
+#     python exportacion.py --servir --puerto 8502
+#     curl -H 'If-None-Match: "..."' http://localhost:8502/favoritos.json
+#
+# Cada respuesta lleva un ETag que depende solo de la versión de los datos
+# servidos (el paquete en modo precalculado), la tabla y el formato, así que se
+# conoce sin calcular nada: mientras los datos no cambien, una petición con
+# If-None-Match recibe 304 sin cuerpo antes de tocar la tabla. CSV y JSON se
+# envían por bloques de filas (chunked) a medida que se serializan; Parquet se
+# arma completo en memoria, porque su footer va al final del archivo.
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+PUERTO_POR_DEFECTO = 8502
+MAXIMO_TABLAS = 32
+# Filas de cada bloque al serializar CSV y JSON
+FILAS_POR_BLOQUE = 10_000
+
+
+def _fila(valores):
+    return pd.DataFrame([valores])
+
+
+def _conteos(valores, nombre, valor):
+    serie = pd.Series(valores, dtype="int64") if valores is None or isinstance(valores, dict) else valores
+    return serie.rename_axis(nombre).reset_index(name=valor)
+
+
+# Tablas exportables: nombre -> (descripción, función sobre metricas o precalculados)
+TABLAS = {
+    "metricas_principales": ("Total de usuarios, interacciones y promedio por usuario",
+                             lambda r: _fila(r.seccion_uso()["principales"])),
+    "comportamiento": ("Interacciones por tipo",
+                       lambda r: _conteos(r.seccion_uso()["comportamiento"], "tipo", "cantidad")),
+    "comportamiento_por_usuario": ("Comportamiento por usuario (email), más activos primero",
+                                   lambda r: r.seccion_uso()["tabla_comportamiento"]),
+    "contenido": ("Visitas por tipo de contenido",
+                  lambda r: _conteos(r.seccion_uso()["contenido"], "contenido", "visitas")),
+    "actividad_por_area": ("Actividad por área",
+                           lambda r: _conteos(r.seccion_uso()["actividad_por_area"], "area_id", "actividad")),
+    "exploracion": ("Clicks en tarjetas y pins de campus",
+                    lambda r: _fila(r.seccion_exploracion()["estadisticas"])),
+    "top_exploradores": ("Usuarios con más exploración",
+                         lambda r: r.seccion_exploracion()["top_exploradores"]),
+    "favoritos": ("Total, promedio y máximo de favoritos por usuario",
+                  lambda r: _fila(r.seccion_favoritos()["estadisticas"])),
+    "top_favoritos": ("Usuarios con más favoritos",
+                      lambda r: r.seccion_favoritos()["top_favoritos"]),
+    "distribucion_favoritos": ("Usuarios por cantidad de favoritos",
+                               lambda r: _conteos(r.seccion_favoritos()["distribucion"], "rango", "usuarios")),
+    "historial_favoritos": ("Favoritos vigentes, colegios, agregados y removidos",
+                            lambda r: _fila(r.seccion_historial_favoritos()["estadisticas"])),
+    "sedes_favoritas": ("Sedes con más favoritos",
+                        lambda r: r.seccion_historial_favoritos()["tabla_sedes"]),
+    "favoritos_por_area": ("Favoritos vigentes por área del postulante",
+                           lambda r: r.seccion_historial_favoritos()["favoritos_por_area"]),
+    "rotacion": ("Indicadores de rotación de favoritos",
+                 lambda r: _fila(r.seccion_rotacion()["totales"])),
+    "rotacion_sedes": ("Rotación de favoritos por sede",
+                       lambda r: r.seccion_rotacion()["tabla_sedes"]),
+    "cobertura": ("Cobertura de los cruces entre archivos",
+                  lambda r: r.seccion_cobertura()),
+    "cohortes": ("Postulantes, interacciones, exploraciones y favoritos por cohorte",
+                 lambda r: r.seccion_cohortes()),
+}
+
+
+def _resultados():
+    return precalculados if precalculados.activo() else metricas
+
+
+# Versión de los datos servidos (la del paquete en modo precalculado)
+def version_exportada():
+    if precalculados.activo():
+        return precalculados.paquete_actual().version
+    return version_datos.version_datos().clave
+
+
+def etag(version, tabla, formato):
+    huella = hashlib.sha256(repr((version, tabla, formato)).encode()).hexdigest()[:32]
+    return f'"{huella}"'
+
+
+# Contenido de la tabla en el formato, por bloques de bytes
+def serializar(df, formato):
+    if formato == "csv":
+        yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+        for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+            yield df.iloc[inicio:inicio + FILAS_POR_BLOQUE].to_csv(index=False, header=False).encode("utf-8")
+    elif formato == "json":
+        yield b"["
+        separador = b""
+        for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+            registros = df.iloc[inicio:inicio + FILAS_POR_BLOQUE].to_json(
+                orient="records", date_format="iso", force_ascii=False)
+            yield separador + registros[1:-1].encode("utf-8")
+            separador = b","
+        yield b"]"
+    else:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        yield buffer.getvalue()
+
+
+def validar(tabla, formato):
+    if tabla not in TABLAS:
+        raise ValueError(f"No existe la tabla {tabla}")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato} (usar {', '.join(FORMATOS)})")
+
+
+# ETag de una tabla en la versión actual, sin calcularla
+def etag_actual(tabla, formato):
+    validar(tabla, formato)
+    return etag(version_exportada(), tabla, formato)
+
+
+# Tablas ya calculadas por (versión, tabla) (la más reciente al final)
+_tablas = OrderedDict()
+_lock = threading.Lock()
+
+
+# ETag y DataFrame de una tabla en la versión actual. Si la versión cambia
+# mientras se calcula (refresco en segundo plano) se vuelve a calcular, así
+# el ETag siempre describe el contenido.
+def exportar(tabla, formato):
+    validar(tabla, formato)
+    while True:
+        version = version_exportada()
+        clave = (version, tabla)
+        with _lock:
+            if clave in _tablas:
+                _tablas.move_to_end(clave)
+                return etag(version, tabla, formato), _tablas[clave]
+        df = TABLAS[tabla][1](_resultados())
+        if version_exportada() == version:
+            break
+    with _lock:
+        _tablas[clave] = df
+        while len(_tablas) > MAXIMO_TABLAS:
+            _tablas.popitem(last=False)
+    return etag(version, tabla, formato), df
+
+
+def catalogo():
+    return {
+        "tablas": [
+            {"nombre": nombre, "descripcion": descripcion,
+             "rutas": [f"/{nombre}.{formato}" for formato in FORMATOS]}
+            for nombre, (descripcion, _) in TABLAS.items()
+        ],
+    }
+
+
+# If-None-Match contiene el ETag (o *)
+def coincide(encabezado, clave):
+    if not encabezado:
+        return False
+    etiquetas = [e.strip().removeprefix("W/") for e in encabezado.split(",")]
+    return "*" in etiquetas or clave in etiquetas
+
+
+class ManejadorExportacion(BaseHTTPRequestHandler):
+    server_version = "JardinesExportacion/1.0"
+    # HTTP/1.1 para enviar CSV y JSON con Transfer-Encoding: chunked
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._responder(cuerpo=False)
+
+    def do_GET(self):
+        self._responder(cuerpo=True)
+
+    def _responder(self, cuerpo):
+        ruta = unquote(urlsplit(self.path).path).strip("/")
+        if ruta in ("", "tablas"):
+            contenido = json.dumps(catalogo(), ensure_ascii=False).encode("utf-8")
+            return self._enviar(HTTPStatus.OK, "application/json", contenido, cuerpo)
+        tabla, _, formato = ruta.rpartition(".")
+        if not tabla or tabla not in TABLAS or formato not in FORMATOS:
+            return self._enviar(HTTPStatus.NOT_FOUND, "text/plain; charset=utf-8",
+                                f"No existe {ruta}; ver / para las tablas\n".encode("utf-8"), cuerpo)
+        try:
+            # El ETag no depende del contenido: el 304 sale sin calcular la tabla
+            clave = etag_actual(tabla, formato)
+            if coincide(self.headers.get("If-None-Match"), clave):
+                return self._enviar(HTTPStatus.NOT_MODIFIED, None, b"", False, clave)
+            clave, df = exportar(tabla, formato)
+        except FileNotFoundError as e:
+            return self._enviar(HTTPStatus.SERVICE_UNAVAILABLE, "text/plain; charset=utf-8",
+                                f"Falta el archivo: {e.filename}\n".encode("utf-8"), cuerpo)
+        except (validacion.EntradaInvalida, carga_datos.VersionNoDisponible) as e:
+            return self._enviar(HTTPStatus.SERVICE_UNAVAILABLE, "text/plain; charset=utf-8",
+                                f"{e}\n".encode("utf-8"), cuerpo)
+        except Exception:
+            logger.exception("Error al exportar %s", ruta)
+            return self._enviar(HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain; charset=utf-8",
+                                b"Error al calcular la tabla\n", cuerpo)
+        self._enviar_por_bloques(df, formato, cuerpo, clave, descarga=f"{tabla}.{formato}")
+
+    def _encabezados(self, estado, tipo, clave, descarga):
+        self.send_response(estado)
+        if clave is not None:
+            self.send_header("ETag", clave)
+            # Se puede guardar, pero hay que revalidar (If-None-Match) en cada uso
+            self.send_header("Cache-Control", "no-cache")
+        if tipo is not None:
+            self.send_header("Content-Type", tipo)
+        if descarga is not None:
+            self.send_header("Content-Disposition", f'inline; filename="{descarga}"')
+
+    def _enviar(self, estado, tipo, contenido, cuerpo, clave=None, descarga=None):
+        self._encabezados(estado, tipo, clave, descarga)
+        if estado != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(contenido)))
+        self.end_headers()
+        if cuerpo:
+            self.wfile.write(contenido)
+
+    # Tabla serializada por bloques a medida que se envía (chunked). Si falla
+    # a mitad de camino ya no se puede cambiar el estado: se corta la conexión.
+    def _enviar_por_bloques(self, df, formato, cuerpo, clave, descarga):
+        self._encabezados(HTTPStatus.OK, FORMATOS[formato], clave, descarga)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if not cuerpo:
+            return
+        try:
+            for bloque in serializar(df, formato):
+                if bloque:
+                    self.wfile.write(f"{len(bloque):X}\r\n".encode("ascii") + bloque + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception:
+            logger.exception("Error al enviar %s", descarga)
+            self.close_connection = True
+
+    def log_message(self, formato, *args):
+        logger.info("%s %s", self.address_string(), formato % args)
+
+
+# Servir la exportación por HTTP (hasta Ctrl+C). Sin paquete precalculado, el
+# refresco en segundo plano publica las versiones nuevas de inputs/ como en la app.
+def servir(host="127.0.0.1", puerto=PUERTO_POR_DEFECTO):
+    if not precalculados.activo():
+        refresco.iniciar()
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorExportacion)
+    logger.info("Exportación en http://%s:%d/", host, servidor.server_port)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta las tablas del dashboard (CSV, JSON o Parquet)")
+    parser.add_argument("tabla", nargs="?", choices=list(TABLAS), help="tabla a exportar")
+    parser.add_argument("--formato", choices=list(FORMATOS), default="csv")
+    parser.add_argument("--salida", help="archivo de salida (por defecto la salida estándar)")
+    parser.add_argument("--si-cambio", metavar="ETAG",
+                        help="no escribir nada si el ETag actual es este (sale con código 3)")
+    parser.add_argument("--listar", action="store_true", help="listar las tablas exportables")
+    parser.add_argument("--servir", action="store_true", help="servir la exportación por HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    args = parser.parse_args(argv)
+    if args.datos:
+        carga_datos.usar_carpeta_entradas(Path(args.datos))
+    if args.servir:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        servir(args.host, args.puerto)
+        return 0
+    if args.listar or args.tabla is None:
+        for nombre, (descripcion, _) in TABLAS.items():
+            print(f"{nombre:28} {descripcion}")
+        return 0
+    if args.si_cambio is not None:
+        clave = etag_actual(args.tabla, args.formato)
+        if coincide(f'"{args.si_cambio.strip(chr(34))}"', clave):
+            print(f"ETag: {clave}", file=sys.stderr)
+            return 3
+    clave, df = exportar(args.tabla, args.formato)
+    print(f"ETag: {clave}", file=sys.stderr)
+    with (open(args.salida, "wb") if args.salida else contextlib.nullcontext(sys.stdout.buffer)) as salida:
+        for bloque in serializar(df, args.formato):
+            salida.write(bloque)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import instrumentacion
+
+# Figuras de plotly memorizadas por versión de datos y parámetros del gráfico.
+# Una figura se arma una sola vez por (nombre, versión, parámetros); en los
+# reruns siguientes se devuelve la misma, así su spec JSON sale idéntico y
+# Streamlit manda al navegador solo la referencia al mensaje que ya tiene (ver
+# minCachedMessageSize en .streamlit/config.toml).
+#
+# Antes de memorizarla, la figura se compacta en el servidor: las líneas con
+# muchos puntos se reducen a los extremos (mínimo y máximo) de cada tramo y
+# las coordenadas se redondean; las barras con muchas categorías se cortan con
+# top_n antes de armar la figura, y las líneas con muchos grupos con
+# top_n_grupos.
+#
+# Las figuras memorizadas se comparten entre sesiones: no se deben modificar.
+
+MAXIMO_FIGURAS = 64
+# Barras por gráfico (el resto se suma en "Otros") y puntos por línea
+MAXIMO_BARRAS = 25
+MAXIMO_PUNTOS = 1000
+# Líneas por gráfico (el resto se suma en "Otros") y puntos entre todas las
+# líneas de una figura
+MAXIMO_LINEAS = 10
+MAXIMO_PUNTOS_FIGURA = 20_000
+# Decimales de lat/lon (~1 m)
+DECIMALES_COORDENADAS = 5
+
+ETIQUETA_OTROS = "Otros"
+
+# Atributos de una traza con un valor por punto
+_POR_PUNTO = ("x", "y", "customdata", "text", "hovertext")
+
+_figuras = OrderedDict()
+_lock = threading.Lock()
+
+
+# Las n categorías con más valor (de mayor a menor) y el resto sumado en
+# "Otros"; el índice queda como texto
+def top_n(serie, n=MAXIMO_BARRAS, otros=ETIQUETA_OTROS):
+    serie = serie.sort_values(ascending=False, kind="stable")
+    primeras = serie.iloc[:n]
+    primeras.index = primeras.index.astype("string").fillna("Sin dato")
+    if len(serie) > n:
+        resto = pd.Series([serie.iloc[n:].sum()], index=pd.Index([otros], dtype="string"))
+        primeras = pd.concat([primeras, resto])
+    return primeras.rename(serie.name)
+
+
+# Filas de una tabla larga con solo los n grupos (valores de la columna
+# grupo) de más valor en total; las filas de los demás se suman en "Otros" por
+# el resto de las columnas. La columna grupo queda como texto.
+def top_n_grupos(df, grupo, valores, n=MAXIMO_LINEAS, otros=ETIQUETA_OTROS):
+    etiquetas = df[grupo].astype("string").fillna("Sin dato")
+    totales = df[valores].sum(axis=1).groupby(etiquetas).sum()
+    principales = totales.sort_values(ascending=False, kind="stable").index[:n]
+    etiquetas = etiquetas.where(etiquetas.isin(principales), otros)
+    resultado = df.assign(**{grupo: etiquetas})
+    if len(totales) <= n:
+        return resultado
+    claves = [c for c in df.columns if c != grupo and c not in valores]
+    return resultado.groupby([*claves, grupo], sort=False)[valores].sum().reset_index()
+
+
+# Posiciones a conservar de una línea de n puntos: el primero, el último y el
+# mínimo y máximo de cada uno de maximo // 2 tramos (así se ven los picos)
+def reducir_puntos(y, maximo=MAXIMO_PUNTOS):
+    n = len(y)
+    if n <= maximo:
+        return np.arange(n)
+    tramos = max(maximo // 2, 1)
+    tramo = np.arange(n) * tramos // n
+    orden = np.lexsort((np.asarray(y, dtype=float), tramo))
+    inicios = np.searchsorted(tramo, np.arange(tramos))
+    finales = np.append(inicios[1:], n) - 1
+    return np.unique(np.concatenate([[0, n - 1], orden[inicios], orden[finales]]))
+
+
+# Compactar en el lugar una figura recién armada (ver arriba). Con varias
+# líneas, MAXIMO_PUNTOS_FIGURA se reparte entre ellas.
+def compactar(figura):
+    lineas = sum(t.type in ("scatter", "scattergl") and t.y is not None for t in figura.data)
+    maximo = min(MAXIMO_PUNTOS, max(MAXIMO_PUNTOS_FIGURA // max(lineas, 1), 200))
+    for traza in figura.data:
+        if traza.type in ("scatter", "scattergl") and traza.y is not None and len(traza.y) > maximo:
+            posiciones = reducir_puntos(traza.y, maximo)
+            cambios = {}
+            for atributo in _POR_PUNTO:
+                valores = traza[atributo]
+                if valores is not None and not isinstance(valores, str) and len(valores) == len(traza.y):
+                    cambios[atributo] = np.asarray(valores)[posiciones]
+            traza.update(cambios)
+        elif traza.type == "scattermapbox":
+            traza.update(lat=np.round(np.asarray(traza.lat, dtype=float), DECIMALES_COORDENADAS),
+                         lon=np.round(np.asarray(traza.lon, dtype=float), DECIMALES_COORDENADAS))
+    return figura
+
+
+# Figura memorizada: construir() se llama solo si no hay una para este nombre,
+# versión de datos y parámetros (tupla de valores hashables)
+def figura(nombre, version, parametros, construir):
+    clave = (nombre, version, parametros)
+    with _lock:
+        en_cache = _figuras.get(clave)
+        if en_cache is not None:
+            _figuras.move_to_end(clave)
+            instrumentacion.acierto("figuras")
+            return en_cache
+    instrumentacion.fallo("figuras")
+    inicio = time.perf_counter()
+    resultado = compactar(construir())
+    instrumentacion.registrar_tiempo(f"figura.{nombre}", time.perf_counter() - inicio)
+    with _lock:
+        _figuras[clave] = resultado
+        while len(_figuras) > MAXIMO_FIGURAS:
+            _figuras.popitem(last=False)
+    return resultado
+
+
+def limpiar():
+    with _lock:
+        _figuras.clear()
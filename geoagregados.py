@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+import carga_datos
+
+ARCHIVO_FAVORITOS_COLAPSADO = "favorite_collapsed.csv"
+COLUMNAS_MAPA = ["lat", "lng", "cuadricula_id", "km8_id", "total_favorites"]
+
+# Agrupaciones del mapa de favoritos: hexágonos calculados según el zoom o
+# las celdas que ya trae el archivo (cuadrícula fina y km8)
+AGRUPACIONES = {
+    "Hexágonos": None,
+    "Cuadrícula": "cuadricula_id",
+    "km8": "km8_id",
+}
+
+# Lado aproximado de un hexágono en píxeles de pantalla (en cualquier zoom)
+PIXELES_HEXAGONO = 24
+ZOOM_POR_DEFECTO = 10
+# Niveles de zoom que ofrece el mapa
+ZOOMS = range(8, 15)
+
+_RAIZ_3 = np.sqrt(3)
+
+
+# Coordenadas Web Mercator en grados (la proyección del mapa base), así los
+# hexágonos se ven regulares en pantalla
+def _a_mercator(lat):
+    return np.degrees(np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)))
+
+
+def _desde_mercator(y):
+    return np.degrees(2 * np.arctan(np.exp(np.radians(y))) - np.pi / 2)
+
+
+# Lado del hexágono (grados Mercator) para que mida PIXELES_HEXAGONO en este zoom
+def lado_hexagono(zoom):
+    return PIXELES_HEXAGONO * 360 / (256 * 2 ** zoom)
+
+
+# Celda hexagonal (q, r) de cada punto: coordenadas axiales de hexágonos con
+# vértice arriba, redondeadas en coordenadas cúbicas
+def celdas_hexagonales(lat, lng, lado):
+    x = np.asarray(lng, dtype=float)
+    y = _a_mercator(np.asarray(lat, dtype=float))
+    q = (_RAIZ_3 / 3 * x - y / 3) / lado
+    r = (2 / 3 * y) / lado
+    s = -q - r
+    q_red, r_red, s_red = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(q_red - q), np.abs(r_red - r), np.abs(s_red - s)
+    corregir_q = (dq > dr) & (dq > ds)
+    corregir_r = ~corregir_q & (dr > ds)
+    q_red = np.where(corregir_q, -r_red - s_red, q_red)
+    r_red = np.where(corregir_r, -q_red - s_red, r_red)
+    return q_red.astype("int64"), r_red.astype("int64")
+
+
+# Centro (lat, lng) de cada celda hexagonal
+def centros_hexagonales(q, r, lado):
+    x = lado * (_RAIZ_3 * q + _RAIZ_3 / 2 * r)
+    y = lado * 1.5 * r
+    return _desde_mercator(y), x
+
+
+def _resumir(grupos):
+    return grupos.agg(
+        total_favorites=("total_favorites", "sum"),
+        postulantes=("total_favorites", "size"),
+        lat=("lat", "mean"),
+        lng=("lng", "mean"),
+    )
+
+
+# Favoritos sumados por celda del archivo (cuadricula_id / km8_id), ubicados en
+# el promedio de los postulantes de la celda
+def agregar_por_celda(df, columna):
+    con_ubicacion = df.dropna(subset=["lat", "lng", columna])
+    celdas = _resumir(con_ubicacion.groupby(columna))
+    return celdas.reset_index().rename(columns={columna: "celda"})
+
+
+# Favoritos sumados por hexágono, ubicados en el centro del hexágono
+def agregar_por_hexagono(df, zoom=ZOOM_POR_DEFECTO):
+    con_ubicacion = df.dropna(subset=["lat", "lng"])
+    lado = lado_hexagono(zoom)
+    q, r = celdas_hexagonales(con_ubicacion["lat"], con_ubicacion["lng"], lado)
+    celdas = _resumir(con_ubicacion.assign(q=q, r=r).groupby(["q", "r"])).reset_index()
+    celdas["lat"], celdas["lng"] = centros_hexagonales(celdas["q"], celdas["r"], lado)
+    celdas["celda"] = celdas["q"].astype(str) + "," + celdas["r"].astype(str)
+    return celdas.drop(columns=["q", "r"])
+
+
+# Celdas del mapa de favoritos para la agrupación y el zoom elegidos (una vez
+# por versión del archivo); solo estas filas llegan al navegador
+def celdas_favoritos(agrupacion="Hexágonos", zoom=ZOOM_POR_DEFECTO):
+    columna = AGRUPACIONES[agrupacion]
+
+    def calcular():
+        presentes = carga_datos.columnas_entrada(ARCHIVO_FAVORITOS_COLAPSADO)
+        df = carga_datos.leer_entrada(ARCHIVO_FAVORITOS_COLAPSADO,
+                                      [c for c in COLUMNAS_MAPA if c in presentes])
+        if not {"lat", "lng"} <= set(df.columns) or (columna is not None and columna not in df.columns):
+            return None
+        if columna is None:
+            return agregar_por_hexagono(df, zoom)
+        return agregar_por_celda(df, columna)
+
+    clave = ("celdas_favoritos", agrupacion, zoom if columna is None else None)
+    return carga_datos.calcular_derivado(clave, [ARCHIVO_FAVORITOS_COLAPSADO], calcular)
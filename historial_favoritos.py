@@ -0,0 +1,169 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+import carga_datos
+
+ARCHIVO_FAVORITOS = "favorite.csv"
+ARCHIVO_HISTORIAL = "favorite_campus_history.csv"
+
+COLUMNAS_FAVORITOS = ["favorite_rank", "user", "campus_code", "created"]
+COLUMNAS_HISTORIAL = ["user", "campus_code", "created", "favorite_rank_action",
+                      "favorite_added", "favorite_removed"]
+
+FILAS_POR_BLOQUE = 100_000
+
+
+# Carpeta del resumen mantenido por la ingesta incremental (ingesta_incremental.py)
+def carpeta_resumen():
+    return carga_datos.BASE_PATH_ALMACEN / "resumen_favoritos"
+
+
+# Resumen de favoritos calculado a partir de los eventos.
+# por_usuario / por_campus: favoritos vigentes (favorite.csv) y altas/bajas
+# (historial); rangos: favoritos vigentes por posición; linea_tiempo: conteos
+# diarios de favoritos creados, agregados, removidos y cambios de posición.
+@dataclass(frozen=True)
+class ResumenFavoritos:
+    por_usuario: pd.DataFrame
+    por_campus: pd.DataFrame
+    rangos: pd.Series
+    linea_tiempo: pd.DataFrame
+    filas_favoritos: int
+    filas_historial: int
+
+
+# Acumula los conteos bloque a bloque; la memoria depende del número de
+# usuarios, campus y días distintos, no del largo del historial.
+class AcumuladorFavoritos:
+    def __init__(self):
+        self.por_usuario = {}
+        self.por_campus = {}
+        self.rangos = None
+        self.linea_tiempo = {}
+        self.filas_favoritos = 0
+        self.filas_historial = 0
+
+    # Retomar la acumulación desde un resumen ya calculado (ingesta incremental)
+    @classmethod
+    def desde_resumen(cls, resumen):
+        acumulador = cls()
+        acumulador.por_usuario = {c: resumen.por_usuario[c] for c in resumen.por_usuario.columns}
+        acumulador.por_campus = {c: resumen.por_campus[c] for c in resumen.por_campus.columns}
+        acumulador.rangos = resumen.rangos
+        acumulador.linea_tiempo = {c: resumen.linea_tiempo[c] for c in resumen.linea_tiempo.columns}
+        acumulador.filas_favoritos = resumen.filas_favoritos
+        acumulador.filas_historial = resumen.filas_historial
+        return acumulador
+
+    @staticmethod
+    def _sumar(acumulados, columna, conteo):
+        previo = acumulados.get(columna)
+        acumulados[columna] = conteo if previo is None else previo.add(conteo, fill_value=0)
+
+    # signo=-1 descuenta filas (versión anterior de un favorito modificado)
+    def agregar_favoritos(self, bloque, signo=1):
+        self.filas_favoritos += signo * len(bloque)
+        self._sumar(self.por_usuario, "favoritos", signo * bloque["user"].value_counts())
+        self._sumar(self.por_campus, "favoritos", signo * bloque["campus_code"].value_counts())
+        rangos = signo * bloque["favorite_rank"].value_counts()
+        self.rangos = rangos if self.rangos is None else self.rangos.add(rangos, fill_value=0)
+        dias = bloque["created"].dt.floor("D")
+        self._sumar(self.linea_tiempo, "creados", signo * dias.value_counts())
+
+    def agregar_historial(self, bloque):
+        self.filas_historial += len(bloque)
+        dias = bloque["created"].dt.floor("D")
+        agregados = bloque["favorite_added"]
+        removidos = bloque["favorite_removed"]
+        for columna, mascara in (("agregados", agregados), ("removidos", removidos)):
+            self._sumar(self.por_usuario, columna, bloque.loc[mascara, "user"].value_counts())
+            self._sumar(self.por_campus, columna, bloque.loc[mascara, "campus_code"].value_counts())
+            self._sumar(self.linea_tiempo, columna, dias[mascara].value_counts())
+        accion = bloque["favorite_rank_action"]
+        self._sumar(self.linea_tiempo, "subidas", dias[accion == "UP"].value_counts())
+        self._sumar(self.linea_tiempo, "bajadas", dias[accion == "DOWN"].value_counts())
+
+    @staticmethod
+    def _tabla(acumulados, columnas, nombre_indice):
+        tabla = pd.DataFrame({c: acumulados.get(c, pd.Series(dtype="int64")) for c in columnas})
+        tabla = tabla.fillna(0).astype("int64")
+        tabla = tabla[(tabla != 0).any(axis=1)]
+        tabla.index.name = nombre_indice
+        return tabla
+
+    def resultado(self):
+        columnas = ["favoritos", "agregados", "removidos"]
+        rangos = self.rangos if self.rangos is not None else pd.Series(dtype="int64")
+        rangos = rangos[rangos != 0]
+        return ResumenFavoritos(
+            por_usuario=self._tabla(self.por_usuario, columnas, "user"),
+            por_campus=self._tabla(self.por_campus, columnas, "campus_code")
+                .sort_values("favoritos", ascending=False),
+            rangos=rangos.astype("int64").sort_index().rename_axis("favorite_rank").rename("favoritos"),
+            linea_tiempo=self._tabla(self.linea_tiempo,
+                                     ["creados", "agregados", "removidos", "subidas", "bajadas"],
+                                     "dia").sort_index(),
+            filas_favoritos=self.filas_favoritos,
+            filas_historial=self.filas_historial,
+        )
+
+
+# Recorrer ambos archivos de eventos por bloques y devolver el resumen
+def calcular_resumen(filas_por_bloque=FILAS_POR_BLOQUE):
+    acumulador = AcumuladorFavoritos()
+    for bloque in carga_datos.leer_por_bloques(ARCHIVO_FAVORITOS, COLUMNAS_FAVORITOS, filas_por_bloque):
+        acumulador.agregar_favoritos(bloque)
+    for bloque in carga_datos.leer_por_bloques(ARCHIVO_HISTORIAL, COLUMNAS_HISTORIAL, filas_por_bloque):
+        acumulador.agregar_historial(bloque)
+    return acumulador.resultado()
+
+
+# Persistir un resumen (tablas Parquet + versiones de las fuentes)
+def guardar_resumen(resumen, carpeta, versiones):
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    resumen.por_usuario.to_parquet(carpeta / "por_usuario.parquet")
+    resumen.por_campus.to_parquet(carpeta / "por_campus.parquet")
+    resumen.rangos.to_frame().to_parquet(carpeta / "rangos.parquet")
+    resumen.linea_tiempo.to_parquet(carpeta / "linea_tiempo.parquet")
+    meta = {
+        "versiones": list(versiones),
+        "filas_favoritos": resumen.filas_favoritos,
+        "filas_historial": resumen.filas_historial,
+    }
+    (carpeta / "resumen.json").write_text(json.dumps(meta))
+
+
+# Cargar un resumen persistido; None si no existe o no corresponde a las versiones
+def cargar_resumen(carpeta, versiones=None):
+    carpeta = Path(carpeta)
+    archivo_meta = carpeta / "resumen.json"
+    if not archivo_meta.exists():
+        return None
+    meta = json.loads(archivo_meta.read_text())
+    if versiones is not None and meta["versiones"] != list(versiones):
+        return None
+    return ResumenFavoritos(
+        por_usuario=pd.read_parquet(carpeta / "por_usuario.parquet"),
+        por_campus=pd.read_parquet(carpeta / "por_campus.parquet"),
+        rangos=pd.read_parquet(carpeta / "rangos.parquet")["favoritos"],
+        linea_tiempo=pd.read_parquet(carpeta / "linea_tiempo.parquet"),
+        filas_favoritos=meta["filas_favoritos"],
+        filas_historial=meta["filas_historial"],
+    )
+
+
+# Resumen de la versión actual de los archivos (se recalcula solo si cambian).
+# Si la ingesta incremental ya dejó un resumen para esta versión, se usa ese.
+def resumen_favoritos():
+    def calcular():
+        versiones = carga_datos.version_servida([ARCHIVO_FAVORITOS, ARCHIVO_HISTORIAL])
+        resumen = cargar_resumen(carpeta_resumen(), versiones)
+        return resumen if resumen is not None else calcular_resumen()
+
+    return carga_datos.calcular_derivado(
+        "resumen_favoritos", [ARCHIVO_FAVORITOS, ARCHIVO_HISTORIAL], calcular
+    )
@@ -0,0 +1,56 @@
+import argparse
+import sys
+
+import carga_datos
+import snapshots
+import validacion
+
+# Paso de ingesta: convierte cada inputs/*.csv en un snapshot Parquet tipado y
+# comprimido (inputs/snapshots/). Se corre después de actualizar inputs/:
+#
+#     python ingesta.py                # todos los archivos
+#     python ingesta.py favorite.csv   # solo algunos
+#
+# Un snapshot guarda el hash del CSV del que salió; si el CSV cambia y no se
+# vuelve a correr la ingesta, el dashboard lee el CSV directamente. Un CSV que
+# no cumple su esquema (validacion.py) no genera snapshot.
+
+
+def generar_snapshot(nombre, forzar=False):
+    ruta = carga_datos.ruta_entrada(nombre)
+    huella = carga_datos.huella_archivo(ruta)
+    if not forzar and snapshots.hash_fuente(ruta) == huella[3]:
+        return None
+    validacion.exigir_valida(nombre, ruta, huella[3])
+    df = carga_datos.leer_csv_tipado(nombre)
+    return snapshots.escribir_snapshot(ruta, df, huella[3])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera snapshots Parquet de inputs/*.csv")
+    parser.add_argument("archivos", nargs="*", default=list(carga_datos.ARCHIVOS_ENTRADA))
+    parser.add_argument("--forzar", action="store_true", help="regenerar aunque el snapshot esté vigente")
+    args = parser.parse_args(argv)
+
+    errores = 0
+    for nombre in args.archivos:
+        try:
+            ruta = generar_snapshot(nombre, forzar=args.forzar)
+        except FileNotFoundError:
+            print(f"{nombre}: no encontrado", file=sys.stderr)
+            errores += 1
+            continue
+        except validacion.EntradaInvalida as e:
+            print(e, file=sys.stderr)
+            errores += 1
+            continue
+        if ruta is None:
+            print(f"{nombre}: snapshot vigente")
+        else:
+            tamaño_csv = carga_datos.ruta_entrada(nombre).stat().st_size
+            print(f"{nombre}: {tamaño_csv:,} B -> {ruta.stat().st_size:,} B ({ruta.name})")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import carga_datos
+import historial_favoritos
+import series_tiempo
+import validacion
+
+# Ingesta incremental: cada actualización de inputs/ reemplaza los CSV
+# completos, pero acá solo se guardan las filas nuevas o modificadas desde la
+# última marca de agua (high-water mark). El almacén vive en inputs/almacen/:
+#
+#     marcas.json                      marca, hash y filas por archivo
+#     <archivo>/parte-00000.parquet    filas ingresadas en cada actualización
+#     resumen_favoritos/               resumen de historial_favoritos al día
+#     series/                          particiones diarias de series_tiempo.py
+#
+#     python ingesta_incremental.py              # solo el delta
+#     python ingesta_incremental.py --completo   # reconstruir desde cero
+#
+# El almacén no reemplaza a los CSV: el dashboard sigue cargando cada archivo
+# completo desde inputs/ (por su huella, ver carga_datos.py), y aquí cada CSV
+# que cambió se parsea completo antes de filtrar por la marca, porque el export
+# llega entero. Lo que sale proporcional al delta son los agregados derivados
+# (el resumen de favoritos y las particiones de series); el almacén solo se lee
+# para encontrar la versión anterior de las filas modificadas.
+
+# Archivos con ingesta incremental: columnas que identifican una fila y
+# columna usada como marca de agua. El historial de favoritos es solo de
+# inserción, así que su marca es el id.
+#
+# En el export de notas userId/campusId/createdAt se repite (hay filas
+# duplicadas completas), así que la clave lleva además el número de
+# ocurrencia de la fila entre las que repiten esas columnas y la marca
+# ("ocurrencia"); sin él, leer_almacen juntaría los duplicados y el conteo de
+# filas dejaría de cuadrar con el CSV.
+COLUMNA_OCURRENCIA = "_ocurrencia"
+
+INCREMENTALES = {
+    "mongo_applicants_merged.csv": {
+        "clave": ["userId", "campusId", "createdAt", COLUMNA_OCURRENCIA],
+        "marca": "updatedAt",
+        "ocurrencia": ["userId", "campusId", "createdAt", "updatedAt"],
+    },
+    "favorite.csv": {"clave": ["id"], "marca": "modified"},
+    "favorite_campus_history.csv": {"clave": ["id"], "marca": "id"},
+}
+
+# Sobre este número de partes se compacta el almacén de un archivo
+MAX_PARTES = 20
+
+
+def _archivo_marcas():
+    return carga_datos.BASE_PATH_ALMACEN / "marcas.json"
+
+
+def _carpeta(nombre):
+    return carga_datos.BASE_PATH_ALMACEN / Path(nombre).stem
+
+
+def leer_marcas():
+    archivo = _archivo_marcas()
+    if not archivo.exists():
+        return {}
+    return json.loads(archivo.read_text())
+
+
+def _guardar_marcas(marcas):
+    archivo = _archivo_marcas()
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    temporal = archivo.with_suffix(".json.tmp")
+    temporal.write_text(json.dumps(marcas, indent=2))
+    os.replace(temporal, archivo)
+
+
+def _escribir_parte(df, ruta):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix(".parquet.tmp")
+    df.to_parquet(temporal, index=False)
+    os.replace(temporal, ruta)
+
+
+# Convertir la marca guardada (texto) al tipo de la columna
+def _marca_desde_texto(texto, columna):
+    if texto is None:
+        return None
+    if pd.api.types.is_datetime64_any_dtype(columna):
+        return pd.Timestamp(texto)
+    return int(texto)
+
+
+# Filas vigentes de un archivo en el almacén (la última versión de cada clave),
+# para descontar la versión anterior de las filas modificadas. filtros se pasa
+# a Parquet para leer solo las filas necesarias.
+def leer_almacen(nombre, filtros=None):
+    partes = sorted(_carpeta(nombre).glob("parte-*.parquet"))
+    if not partes:
+        return None
+    df = pd.concat([pd.read_parquet(p, filters=filtros) for p in partes], ignore_index=True)
+    return df.drop_duplicates(subset=INCREMENTALES[nombre]["clave"], keep="last")
+
+
+def _compactar(nombre):
+    carpeta = _carpeta(nombre)
+    df = leer_almacen(nombre)
+    for parte in carpeta.glob("parte-*.parquet"):
+        parte.unlink()
+    _escribir_parte(df, carpeta / "parte-00000.parquet")
+    return 1
+
+
+# Ingresar al almacén las filas nuevas o modificadas de un archivo.
+# Devuelve un informe con el delta y, para las claves que ya existían, la
+# versión anterior de esas filas (para descontarla de los agregados).
+def actualizar_archivo(nombre, completo=False):
+    config = INCREMENTALES[nombre]
+    marcas = leer_marcas()
+    estado = marcas.get(nombre)
+    huella = carga_datos.huella_servida(carga_datos.ruta_entrada(nombre))
+    informe = {"archivo": nombre, "nuevas": 0, "modificadas": 0, "reconstruido": False,
+               "delta": None, "anteriores": None}
+
+    if not completo and estado is not None and estado["hash"] == huella[3]:
+        return informe
+
+    completo = completo or estado is None
+    if completo:
+        shutil.rmtree(_carpeta(nombre), ignore_errors=True)
+        estado = {"marca": None, "partes": 0, "filas": 0}
+
+    columna_marca = config["marca"]
+    marca = None
+    filas_csv = 0
+    bloques = []
+    for bloque in carga_datos.leer_por_bloques(nombre):
+        filas_csv += len(bloque)
+        if marca is None and estado["marca"] is not None:
+            marca = _marca_desde_texto(estado["marca"], bloque[columna_marca])
+        if marca is not None:
+            bloque = bloque[bloque[columna_marca] > marca]
+        if len(bloque):
+            bloques.append(bloque)
+
+    delta = pd.concat(bloques, ignore_index=True) if bloques else None
+    if delta is not None and "ocurrencia" in config:
+        delta[COLUMNA_OCURRENCIA] = delta.groupby(config["ocurrencia"], dropna=False, sort=False).cumcount()
+    anteriores = None
+    if delta is not None and not completo:
+        clave = config["clave"]
+        if len(clave) == 1:
+            anteriores = leer_almacen(nombre, filtros=[(clave[0], "in", delta[clave[0]].tolist())])
+        else:
+            anteriores = leer_almacen(nombre)
+            if anteriores is not None:
+                anteriores = anteriores.merge(delta[clave].drop_duplicates(), on=clave)
+        if anteriores is not None and anteriores.empty:
+            anteriores = None
+
+    modificadas = 0 if anteriores is None else len(anteriores)
+    if delta is not None:
+        _escribir_parte(delta, _carpeta(nombre) / f"parte-{estado['partes']:05d}.parquet")
+        estado["partes"] += 1
+        estado["filas"] += len(delta) - modificadas
+        nueva_marca = delta[columna_marca].max()
+        if marca is not None:
+            nueva_marca = max(nueva_marca, marca)
+        estado["marca"] = str(nueva_marca)
+
+    # La marca de agua no ve filas borradas del export: si el almacén quedó con
+    # más filas que el CSV, se reconstruye ese archivo desde cero.
+    if not completo and estado["filas"] > filas_csv:
+        return actualizar_archivo(nombre, completo=True)
+
+    if estado["partes"] > MAX_PARTES:
+        estado["partes"] = _compactar(nombre)
+
+    estado["hash"] = huella[3]
+    marcas[nombre] = estado
+    _guardar_marcas(marcas)
+
+    informe.update(nuevas=0 if delta is None else len(delta) - modificadas, modificadas=modificadas,
+                   reconstruido=completo, delta=delta, anteriores=anteriores)
+    return informe
+
+
+# Llevar el resumen de favoritos al día aplicando solo los deltas
+def _actualizar_resumen_favoritos(informes, versiones_previas, completo):
+    informe_favoritos = informes[historial_favoritos.ARCHIVO_FAVORITOS]
+    informe_historial = informes[historial_favoritos.ARCHIVO_HISTORIAL]
+    versiones = carga_datos.version_servida(
+        [historial_favoritos.ARCHIVO_FAVORITOS, historial_favoritos.ARCHIVO_HISTORIAL]
+    )
+    previo = None
+    if not (completo or informe_favoritos["reconstruido"] or informe_historial["reconstruido"]):
+        previo = historial_favoritos.cargar_resumen(historial_favoritos.carpeta_resumen(), versiones_previas)
+
+    if previo is None:
+        resumen = historial_favoritos.calcular_resumen()
+    else:
+        acumulador = historial_favoritos.AcumuladorFavoritos.desde_resumen(previo)
+        if informe_favoritos["anteriores"] is not None:
+            acumulador.agregar_favoritos(informe_favoritos["anteriores"], signo=-1)
+        if informe_favoritos["delta"] is not None:
+            acumulador.agregar_favoritos(informe_favoritos["delta"])
+        if informe_historial["delta"] is not None:
+            acumulador.agregar_historial(informe_historial["delta"])
+        resumen = acumulador.resultado()
+    historial_favoritos.guardar_resumen(resumen, historial_favoritos.carpeta_resumen(), versiones)
+
+
+# Escribir las particiones de series de tiempo de la versión actual: si solo
+# cambió el archivo de eventos desde la última versión escrita, se le suman
+# los deltas (y se descuenta la versión anterior de las filas modificadas) en
+# los días afectados; si no, se reconstruyen.
+def _actualizar_series(informes, marcas_previas, completo):
+    for fuente, config in series_tiempo.FUENTES.items():
+        archivos = series_tiempo.archivos_fuente(fuente)
+        particiones = series_tiempo.ParticionesSeries(fuente, carga_datos.version_servida(archivos))
+        # Una versión escrita no cambia (su contenido depende solo de las entradas)
+        if particiones.existe():
+            continue
+        versiones = particiones.versiones
+        previas = series_tiempo.versiones_escritas(fuente)
+        informe = informes[config["archivo"]]
+        incremental = (
+            not completo and not informe["reconstruido"] and previas is not None
+            and previas[0] == marcas_previas.get(config["archivo"], {}).get("hash")
+            and previas[1:] == versiones[1:]
+            and series_tiempo.ParticionesSeries(fuente, previas).existe()
+        )
+        if not incremental:
+            particiones.escribir(series_tiempo.calcular_cubo(fuente))
+            continue
+        cubos = [series_tiempo.cubo_vacio(fuente)]
+        if informe["anteriores"] is not None:
+            cubos.append(series_tiempo.cubo_horario(informe["anteriores"], fuente, signo=-1))
+        if informe["delta"] is not None:
+            cubos.append(series_tiempo.cubo_horario(informe["delta"], fuente))
+        particiones.sumar(previas, pd.concat(cubos, ignore_index=True))
+
+
+# Actualizar todos los archivos incrementales y sus agregados derivados. Todo
+# se lee sobre una caché con las huellas actuales (no la versión publicada que
+# se está sirviendo), así lo que se escribe corresponde a la versión con que
+# se rotula; por ejemplo, las dimensiones de los postulantes de las series.
+def actualizar(completo=False):
+    fijadas = carga_datos.huellas_actuales()
+    # Si algún archivo no cumple su esquema no se ingresa nada (validacion.py)
+    rutas = [carga_datos.ruta_entrada(nombre) for nombre in INCREMENTALES]
+    validacion.exigir_validas({ruta: carga_datos.huella_archivo(ruta) for ruta in rutas})
+    with carga_datos.usando_version(fijadas):
+        return _actualizar(completo)
+
+
+def _actualizar(completo):
+    marcas = leer_marcas()
+    versiones_previas = [
+        marcas.get(n, {}).get("hash")
+        for n in (historial_favoritos.ARCHIVO_FAVORITOS, historial_favoritos.ARCHIVO_HISTORIAL)
+    ]
+    informes = {nombre: actualizar_archivo(nombre, completo) for nombre in INCREMENTALES}
+    versiones = carga_datos.version_servida(
+        [historial_favoritos.ARCHIVO_FAVORITOS, historial_favoritos.ARCHIVO_HISTORIAL]
+    )
+    if completo or list(versiones) != versiones_previas:
+        _actualizar_resumen_favoritos(informes, versiones_previas, completo)
+    _actualizar_series(informes, marcas, completo)
+    return [
+        {k: v for k, v in informe.items() if k not in ("delta", "anteriores")}
+        for informe in informes.values()
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta incremental de inputs/ con marcas de agua")
+    parser.add_argument("--completo", action="store_true", help="descartar el almacén y reconstruirlo")
+    args = parser.parse_args(argv)
+    try:
+        informes = actualizar(completo=args.completo)
+    except validacion.EntradaInvalida as e:
+        print(e, file=sys.stderr)
+        return 1
+    for informe in informes:
+        modo = " (reconstruido)" if informe["reconstruido"] else ""
+        print(f"{informe['archivo']}: {informe['nuevas']} nuevas, {informe['modificadas']} modificadas{modo}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
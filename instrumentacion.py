@@ -0,0 +1,124 @@
+import functools
+import json
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Instrumentación del dashboard: tiempos de cada carga, cálculo derivado y
+# sección, y contadores de aciertos/fallos de las cachés. Todo queda en
+# memoria del proceso (lo muestra el panel de rendimiento de la app y lo
+# exporta exportar()); cada medición también se emite como una línea JSON en
+# el logger "jardines.rendimiento" (nivel DEBUG).
+logger = logging.getLogger("jardines.rendimiento")
+
+_tiempos = {}
+_contadores = {}
+_lock = threading.Lock()
+
+
+class _Tiempo:
+    __slots__ = ("llamadas", "total", "maximo", "ultimo", "bytes")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.ultimo = 0.0
+        self.bytes = None
+
+
+def registrar_tiempo(nombre, segundos, bytes_=None):
+    with _lock:
+        tiempo = _tiempos.get(nombre)
+        if tiempo is None:
+            tiempo = _tiempos[nombre] = _Tiempo()
+        tiempo.llamadas += 1
+        tiempo.total += segundos
+        tiempo.maximo = max(tiempo.maximo, segundos)
+        tiempo.ultimo = segundos
+        if bytes_ is not None:
+            tiempo.bytes = bytes_
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({"medicion": nombre, "segundos": round(segundos, 6), "bytes": bytes_}))
+
+
+def contar(nombre, evento):
+    with _lock:
+        contador = _contadores.setdefault(nombre, {"aciertos": 0, "fallos": 0})
+        contador[evento] += 1
+
+
+def acierto(nombre):
+    contar(nombre, "aciertos")
+
+
+def fallo(nombre):
+    contar(nombre, "fallos")
+
+
+# Medir el bloque: with medir("seccion.uso"): ...
+@contextmanager
+def medir(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_tiempo(nombre, time.perf_counter() - inicio)
+
+
+# Decorador equivalente a medir() para una función completa
+def medido(nombre):
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# Memoria máxima del proceso (MB) según el sistema operativo
+def memoria_maxima_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def tiempos():
+    with _lock:
+        return {
+            nombre: {
+                "llamadas": t.llamadas,
+                "total_s": t.total,
+                "promedio_ms": 1000 * t.total / t.llamadas,
+                "maximo_ms": 1000 * t.maximo,
+                "ultimo_ms": 1000 * t.ultimo,
+                "bytes": t.bytes,
+            }
+            for nombre, t in _tiempos.items()
+        }
+
+
+def contadores():
+    with _lock:
+        return {
+            nombre: {**c, "tasa_aciertos": c["aciertos"] / max(1, c["aciertos"] + c["fallos"])}
+            for nombre, c in _contadores.items()
+        }
+
+
+# Todas las mediciones como un dict serializable a JSON
+def exportar():
+    return {
+        "momento": datetime.now(timezone.utc).isoformat(),
+        "memoria_maxima_mb": memoria_maxima_mb(),
+        "tiempos": tiempos(),
+        "contadores": contadores(),
+    }
+
+
+def reiniciar():
+    with _lock:
+        _tiempos.clear()
+        _contadores.clear()
@@ -0,0 +1,56 @@
+import argparse
+import sys
+
+import pandas as pd
+
+import carga_datos
+import esquemas
+
+# Informe de memoria de los frames de inputs/: inferencia por defecto de
+# pandas, con los tipos declarados y compactado (lo que queda en la caché):
+#
+#     python memoria.py
+#     python memoria.py --datos /tmp/sinteticos
+
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+# MB de cada archivo cargado completo en las tres variantes
+def informe_memoria(nombres=None):
+    filas = []
+    for nombre in nombres or carga_datos.ARCHIVOS_ENTRADA:
+        inferido = pd.read_csv(carga_datos.ruta_entrada(nombre))
+        tipado = carga_datos.leer_csv_tipado(nombre)
+        compacto = esquemas.compactar(tipado, nombre)
+        filas.append({
+            "archivo": nombre,
+            "filas": len(compacto),
+            "inferido_mb": _mb(inferido),
+            "tipado_mb": _mb(tipado),
+            "compacto_mb": _mb(compacto),
+        })
+    return pd.DataFrame(filas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memoria de los frames de inputs/ antes y después de compactar")
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    args = parser.parse_args(argv)
+    if args.datos:
+        carga_datos.usar_carpeta_entradas(args.datos)
+
+    informe = informe_memoria()
+    total = informe[["inferido_mb", "tipado_mb", "compacto_mb"]].sum()
+    print(f"{'archivo':<36}{'filas':>10}{'inferido MB':>13}{'tipado MB':>11}{'compacto MB':>13}")
+    for fila in informe.itertuples():
+        print(f"{fila.archivo:<36}{fila.filas:>10,}{fila.inferido_mb:>13.2f}{fila.tipado_mb:>11.2f}"
+              f"{fila.compacto_mb:>13.2f}")
+    print(f"{'total':<36}{'':>10}{total['inferido_mb']:>13.2f}{total['tipado_mb']:>11.2f}"
+          f"{total['compacto_mb']:>13.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+import carga_datos
+import consultas
+import entidades
+import geoagregados
+import historial_favoritos
+import instrumentacion
+import rotacion_favoritos
+import series_tiempo
+
+# Métricas del dashboard sin Streamlit: cada función recibe los frames (o los
+# resultados del backend de consultas) y devuelve los números y tablas que
+# muestra una sección. streamlit_app.py solo los dibuja; benchmark.py y los
+# jobs por lotes los pueden llamar directamente.
+
+ARCHIVO_EXPLORADO = "explored_campus_collapsed.csv"
+ARCHIVO_FAVORITOS_COLAPSADO = consultas.ARCHIVO_FAVORITOS_COLAPSADO
+
+# Columnas que usa cada sección (proyección al leer)
+COLUMNAS_EXPLORED = ['user', 'email', 'click_campus_card', 'click_campus_pin']
+COLUMNAS_FAVORITES = ['email', 'total_favorites', 'lat', 'lng', 'formatted_address']
+
+# Nombre para mostrar de cada evento de Mixpanel
+ETIQUETAS_COMPORTAMIENTO = {
+    'click_dashboard_menu': 'Clicks Dashboard Menu',
+    'click_reg_user-log-in_log-in-button': 'Clicks Login Button',
+    'click_school_pin': 'Clicks School Pin',
+    'open_school_profile': 'Perfiles Abiertos',
+    'close_school_profile': 'Perfiles Cerrados',
+    'favorite_school_from_list': 'Favoritos Agregados',
+    'remove_favorite_school_from_list': 'Favoritos Removidos',
+    'login': 'Logins',
+    'map_filter_click': 'Filtros de Mapa',
+    'map_grade_click': 'Clicks en Grado',
+}
+ETIQUETAS_CONTENIDO = {
+    'sp_school_leadership': 'Liderazgo Escolar',
+    'sp_school_performance': 'Rendimiento Escolar',
+    'sp_school_photo': 'Fotos Escolares',
+    'sp_school_price': 'Precios',
+    'sp_school_programs': 'Programas',
+    'sp_school_students': 'Estudiantes',
+}
+
+# Columnas de la tabla de comportamiento por usuario
+COLUMNAS_TABLA_COMPORTAMIENTO = {
+    'email': 'Usuario',
+    'click_dashboard_menu': 'Clicks Menú',
+    'click_reg_user-log-in_log-in-button': 'Clicks Login',
+    'click_school_pin': 'Clicks Pins',
+    'open_school_profile': 'Perfiles Abiertos',
+    'close_school_profile': 'Perfiles Cerrados',
+    'favorite_school_from_list': 'Favoritos Agregados',
+    'remove_favorite_school_from_list': 'Favoritos Removidos',
+    'login': 'Logins',
+    'map_filter_click': 'Filtros Mapa',
+    'map_grade_click': 'Clicks Grado',
+    'total_interacciones': 'Total Interacciones',
+}
+
+# Columnas de la tabla de sedes del historial de favoritos
+COLUMNAS_TABLA_SEDES = {
+    'campus_code': 'Código Sede',
+    'campus_name': 'Nombre Sede',
+    'favoritos': 'Favoritos Vigentes',
+    'agregados': 'Agregados',
+    'removidos': 'Removidos',
+    'notas': 'Notas',
+}
+
+# Columnas de la tabla de rotación de favoritos por sede
+COLUMNAS_TABLA_ROTACION = {
+    'campus_code': 'Código Sede',
+    'campus_name': 'Nombre Sede',
+    'agregados': 'Agregados',
+    'removidos': 'Removidos',
+    'netos': 'Netos',
+    'tasa_abandono': 'Tasa de Abandono',
+    'volatilidad': 'Cambios de Posición por Alta',
+    'horas_remover_mediana': 'Horas hasta Remover (mediana)',
+}
+
+# Columnas de la tabla de favoritos por área del postulante
+COLUMNAS_TABLA_AREAS = {
+    'area_id': 'Área',
+    'favoritos': 'Favoritos Vigentes',
+    'usuarios': 'Usuarios con Favoritos',
+    'notas': 'Notas',
+}
+
+# Columnas del informe de cobertura de los cruces entre archivos
+COLUMNAS_TABLA_COBERTURA = {
+    'cruce': 'Cruce',
+    'filas': 'Filas',
+    'filas_con_dato': 'Filas con Dato',
+    'claves': 'Claves',
+    'claves_con_dato': 'Claves con Dato',
+    'cobertura': 'Cobertura',
+}
+
+
+# Opciones de la sección de actividad en el tiempo (ver series_tiempo.py)
+FUENTES_SERIES = {
+    'Favoritos (historial)': 'favoritos',
+    'Notas': 'notas',
+}
+FRECUENCIAS_SERIES = {
+    'Día': 'dia',
+    'Hora': 'hora',
+}
+DESGLOSES_SERIES = {
+    'Sin desglose': None,
+    'Área': 'area_id',
+    'Perfil': 'profile',
+    'has_5': 'has_5',
+    'Cohorte (día)': 'day',
+}
+
+# Columnas de la tabla de cohortes
+COLUMNAS_TABLA_COHORTES = {
+    'day': 'Cohorte (día)',
+    'postulantes': 'Postulantes',
+    'interacciones': 'Interacciones',
+    'exploraciones': 'Exploraciones',
+    'total_favorites': 'Favoritos',
+}
+
+
+# --- Notas ---
+
+# Páginas totales y rango de filas mostradas de una página de notas
+def paginacion_notas(total_filtradas, tamaño_pagina, pagina=1, filas_pagina=None):
+    total_paginas = max(1, -(-total_filtradas // tamaño_pagina))
+    inicio = (pagina - 1) * tamaño_pagina
+    filas_pagina = min(tamaño_pagina, max(0, total_filtradas - inicio)) if filas_pagina is None else filas_pagina
+    return {
+        'total_paginas': total_paginas,
+        'desde': inicio + 1 if total_filtradas else 0,
+        'hasta': inicio + filas_pagina,
+    }
+
+
+# --- Uso de la aplicación (Mixpanel) ---
+
+# Usuarios únicos (Mixpanel ∪ exploración) e interacciones totales
+def metricas_principales(totales, usuarios_mixpanel, usuarios_explorados=()):
+    total_usuarios = len(set(usuarios_mixpanel).union(usuarios_explorados))
+    total_interacciones = totales[consultas.COLUMNAS_INTERACCIONES].sum()
+    return {
+        'total_usuarios': total_usuarios,
+        'total_interacciones': total_interacciones,
+        'promedio_interacciones': total_interacciones / total_usuarios if total_usuarios > 0 else 0,
+    }
+
+
+# Total de cada evento con su nombre para mostrar
+def comportamiento(totales):
+    return {etiqueta: totales[columna] for columna, etiqueta in ETIQUETAS_COMPORTAMIENTO.items()}
+
+
+def contenido_visitado(totales):
+    return {etiqueta: totales[columna] for columna, etiqueta in ETIQUETAS_CONTENIDO.items()}
+
+
+def tabla_comportamiento(df_por_usuario):
+    return df_por_usuario.rename(columns=COLUMNAS_TABLA_COMPORTAMIENTO)
+
+
+# --- Exploración de campus ---
+
+def usuarios_explorados(df_explored):
+    return set(df_explored['user'].dropna())
+
+
+def estadisticas_exploracion(df_explored):
+    clicks_tarjetas = df_explored['click_campus_card'].sum()
+    clicks_pins = df_explored['click_campus_pin'].sum()
+    explorando = (df_explored['click_campus_card'] > 0) | (df_explored['click_campus_pin'] > 0)
+    return {
+        'clicks_tarjetas': clicks_tarjetas,
+        'clicks_pins': clicks_pins,
+        'total_exploraciones': clicks_tarjetas + clicks_pins,
+        'usuarios_explorando': int(explorando.sum()),
+    }
+
+
+# Usuarios con más exploración (tarjetas + pins), en orden ascendente para
+# graficar en barras horizontales (sin modificar el frame cacheado)
+def top_exploradores(df_explored, n=10):
+    actividad = df_explored['click_campus_card'].astype('int64') + df_explored['click_campus_pin'].astype('int64')
+    top = df_explored[['email']].assign(actividad_exploracion=actividad).nlargest(n, 'actividad_exploracion')
+    return top.sort_values('actividad_exploracion', ascending=True)
+
+
+# --- Favoritos ---
+
+def estadisticas_favoritos(df_favorites):
+    return {
+        'total_favoritos': df_favorites['total_favorites'].sum(),
+        'usuarios_con_favoritos': int((df_favorites['total_favorites'] > 0).sum()),
+        'promedio_favoritos': df_favorites['total_favorites'].mean(),
+        'maximo_favoritos': df_favorites['total_favorites'].max(),
+    }
+
+
+def top_favoritos(df_favorites, n=10):
+    top = df_favorites.nlargest(n, 'total_favorites')[['email', 'total_favorites']]
+    return top.sort_values('total_favorites', ascending=True)
+
+
+# Totales del resumen de favorite.csv / favorite_campus_history.csv
+def estadisticas_historial(resumen):
+    por_campus = resumen.por_campus
+    return {
+        'favoritos_vigentes': resumen.filas_favoritos,
+        'colegios_favoritos': int((por_campus['favoritos'] > 0).sum()),
+        'agregados': por_campus['agregados'].sum(),
+        'removidos': por_campus['removidos'].sum(),
+    }
+
+
+# Sedes con más favoritos, con su nombre y sus notas (búsquedas en el índice
+# de entidades)
+def tabla_sedes_favoritas(resumen, indice=None, n=20):
+    tabla = resumen.por_campus.head(n)
+    if indice is not None:
+        sedes = indice.campus.reindex(tabla.index.astype('string'))
+        tabla = tabla.assign(campus_name=sedes['campus_name'].to_numpy(),
+                             notas=sedes['notas'].fillna(0).astype('int64').to_numpy())
+    tabla = tabla.reset_index()
+    return tabla[[c for c in COLUMNAS_TABLA_SEDES if c in tabla.columns]].rename(columns=COLUMNAS_TABLA_SEDES)
+
+
+def tabla_favoritos_por_area(indice):
+    return indice.favoritos_por_area().reset_index().rename(columns=COLUMNAS_TABLA_AREAS)
+
+
+# --- Rotación de favoritos ---
+
+# Sedes con más altas en el historial, con su nombre (índice de entidades)
+def tabla_rotacion(rotacion, indice=None, n=20):
+    tabla = rotacion.por_campus.head(n)
+    if indice is not None:
+        tabla = tabla.assign(campus_name=indice.campus['campus_name'].reindex(tabla.index).to_numpy())
+    tabla = tabla.reset_index()
+    return tabla[[c for c in COLUMNAS_TABLA_ROTACION if c in tabla.columns]].rename(columns=COLUMNAS_TABLA_ROTACION)
+
+
+# Sedes con más altas netas: nombre (o código si no lo hay) y netos
+def sedes_mas_netas(rotacion, indice=None, n=15):
+    sedes = rotacion.por_campus.nlargest(n, 'netos')
+    nombres = sedes.index.to_series()
+    if indice is not None:
+        nombres = indice.campus['campus_name'].reindex(sedes.index).fillna(nombres)
+    return sedes['netos'].set_axis(nombres.to_numpy()).rename_axis('sede')
+
+
+# --- Actividad en el tiempo ---
+
+# Totales por día de cohorte del postulante, a partir de las cohortes de
+# Mixpanel, exploración y favoritos (series_tiempo.cohortes)
+def tabla_cohortes(mixpanel, exploracion, favoritos):
+    interacciones = mixpanel[consultas.COLUMNAS_INTERACCIONES].astype('int64').sum(axis=1)
+    exploraciones = exploracion['click_campus_card'].astype('int64') + exploracion['click_campus_pin'].astype('int64')
+    tabla = (
+        mixpanel[['day', 'postulantes']].assign(interacciones=interacciones)
+        .merge(exploracion[['day']].assign(exploraciones=exploraciones), on='day', how='outer')
+        .merge(favoritos[['day', 'total_favorites']], on='day', how='outer')
+    )
+    columnas = ['postulantes', 'interacciones', 'exploraciones', 'total_favorites']
+    tabla = tabla.fillna({c: 0 for c in columnas}).astype({c: 'int64' for c in columnas})
+    return tabla.sort_values('day').rename(columns=COLUMNAS_TABLA_COHORTES)
+
+
+# --- Secciones completas (leen sus datos y calculan todo lo que muestran) ---
+
+@instrumentacion.medido("metricas.seccion_uso")
+def seccion_uso(backend=None):
+    backend = backend or consultas.backend()
+    totales = backend.totales(consultas.COLUMNAS_COMPORTAMIENTO + consultas.COLUMNAS_CONTENIDO)
+    try:
+        explorados = usuarios_explorados(carga_datos.leer_entrada(ARCHIVO_EXPLORADO, COLUMNAS_EXPLORED))
+    except Exception:
+        explorados = set()
+    return {
+        'principales': metricas_principales(totales, backend.usuarios_mixpanel(), explorados),
+        'comportamiento': comportamiento(totales),
+        'tabla_comportamiento': tabla_comportamiento(
+            backend.comportamiento_por_usuario(consultas.COLUMNAS_COMPORTAMIENTO)),
+        'contenido': contenido_visitado(totales),
+        'usuarios_activos': backend.actividad_por_email(consultas.COLUMNAS_ACTIVIDAD, limite=10),
+        'actividad_por_area': backend.actividad_por_area(consultas.COLUMNAS_ACTIVIDAD),
+    }
+
+
+@instrumentacion.medido("metricas.seccion_exploracion")
+def seccion_exploracion():
+    df_explored = carga_datos.leer_entrada(ARCHIVO_EXPLORADO, COLUMNAS_EXPLORED)
+    return {
+        'estadisticas': estadisticas_exploracion(df_explored),
+        'top_exploradores': top_exploradores(df_explored),
+    }
+
+
+@instrumentacion.medido("metricas.seccion_favoritos")
+def seccion_favoritos(backend=None):
+    backend = backend or consultas.backend()
+    df_favorites = carga_datos.leer_entrada(ARCHIVO_FAVORITOS_COLAPSADO, COLUMNAS_FAVORITES)
+    return {
+        'estadisticas': estadisticas_favoritos(df_favorites),
+        'top_favoritos': top_favoritos(df_favorites),
+        'distribucion': backend.distribucion_favoritos(),
+    }
+
+
+# Celdas del mapa de favoritos (agregadas en el servidor; None si el archivo no
+# trae coordenadas)
+@instrumentacion.medido("metricas.mapa_favoritos")
+def mapa_favoritos(agrupacion="Hexágonos", zoom=geoagregados.ZOOM_POR_DEFECTO):
+    return geoagregados.celdas_favoritos(agrupacion, zoom)
+
+
+@instrumentacion.medido("metricas.seccion_historial_favoritos")
+def seccion_historial_favoritos():
+    resumen = historial_favoritos.resumen_favoritos()
+    indice = entidades.indice_entidades()
+    return {
+        'estadisticas': estadisticas_historial(resumen),
+        'rangos': resumen.rangos,
+        'linea_tiempo': resumen.linea_tiempo,
+        'tabla_sedes': tabla_sedes_favoritas(resumen, indice),
+        'favoritos_por_area': tabla_favoritos_por_area(indice),
+    }
+
+
+# Rotación de favoritos sobre el historial completo (rotacion_favoritos.py)
+@instrumentacion.medido("metricas.seccion_rotacion")
+def seccion_rotacion():
+    rotacion = rotacion_favoritos.rotacion_favoritos()
+    indice = entidades.indice_entidades()
+    return {
+        'totales': rotacion.totales,
+        'tiempo_remover': rotacion.tiempo_remover,
+        'sedes_netas': sedes_mas_netas(rotacion, indice),
+        'tabla_sedes': tabla_rotacion(rotacion, indice),
+    }
+
+
+# Cobertura de los cruces entre archivos (usuario y sede) en la versión actual
+@instrumentacion.medido("metricas.seccion_cobertura")
+def seccion_cobertura():
+    return entidades.indice_entidades().cobertura.rename(columns=COLUMNAS_TABLA_COBERTURA)
+
+
+# Primer y último día con eventos de una fuente con fecha (None si no hay)
+def dias_series(fuente='favoritos'):
+    dias = series_tiempo.particiones(fuente).dias()
+    return (dias[0], dias[-1]) if dias else None
+
+
+# Serie por día u hora de una fuente con fecha en [desde, hasta), con desglose
+# opcional por una dimensión del postulante (la ventana móvil se aplica al dibujar)
+@instrumentacion.medido("metricas.seccion_series")
+def seccion_series(fuente='favoritos', frecuencia='dia', desglose=None, desde=None, hasta=None):
+    return series_tiempo.serie(fuente, frecuencia, () if desglose is None else (desglose,), desde, hasta)
+
+
+@instrumentacion.medido("metricas.seccion_cohortes")
+def seccion_cohortes():
+    return tabla_cohortes(series_tiempo.cohortes('mixpanel'), series_tiempo.cohortes('exploracion'),
+                          series_tiempo.cohortes('favoritos'))
@@ -0,0 +1,167 @@
+import argparse
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import carga_datos
+import compartido
+import consulta_notas
+import consultas
+import entidades
+import historial_favoritos
+import instrumentacion
+import metricas
+import rotacion_favoritos
+
+logger = logging.getLogger(__name__)
+
+# Precarga en paralelo: las lecturas y agregados de los archivos de entrada son
+# independientes entre sí, así que al armar una versión nueva de los datos
+# (refresco.py, precalculo.py) se reparten en tareas que corren a la vez, cada
+# una en su propio proceso. Cada tarea lee sus archivos y calcula sus agregados
+# sobre una caché con las mismas huellas fijadas, y devuelve los frames
+# compactados y los resultados derivados; el proceso principal los incorpora a
+# la versión nueva (carga_datos.construir_version) y solo calcula lo que cruza
+# archivos.
+# El tiempo total queda dado por la tarea más larga y no por la suma.
+#
+# JARDINES_PROCESOS fija cuántas tareas corren a la vez; con 1 no se lanzan
+# procesos y todo se calcula en el proceso principal, como antes. Por defecto
+# se usa una por CPU, pero solo si las entradas suman MINIMO_BYTES: con
+# archivos chicos arrancar los procesos cuesta más de lo que se gana. Una
+# tarea se puede correr sola para medirla:
+#
+#     python paralelo.py notas
+VARIABLE_PROCESOS = "JARDINES_PROCESOS"
+MINIMO_BYTES = 32 * 2**20
+
+
+def _notas():
+    consulta_notas.indice_notas()
+
+
+def _uso():
+    backend = consultas.ConsultasPandas()
+    metricas.seccion_uso(backend)
+    metricas.seccion_exploracion()
+
+
+def _favoritos():
+    metricas.seccion_favoritos(consultas.ConsultasPandas())
+    metricas.mapa_favoritos()
+
+
+# Las series no van aquí: sus particiones las escribe el proceso principal
+# (refresco.precalentar), que las arma una sola vez por versión
+def _historial():
+    historial_favoritos.resumen_favoritos()
+    rotacion_favoritos.rotacion_favoritos()
+
+
+def _entidades():
+    entidades.indice_entidades()
+
+
+# Tareas de la precarga y los archivos que lee cada una
+TAREAS = {
+    "notas": _notas,            # notas de mongo: payloads e índice de texto
+    "uso": _uso,                # Mixpanel y exploración
+    "favoritos": _favoritos,    # favoritos por postulante y celdas del mapa
+    "historial": _historial,    # favorite.csv, historial y su rotación
+    "entidades": _entidades,    # claves de usuario y sede de los seis archivos
+}
+
+
+# Tareas a la vez para entradas con estas huellas (ruta, mtime, tamaño, hash)
+def procesos(fijadas):
+    valor = os.environ.get(VARIABLE_PROCESOS, "")
+    if valor:
+        return int(valor)
+    if sum(huella[2] for huella in fijadas.values()) < MINIMO_BYTES:
+        return 1
+    return os.cpu_count() or 1
+
+
+# Corre en el proceso de una tarea: la tarea sobre una caché nueva con las
+# huellas fijadas por el proceso principal. Con frames compartidos
+# (compartido.py) los frames no se devuelven: el proceso principal abre los
+# mismos archivos Arrow.
+def ejecutar_tarea(nombre, fijadas):
+    cache = carga_datos.construir_version(TAREAS[nombre], fijadas=fijadas)
+    frames = {} if compartido.activo() else cache.frames
+    return frames, cache.derivados
+
+
+# Lanzar una tarea en un intérprete nuevo (python paralelo.py <tarea>). No se
+# usa multiprocessing: bajo Streamlit __main__ es el script de la app, y los
+# procesos hijos lo volverían a ejecutar al arrancar.
+def _lanzar(nombre, fijadas, directorio):
+    entrada = directorio / f"{nombre}.fijadas.pkl"
+    salida = directorio / f"{nombre}.resultado.pkl"
+    entrada.write_bytes(pickle.dumps(fijadas))
+    inicio = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), nombre, "--datos", str(carga_datos.BASE_PATH_INPUTS),
+         "--fijadas", str(entrada), "--salida", str(salida)],
+        check=True, capture_output=True,
+    )
+    frames, derivados = pickle.loads(salida.read_bytes())
+    return frames, derivados, time.perf_counter() - inicio
+
+
+# Frames y derivados de todas las tareas para estas huellas (para
+# carga_datos.construir_version). Si una tarea falla, lo suyo se calcula
+# después en el proceso principal.
+def precargar(fijadas):
+    maximo = min(procesos(fijadas), len(TAREAS))
+    if maximo <= 1:
+        return []
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="jardines-precarga-") as directorio, \
+            ThreadPoolExecutor(max_workers=maximo, thread_name_prefix="precarga") as hilos:
+        futuros = {nombre: hilos.submit(_lanzar, nombre, fijadas, Path(directorio)) for nombre in TAREAS}
+        for nombre, futuro in futuros.items():
+            try:
+                frames, derivados, segundos = futuro.result()
+            except subprocess.CalledProcessError as e:
+                logger.error("Falló la tarea de precarga %s; se calcula en el proceso principal\n%s",
+                             nombre, e.stderr.decode(errors="replace"))
+                continue
+            except Exception:
+                logger.exception("Falló la tarea de precarga %s; se calcula en el proceso principal", nombre)
+                continue
+            instrumentacion.registrar_tiempo(f"precarga.{nombre}", segundos)
+            resultados.append((frames, derivados))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta una tarea de la precarga en paralelo")
+    parser.add_argument("tarea", choices=list(TAREAS))
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    parser.add_argument("--fijadas", help="huellas fijadas (pickle); por defecto las actuales")
+    parser.add_argument("--salida", help="archivo donde dejar frames y derivados (pickle)")
+    args = parser.parse_args(argv)
+    if args.datos:
+        carga_datos.usar_carpeta_entradas(Path(args.datos))
+    fijadas = pickle.loads(Path(args.fijadas).read_bytes()) if args.fijadas else carga_datos.huellas_actuales()
+    inicio = time.perf_counter()
+    frames, derivados = ejecutar_tarea(args.tarea, fijadas)
+    if args.salida:
+        temporal = Path(f"{args.salida}.tmp")
+        temporal.write_bytes(pickle.dumps((frames, derivados), protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(temporal, args.salida)
+    else:
+        print(f"{args.tarea}: {len(frames)} frames, {len(derivados)} derivados "
+              f"en {time.perf_counter() - inicio:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
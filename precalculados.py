@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import carga_datos
+import consulta_notas
+import consultas
+import geoagregados
+import series_tiempo
+import version_datos
+
+# Paquete de resultados precalculados (lo genera precalculo.py): todo lo que
+# muestra el dashboard para una versión de inputs/, en
+# inputs/precalculado/<versión>/ (Parquet para tablas y series, manifiesto JSON
+# para el resto). inputs/precalculado/ACTUAL apunta al paquete vigente.
+#
+# Con JARDINES_PRECALCULADO=1 la app solo lee el paquete: este módulo expone
+# las mismas funciones de sección que metricas.py y un backend de notas.
+VARIABLE_PRECALCULADO = "JARDINES_PRECALCULADO"
+CARPETA_PRECALCULADO = "precalculado"
+ARCHIVO_ACTUAL = "ACTUAL"
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+
+
+def activo():
+    return os.environ.get(VARIABLE_PRECALCULADO, "") == "1"
+
+
+def carpeta_base():
+    return carga_datos.BASE_PATH_INPUTS / CARPETA_PRECALCULADO
+
+
+# --- Formato: cada valor se guarda según su tipo y se describe en el manifiesto ---
+
+def guardar_valor(valor, carpeta, nombre):
+    if valor is None:
+        return {"tipo": "nada"}
+    if isinstance(valor, pd.DataFrame):
+        valor.to_parquet(carpeta / f"{nombre}.parquet")
+        return {"tipo": "tabla", "archivo": f"{nombre}.parquet"}
+    if isinstance(valor, pd.Series):
+        valor.to_frame(name="valor").to_parquet(carpeta / f"{nombre}.parquet")
+        return {"tipo": "serie", "archivo": f"{nombre}.parquet", "nombre": valor.name}
+    if isinstance(valor, dict):
+        return {"tipo": "dict", "valores": [
+            [clave, guardar_valor(v, carpeta, f"{nombre}.{i}")] for i, (clave, v) in enumerate(valor.items())
+        ]}
+    return {"tipo": "valor", "valor": valor.item() if hasattr(valor, "item") else valor}
+
+
+def cargar_valor(descriptor, carpeta):
+    tipo = descriptor["tipo"]
+    if tipo == "nada":
+        return None
+    if tipo == "tabla":
+        return pd.read_parquet(carpeta / descriptor["archivo"])
+    if tipo == "serie":
+        return pd.read_parquet(carpeta / descriptor["archivo"])["valor"].rename(descriptor["nombre"])
+    if tipo == "dict":
+        return {clave: cargar_valor(v, carpeta) for clave, v in descriptor["valores"]}
+    return descriptor["valor"]
+
+
+# Clave de cada variante del mapa dentro del paquete
+def clave_mapa(agrupacion, zoom):
+    return agrupacion if geoagregados.AGRUPACIONES[agrupacion] is not None else f"{agrupacion}|{zoom}"
+
+
+# Clave de cada serie de tiempo dentro del paquete
+def clave_serie(fuente, frecuencia, desglose):
+    return f"{fuente}|{frecuencia}|{desglose or ''}"
+
+
+# --- Lectura del paquete vigente ---
+
+class Paquete:
+    def __init__(self, carpeta):
+        self.carpeta = Path(carpeta)
+        self.manifiesto = json.loads((self.carpeta / ARCHIVO_MANIFIESTO).read_text())
+        self.secciones = {
+            nombre: cargar_valor(descriptor, self.carpeta)
+            for nombre, descriptor in self.manifiesto["secciones"].items()
+        }
+        self.indice_notas = consulta_notas.construir_indice(self.secciones["notas"])
+
+    @property
+    def version(self):
+        return self.manifiesto["version"]
+
+
+_paquete = None
+_lock = threading.Lock()
+
+
+# Paquete al que apunta ACTUAL (se vuelve a leer solo si ACTUAL cambia)
+def paquete_actual():
+    global _paquete
+    puntero = carpeta_base() / ARCHIVO_ACTUAL
+    if not puntero.exists():
+        raise FileNotFoundError(f"No hay resultados precalculados en {carpeta_base()}; correr precalculo.py")
+    version = puntero.read_text().strip()
+    with _lock:
+        if _paquete is None or _paquete.version != version:
+            _paquete = Paquete(carpeta_base() / version)
+        return _paquete
+
+
+def seccion_uso(backend=None):
+    return paquete_actual().secciones["uso"]
+
+
+def seccion_exploracion():
+    return paquete_actual().secciones["exploracion"]
+
+
+def seccion_favoritos(backend=None):
+    return paquete_actual().secciones["favoritos"]
+
+
+def mapa_favoritos(agrupacion="Hexágonos", zoom=geoagregados.ZOOM_POR_DEFECTO):
+    return paquete_actual().secciones["mapa"][clave_mapa(agrupacion, zoom)]
+
+
+def seccion_historial_favoritos():
+    return paquete_actual().secciones["historial_favoritos"]
+
+
+def seccion_rotacion():
+    return paquete_actual().secciones["rotacion"]
+
+
+def seccion_cobertura():
+    return paquete_actual().secciones["cobertura"]
+
+
+def dias_series(fuente="favoritos"):
+    periodos = paquete_actual().secciones["series"][clave_serie(fuente, "dia", None)]["periodo"]
+    return (periodos.min().date(), periodos.max().date()) if len(periodos) else None
+
+
+# El paquete guarda la serie completa; el rango se recorta al leer (y, como en
+# series_tiempo.serie, con desglose quedan solo los periodos con eventos)
+def seccion_series(fuente="favoritos", frecuencia="dia", desglose=None, desde=None, hasta=None):
+    serie = paquete_actual().secciones["series"][clave_serie(fuente, frecuencia, desglose)]
+    if desde is not None:
+        paso = series_tiempo.FRECUENCIAS[frecuencia]
+        serie = serie[serie["periodo"] >= series_tiempo.instante_utc(desde).floor(paso)]
+    if hasta is not None:
+        serie = serie[serie["periodo"] < series_tiempo.instante_utc(hasta)]
+    if desglose is not None:
+        serie = serie[serie[list(series_tiempo.FUENTES[fuente]["conteos"])].ne(0).any(axis=1)]
+    return serie.reset_index(drop=True)
+
+
+def seccion_cohortes():
+    return paquete_actual().secciones["cohortes"]
+
+
+_backend_notas = consultas.ConsultasPandas(indice_notas=lambda: paquete_actual().indice_notas)
+
+
+# Backend de notas sobre el índice del paquete (mismas consultas que ConsultasPandas)
+def backend_notas():
+    return _backend_notas
+
+
+# Versión y frescura de las entradas con las que se generó el paquete
+def version_datos_paquete():
+    entradas = paquete_actual().manifiesto["entradas"]
+    archivos = {}
+    for nombre, frescura in entradas.items():
+        fechas = {c: datetime.fromisoformat(frescura[c]) if frescura[c] else None for c in ("modificado", "commit")}
+        archivos[nombre] = version_datos.FrescuraArchivo(
+            nombre, existe=frescura["existe"], hash=frescura["hash"], tamaño=frescura["tamaño"], **fechas
+        )
+    return version_datos.VersionDatos(clave=tuple(f.hash for f in archivos.values()), archivos=archivos)
@@ -0,0 +1,143 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import carga_datos
+import consulta_notas
+import consultas
+import geoagregados
+import metricas
+import paralelo
+import precalculados
+import refresco
+import validacion
+import version_datos
+
+# Paso de precálculo: calcula una vez todo lo que muestra el dashboard y lo
+# escribe como paquete de resultados versionado (ver precalculados.py). Se
+# corre en el mismo pipeline que actualiza inputs/:
+#
+#     python precalculo.py
+#     JARDINES_PRECALCULADO=1 streamlit run streamlit_app.py
+#
+# La versión del paquete es un hash de los hashes de las seis entradas; si ya
+# existe un paquete para esa versión no se vuelve a calcular (salvo --forzar).
+
+# Paquetes anteriores que se conservan además del vigente
+PAQUETES_ANTERIORES = 2
+
+
+def _frescura_json(frescura, validado=None):
+    return {
+        "existe": frescura.existe,
+        "hash": frescura.hash,
+        "tamaño": frescura.tamaño,
+        "modificado": frescura.modificado.isoformat() if frescura.modificado else None,
+        "commit": frescura.commit.isoformat() if frescura.commit else None,
+        "validacion": None if validado is None else {
+            "validado": validado.validado, "errores": list(validado.errores), "avisos": list(validado.avisos),
+        },
+    }
+
+
+# Todas las secciones del dashboard para la versión actual de inputs/
+def calcular_secciones():
+    backend = consultas.ConsultasPandas()
+    notas = carga_datos.leer_entrada(consulta_notas.ARCHIVO_NOTAS, list(consulta_notas.COLUMNAS_NOTAS))
+    return {
+        "notas": notas.dropna(subset=["email"]).reset_index(drop=True),
+        "uso": metricas.seccion_uso(backend),
+        "exploracion": metricas.seccion_exploracion(),
+        "favoritos": metricas.seccion_favoritos(backend),
+        "mapa": {
+            precalculados.clave_mapa(agrupacion, zoom): metricas.mapa_favoritos(agrupacion, zoom)
+            for agrupacion, columna in geoagregados.AGRUPACIONES.items()
+            for zoom in (geoagregados.ZOOMS if columna is None else [geoagregados.ZOOM_POR_DEFECTO])
+        },
+        "historial_favoritos": metricas.seccion_historial_favoritos(),
+        "rotacion": metricas.seccion_rotacion(),
+        "cobertura": metricas.seccion_cobertura(),
+        "series": {
+            precalculados.clave_serie(fuente, frecuencia, desglose): metricas.seccion_series(fuente, frecuencia, desglose)
+            for fuente in metricas.FUENTES_SERIES.values()
+            for frecuencia in metricas.FRECUENCIAS_SERIES.values()
+            for desglose in metricas.DESGLOSES_SERIES.values()
+        },
+        "cohortes": metricas.seccion_cohortes(),
+    }
+
+
+def _escribir_actual(base, version):
+    temporal = base / f"{precalculados.ARCHIVO_ACTUAL}.tmp"
+    temporal.write_text(version)
+    os.replace(temporal, base / precalculados.ARCHIVO_ACTUAL)
+
+
+def _podar(base, vigente):
+    paquetes = sorted(
+        (p for p in base.iterdir() if p.is_dir() and not p.name.startswith(".") and p.name != vigente),
+        key=lambda p: p.stat().st_mtime, reverse=True,
+    )
+    for anterior in paquetes[PAQUETES_ANTERIORES:]:
+        shutil.rmtree(anterior, ignore_errors=True)
+
+
+# Generar (o reutilizar) el paquete de la versión actual y marcarlo como vigente
+def generar(forzar=False):
+    base = precalculados.carpeta_base()
+    base.mkdir(parents=True, exist_ok=True)
+    version_actual = version_datos.version_datos()
+    version = hashlib.blake2b("|".join(h or "-" for h in version_actual.clave).encode(),
+                              digest_size=8).hexdigest()
+    destino = base / version
+    if destino.exists() and not forzar:
+        _escribir_actual(base, version)
+        return destino, False
+
+    # Con alguna entrada inválida no se genera el paquete (sigue el vigente)
+    fijadas = carga_datos.huellas_actuales()
+    validados = validacion.exigir_validas(fijadas)
+    temporal = base / f".{version}.tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir()
+    # Frames y agregados de esta versión, con la precarga en paralelo
+    carga_datos.publicar_version(carga_datos.construir_version(refresco.precalentar, paralelo.precargar,
+                                                               fijadas=fijadas))
+    secciones = calcular_secciones()
+    manifiesto = {
+        "version": version,
+        "creado": datetime.now(timezone.utc).isoformat(),
+        "entradas": {n: _frescura_json(f, validados.get(n)) for n, f in version_actual.archivos.items()},
+        "secciones": {n: precalculados.guardar_valor(v, temporal, n) for n, v in secciones.items()},
+    }
+    (temporal / precalculados.ARCHIVO_MANIFIESTO).write_text(json.dumps(manifiesto, indent=2, ensure_ascii=False))
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporal, destino)
+    _escribir_actual(base, version)
+    _podar(base, version)
+    return destino, True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula los resultados del dashboard")
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    parser.add_argument("--forzar", action="store_true", help="recalcular aunque ya exista el paquete")
+    args = parser.parse_args(argv)
+    if args.datos:
+        carga_datos.usar_carpeta_entradas(Path(args.datos))
+    try:
+        destino, generado = generar(forzar=args.forzar)
+    except validacion.EntradaInvalida as e:
+        print(f"No se generó el paquete: {e}", file=sys.stderr)
+        return 1
+    print(f"{destino}: {'generado' if generado else 'ya existía'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+import carga_datos
+import consulta_notas
+import consultas
+import metricas
+import paralelo
+import series_tiempo
+import validacion
+
+logger = logging.getLogger(__name__)
+
+# Refresco en segundo plano: un hilo revisa inputs/ cada INTERVALO_SEGUNDOS
+# (solo stat() de los archivos) y, cuando algo cambia, arma una versión nueva
+# de los frames y agregados fuera del camino de las peticiones. La versión se
+# publica de una vez (carga_datos.publicar_version); hasta entonces las
+# sesiones siguen viendo la anterior, completa, sin esperar. Las lecturas y
+# agregados de cada archivo se reparten en un pool de procesos (paralelo.py).
+#
+# Lo que no se precalienta aquí se lee al pedirse, en la versión publicada: del
+# snapshot o frame compartido de ese hash, o del CSV si todavía no cambió (si
+# cambió, carga_datos.VersionNoDisponible hasta que se publique la nueva).
+# Aquí (y en la ingesta incremental) se escriben las particiones de las series
+# de la versión nueva; las consultas solo las leen.
+INTERVALO_SEGUNDOS = 30
+
+
+# Frames y agregados que usa el dashboard al abrirse
+def precalentar():
+    backend = consultas.ConsultasPandas()
+    consulta_notas.indice_notas()
+    metricas.seccion_uso(backend)
+    metricas.seccion_exploracion()
+    metricas.seccion_favoritos(backend)
+    metricas.mapa_favoritos()
+    metricas.seccion_historial_favoritos()
+    metricas.seccion_rotacion()
+    for fuente in series_tiempo.FUENTES:
+        series_tiempo.asegurar_particiones(fuente)
+    metricas.seccion_series()
+    informar_cobertura(metricas.seccion_cobertura())
+
+
+# Cobertura de los cruces de la versión nueva (en el log de cada refresco)
+def informar_cobertura(cobertura):
+    for fila in cobertura.itertuples(index=False):
+        logger.info("Cobertura %s: %.1f%% de %d filas", fila[0], 100 * fila[-1], fila[1])
+
+
+def _firmas():
+    firmas = {}
+    for nombre in carga_datos.ARCHIVOS_ENTRADA:
+        try:
+            info = carga_datos.ruta_entrada(nombre).stat()
+            firmas[nombre] = (info.st_mtime_ns, info.st_size)
+        except FileNotFoundError:
+            firmas[nombre] = None
+    return firmas
+
+
+class Refrescador(threading.Thread):
+    def __init__(self, intervalo=INTERVALO_SEGUNDOS):
+        super().__init__(name="refresco-datos", daemon=True)
+        self.intervalo = intervalo
+        self.firmas = None
+        self.numero = 0
+        self.publicada = None
+        self.error = None
+        self._despertar = threading.Event()
+
+    def run(self):
+        while True:
+            firmas = _firmas()
+            if firmas != self.firmas:
+                self.refrescar(firmas)
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    # Construir y publicar una versión; si falla (o alguna entrada no cumple su
+    # esquema, lo que se revisa antes de leer nada) se sigue sirviendo la anterior
+    def refrescar(self, firmas):
+        try:
+            fijadas = carga_datos.huellas_actuales()
+            validacion.exigir_validas(fijadas)
+            cache = carga_datos.construir_version(precalentar, paralelo.precargar, fijadas=fijadas)
+        except validacion.EntradaInvalida as e:
+            logger.error("No se publica la versión nueva de los datos: %s", e)
+            self.error = e
+            self.firmas = firmas
+            return
+        except Exception as e:
+            logger.exception("No se pudo construir la versión nueva de los datos")
+            self.error = e
+            self.firmas = firmas
+            return
+        carga_datos.publicar_version(cache)
+        self.firmas = firmas
+        self.numero += 1
+        self.publicada = datetime.now(timezone.utc)
+        self.error = None
+        logger.info("Publicada la versión %d de los datos", self.numero)
+
+    # Revisar inputs/ ahora en vez de esperar al próximo intervalo
+    def revisar_ahora(self):
+        self._despertar.set()
+
+
+_refrescador = None
+_lock = threading.Lock()
+
+
+# Arrancar el refresco (uno por proceso; las llamadas siguientes no hacen nada)
+def iniciar(intervalo=INTERVALO_SEGUNDOS):
+    global _refrescador
+    with _lock:
+        if _refrescador is None:
+            _refrescador = Refrescador(intervalo)
+            _refrescador.start()
+        return _refrescador
+
+
+def revisar_ahora():
+    if _refrescador is not None:
+        _refrescador.revisar_ahora()
+
+
+# Versión que se está sirviendo: número, hora de publicación y huella (ruta,
+# mtime_ns, tamaño, hash) de cada entrada. None mientras no haya una publicada.
+def version_servida():
+    fijadas = carga_datos.version_publicada()
+    if _refrescador is None or fijadas is None or _refrescador.publicada is None:
+        return None
+    return {
+        "numero": _refrescador.numero,
+        "publicada": _refrescador.publicada,
+        "huellas": {ruta.name: huella for ruta, huella in fijadas.items()},
+        "error": _refrescador.error,
+    }
@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import carga_datos
+
+# Rotación de favoritos sobre el historial completo (favorite_campus_history.csv):
+# por sede, altas netas, tasa de abandono, volatilidad de la posición y tiempo
+# hasta que un favorito se remueve.
+#
+# Todo se calcula sobre arreglos: los usuarios y sedes se pasan a códigos
+# enteros (las columnas ya vienen como categorías, ver esquemas.compactar), los
+# conteos por sede salen de np.bincount y el tiempo hasta remover, de ordenar
+# los eventos por (usuario, sede, fecha) y acumular el índice de la última
+# alta con np.maximum.accumulate. Sin groupby ni recorridos por usuario, así
+# que escala a millones de eventos.
+#
+# En el historial una alta es favorite_added, una baja favorite_removed, y un
+# cambio de posición una fila sin alta ni baja con favorite_rank_action UP o
+# DOWN (las altas también traen DOWN: la sede entra al final de la lista).
+
+ARCHIVO_HISTORIAL = "favorite_campus_history.csv"
+COLUMNAS_HISTORIAL = ["created", "user", "campus_code", "favorite_rank_action",
+                      "favorite_added", "favorite_removed"]
+
+# Rangos del tiempo hasta remover (segundos, intervalos [a, b))
+BORDES_TIEMPO_REMOVER = [60, 10 * 60, 60 * 60, 24 * 60 * 60, 7 * 24 * 60 * 60]
+ETIQUETAS_TIEMPO_REMOVER = ["< 1 min", "1-10 min", "10-60 min", "1-24 h", "1-7 días", "7+ días"]
+
+
+# por_campus: una fila por sede con altas, bajas, netos, subidas, bajadas,
+# bajas con alta en el historial, tasa de abandono, volatilidad y horas hasta
+# remover (mediana y promedio); tiempo_remover: bajas por rango de tiempo
+# desde su alta; totales: los mismos indicadores para todo el historial.
+@dataclass(frozen=True)
+class RotacionFavoritos:
+    por_campus: pd.DataFrame
+    tiempo_remover: pd.Series
+    totales: dict
+
+
+# Códigos enteros (-1 para NA) y valores de una columna
+def _codigos(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(dtype=np.int64), serie.cat.categories
+    codigos, valores = pd.factorize(serie)
+    return codigos.astype(np.int64), valores
+
+
+def _cociente(numerador, denominador):
+    con_base = denominador > 0
+    resultado = np.full(len(numerador), np.nan)
+    np.divide(numerador, denominador, out=resultado, where=con_base)
+    return resultado
+
+
+# Mediana por grupo de valores ordenados por (grupo, valor): conteos por
+# grupo y dónde empieza cada uno
+def _medianas(valores, conteos):
+    inicios = np.cumsum(conteos) - conteos
+    medianas = np.full(len(conteos), np.nan)
+    con_datos = conteos > 0
+    bajo = inicios[con_datos] + (conteos[con_datos] - 1) // 2
+    alto = inicios[con_datos] + conteos[con_datos] // 2
+    medianas[con_datos] = (valores[bajo] + valores[alto]) / 2
+    return medianas
+
+
+# Segundos desde la alta para cada baja, emparejando cada baja con la última
+# alta del mismo usuario y sede anterior a ella. Las bajas sin alta en el
+# historial (favoritos agregados antes de que empezara), o cuya última alta ya
+# se removió, quedan fuera (máscara False).
+def _segundos_hasta_remover(pares, instantes, altas, bajas):
+    orden = np.lexsort((instantes, pares))
+    pares, instantes, altas, bajas = pares[orden], instantes[orden], altas[orden], bajas[orden]
+    posiciones = np.arange(len(pares))
+    ultima_alta = np.maximum.accumulate(np.where(altas, posiciones, -1))
+    ultima_baja = np.maximum.accumulate(np.where(bajas, posiciones, -1))
+    baja_anterior = np.concatenate([[-1], ultima_baja[:-1]])
+    alta = np.maximum(ultima_alta, 0)
+    validas = bajas & (ultima_alta >= 0) & (pares[alta] == pares) & (ultima_alta > baja_anterior)
+    segundos = (instantes - instantes[alta]) / 1e9
+    return orden, validas, segundos
+
+
+# Indicadores de rotación de un frame de eventos del historial
+def calcular_rotacion(eventos):
+    usuarios, _ = _codigos(eventos["user"])
+    sedes, codigos_sede = _codigos(eventos["campus_code"])
+    conocidos = (usuarios >= 0) & (sedes >= 0)
+    usuarios, sedes = usuarios[conocidos], sedes[conocidos]
+    instantes = pd.DatetimeIndex(eventos["created"]).as_unit("ns").asi8[conocidos]
+    altas = eventos["favorite_added"].to_numpy(dtype=bool)[conocidos]
+    bajas = eventos["favorite_removed"].to_numpy(dtype=bool)[conocidos]
+    acciones, valores_accion = _codigos(eventos["favorite_rank_action"])
+    acciones = acciones[conocidos]
+    movimientos = ~altas & ~bajas
+    n = len(codigos_sede)
+
+    def accion(valor):
+        codigo = valores_accion.get_indexer([valor])[0]
+        return movimientos & (acciones == codigo) if codigo >= 0 else np.zeros(len(acciones), dtype=bool)
+
+    conteos = {
+        "agregados": np.bincount(sedes[altas], minlength=n),
+        "removidos": np.bincount(sedes[bajas], minlength=n),
+        "subidas": np.bincount(sedes[accion("UP")], minlength=n),
+        "bajadas": np.bincount(sedes[accion("DOWN")], minlength=n),
+    }
+
+    # Para el tiempo hasta remover bastan las altas y bajas
+    con_cambio = ~movimientos
+    pares = usuarios[con_cambio] * max(n, 1) + sedes[con_cambio]
+    orden, validas, segundos = _segundos_hasta_remover(pares, instantes[con_cambio], altas[con_cambio],
+                                                       bajas[con_cambio])
+    sede_baja = sedes[con_cambio][orden][validas]
+    horas = segundos[validas] / 3600
+    conteos["removidos_con_alta"] = np.bincount(sede_baja, minlength=n)
+    orden_horas = np.lexsort((horas, sede_baja))
+    mediana = _medianas(horas[orden_horas], conteos["removidos_con_alta"])
+    promedio = _cociente(np.bincount(sede_baja, weights=horas, minlength=n), conteos["removidos_con_alta"])
+
+    cambios = conteos["subidas"] + conteos["bajadas"]
+    por_campus = pd.DataFrame(conteos, index=pd.Index(codigos_sede, dtype="string", name="campus_code"))
+    por_campus.insert(2, "netos", conteos["agregados"] - conteos["removidos"])
+    por_campus["tasa_abandono"] = _cociente(conteos["removidos_con_alta"], conteos["agregados"])
+    por_campus["volatilidad"] = _cociente(cambios, conteos["agregados"])
+    por_campus["horas_remover_mediana"] = mediana
+    por_campus["horas_remover_promedio"] = promedio
+    por_campus = por_campus[(por_campus[list(conteos)] != 0).any(axis=1)]
+
+    rangos = np.searchsorted(BORDES_TIEMPO_REMOVER, segundos[validas], side="right")
+    tiempo_remover = pd.Series(np.bincount(rangos, minlength=len(ETIQUETAS_TIEMPO_REMOVER)),
+                               index=ETIQUETAS_TIEMPO_REMOVER, name="removidos")
+
+    total_altas = int(conteos["agregados"].sum())
+    totales = {
+        "agregados": total_altas,
+        "removidos": int(conteos["removidos"].sum()),
+        "netos": total_altas - int(conteos["removidos"].sum()),
+        "tasa_abandono": int(validas.sum()) / total_altas if total_altas else None,
+        "volatilidad": int(cambios.sum()) / total_altas if total_altas else None,
+        "horas_remover_mediana": float(np.median(horas)) if len(horas) else None,
+    }
+    return RotacionFavoritos(
+        por_campus=por_campus.sort_values(["agregados", "netos"], ascending=False),
+        tiempo_remover=tiempo_remover,
+        totales=totales,
+    )
+
+
+# Rotación de la versión actual del historial (se recalcula solo si cambia)
+def rotacion_favoritos():
+    def calcular():
+        return calcular_rotacion(carga_datos.leer_entrada(ARCHIVO_HISTORIAL, COLUMNAS_HISTORIAL))
+
+    return carga_datos.calcular_derivado("rotacion_favoritos", [ARCHIVO_HISTORIAL], calcular)
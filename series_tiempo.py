@@ -0,0 +1,437 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+import carga_datos
+import entidades
+import esquemas
+import instrumentacion
+
+# Series de tiempo y cohortes sobre los eventos con fecha.
+#
+# Cada fuente con fecha se resume en un cubo de conteos por hora y por
+# dimensión del postulante (area_id, profile, has_5 y day, el día de cohorte
+# del postulante), guardado en particiones diarias en inputs/almacen/series/,
+# un directorio por versión de las entradas (ver ParticionesSeries).
+#
+# Las consultas por rango leen solo las particiones de los días pedidos. La
+# ingesta incremental (ingesta_incremental.py) escribe la versión nueva
+# sumando los deltas a las particiones de los días afectados en vez de
+# recalcular todo el historial.
+#
+# Los archivos *_collapsed.csv (Mixpanel, exploración, favoritos por
+# postulante) no traen la fecha de cada evento: para ellos hay cohortes()
+# (totales por día de cohorte y dimensiones), no series.
+
+ARCHIVO_NOTAS = "mongo_applicants_merged.csv"
+ARCHIVO_HISTORIAL = "favorite_campus_history.csv"
+ARCHIVO_MIXPANEL = "mixpanel_applicants_collapsed.csv"
+ARCHIVO_EXPLORADO = "explored_campus_collapsed.csv"
+ARCHIVO_FAVORITOS_COLAPSADO = "favorite_collapsed.csv"
+
+# Dimensiones del postulante por las que se puede desglosar
+DIMENSIONES = ["area_id", "profile", "has_5", "day"]
+
+# Archivos de donde sale la dimensión de cada usuario (para eventos que solo
+# traen el usuario, como el historial de favoritos)
+ARCHIVOS_POSTULANTES = entidades.ARCHIVOS_POSTULANTES
+
+# Fuentes con fecha: archivo, columna de fecha, columnas leídas y conteos.
+# Los conteos con None cuentan filas; los demás suman filas donde la
+# columna booleana es verdadera.
+FUENTES = {
+    "notas": {
+        "archivo": ARCHIVO_NOTAS,
+        "fecha": "createdAt",
+        "columnas": ["createdAt", "deleted", *DIMENSIONES],
+        "conteos": {"notas": None},
+    },
+    "favoritos": {
+        "archivo": ARCHIVO_HISTORIAL,
+        "fecha": "created",
+        "columnas": ["created", "user", "favorite_added", "favorite_removed"],
+        "conteos": {"agregados": "favorite_added", "removidos": "favorite_removed"},
+    },
+}
+
+# Fuentes sin fecha por evento: archivo y columnas de conteo
+COHORTES = {
+    "mixpanel": (ARCHIVO_MIXPANEL, esquemas.CONTADORES_MIXPANEL),
+    "exploracion": (ARCHIVO_EXPLORADO, esquemas.CONTADORES_EXPLORACION),
+    "favoritos": (ARCHIVO_FAVORITOS_COLAPSADO, ["total_favorites"]),
+}
+
+FRECUENCIAS = {"dia": "D", "hora": "h"}
+
+FILAS_POR_BLOQUE = 100_000
+# Versiones de las particiones que se conservan por fuente
+MAXIMO_VERSIONES = 3
+# Series (rangos y desgloses) guardadas en memoria
+MAXIMO_SERIES = 32
+
+# Series ya calculadas (la más reciente al final; ver serie())
+_series = OrderedDict()
+_lock = threading.Lock()
+
+
+def carpeta_series():
+    return carga_datos.BASE_PATH_ALMACEN / "series"
+
+
+# Entradas de las que depende el cubo de una fuente
+def archivos_fuente(fuente):
+    archivo = FUENTES[fuente]["archivo"]
+    return [archivo] if fuente == "notas" else [archivo, *ARCHIVOS_POSTULANTES]
+
+
+# --- Cubo horario ---
+
+# Dimensiones de cada usuario según los archivos de postulantes
+def postulantes():
+    return entidades.postulantes()[DIMENSIONES]
+
+
+# Conteos por hora y dimensiones de un bloque de eventos de la fuente.
+# Las filas sin dimensión conocida quedan con NA (se cuentan igual).
+# signo=-1 descuenta filas (versión anterior de una fila modificada).
+def cubo_horario(bloque, fuente, dimensiones=None, signo=1):
+    config = FUENTES[fuente]
+    if fuente == "notas":
+        bloque = bloque[~bloque["deleted"]]
+        fechas = bloque[config["fecha"]].dt.tz_localize("UTC")
+        dims = bloque[DIMENSIONES].astype("Int64")
+    else:
+        fechas = bloque[config["fecha"]]
+        usuarios = bloque["user"].astype("string")
+        dims = (dimensiones if dimensiones is not None else postulantes()).reindex(usuarios)
+        dims.index = bloque.index
+    conteos = pd.DataFrame(
+        {nombre: signo * (1 if columna is None else bloque[columna].astype("int64"))
+         for nombre, columna in config["conteos"].items()},
+        index=bloque.index,
+    )
+    cubo = pd.concat([fechas.dt.floor("h").rename("hora"), dims, conteos], axis=1)
+    return _sumar_cubo(cubo, list(config["conteos"]))
+
+
+def _sumar_cubo(cubo, conteos):
+    cubo = cubo.groupby(["hora", *DIMENSIONES], dropna=False)[conteos].sum().reset_index()
+    return cubo[(cubo[conteos] != 0).any(axis=1)].sort_values("hora", ignore_index=True)
+
+
+def cubo_vacio(fuente):
+    columnas = {"hora": "datetime64[ns, UTC]", **{c: "Int64" for c in DIMENSIONES},
+                **{c: "int64" for c in FUENTES[fuente]["conteos"]}}
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in columnas.items()})
+
+
+# Cubo completo de una fuente, recorriendo el archivo por bloques
+def calcular_cubo(fuente, filas_por_bloque=FILAS_POR_BLOQUE):
+    config = FUENTES[fuente]
+    dimensiones = None if fuente == "notas" else postulantes()
+    partes = [
+        cubo_horario(bloque, fuente, dimensiones)
+        for bloque in carga_datos.leer_por_bloques(config["archivo"], config["columnas"], filas_por_bloque)
+    ]
+    if not partes:
+        return cubo_vacio(fuente)
+    return _sumar_cubo(pd.concat(partes, ignore_index=True), list(config["conteos"]))
+
+
+# --- Particiones diarias ---
+
+# Clave del directorio de una versión de las entradas del cubo
+def clave_version(versiones):
+    return hashlib.blake2b("|".join(versiones).encode(), digest_size=8).hexdigest()
+
+
+# Filas del cubo entre desde y hasta (Timestamps UTC, inclusive/exclusive)
+def _recortar(cubo, desde, hasta):
+    if desde is not None:
+        cubo = cubo[cubo["hora"] >= desde]
+    if hasta is not None:
+        cubo = cubo[cubo["hora"] < hasta]
+    return cubo
+
+
+# Escribir un JSON con un temporal propio (pueden escribir varios procesos a la vez)
+def _escribir_json(datos, ruta):
+    with tempfile.NamedTemporaryFile("w", dir=ruta.parent, suffix=".tmp", delete=False) as f:
+        json.dump(datos, f)
+    os.replace(f.name, ruta)
+
+
+# Cubo horario de una fuente guardado como una partición Parquet por día, en
+# un directorio por versión de las entradas:
+#
+#     <fuente>/<clave_version>/dia=2025-07-04.parquet
+#     <fuente>/actual.json            última versión escrita (para la ingesta)
+#
+# Una versión se escribe completa en un directorio temporal y aparece de una
+# vez al renombrarlo, y después no se modifica: las consultas la leen sin
+# locks mientras se escribe la siguiente. Solo escriben la ingesta y el
+# refresco (asegurar_particiones); si dos escriben la misma versión a la vez,
+# queda la primera que se renombra. Se conservan las últimas
+# MAXIMO_VERSIONES.
+class ParticionesSeries:
+    def __init__(self, fuente, versiones, base=None):
+        self.fuente = fuente
+        self.versiones = list(versiones)
+        self.base = Path(base) if base is not None else carpeta_series() / fuente
+        self.carpeta = self.base / clave_version(self.versiones)
+
+    def _ruta(self, dia, carpeta=None):
+        return (carpeta or self.carpeta) / f"dia={dia.isoformat()}.parquet"
+
+    def existe(self):
+        return self.carpeta.is_dir()
+
+    def dias(self):
+        return sorted(date.fromisoformat(p.stem.split("=", 1)[1]) for p in self.carpeta.glob("dia=*.parquet"))
+
+    # Cubo entre desde y hasta (Timestamps UTC, inclusive/exclusive); solo se
+    # leen las particiones de los días del rango
+    def leer(self, desde=None, hasta=None):
+        dias = [
+            d for d in self.dias()
+            if (desde is None or d >= desde.date()) and (hasta is None or d <= hasta.date())
+        ]
+        if not dias:
+            return cubo_vacio(self.fuente)
+        return _recortar(pd.concat([pd.read_parquet(self._ruta(d)) for d in dias], ignore_index=True), desde, hasta)
+
+    # --- Escritura (ingesta y refresco) ---
+
+    def _temporal(self):
+        self.base.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix=f".{self.carpeta.name}.", dir=self.base))
+
+    def _escribir_dia(self, carpeta, dia, cubo):
+        if not cubo.empty:
+            cubo.to_parquet(self._ruta(dia, carpeta), index=False)
+
+    # Renombrar el temporal como la versión (si ya existe, otro la escribió
+    # antes) y registrarla como la última
+    def _publicar(self, temporal):
+        (temporal / "series.json").write_text(json.dumps({"versiones": self.versiones}))
+        try:
+            os.rename(temporal, self.carpeta)
+        except OSError:
+            if not self.existe():
+                raise
+            shutil.rmtree(temporal, ignore_errors=True)
+        _escribir_json({"versiones": self.versiones}, self.base / "actual.json")
+        self._podar()
+
+    # Borrar las versiones más viejas y los temporales abandonados
+    def _podar(self):
+        versiones, ahora = [], time.time()
+        for carpeta in self.base.iterdir():
+            if not carpeta.is_dir():
+                continue
+            if carpeta.name.startswith("."):
+                if ahora - carpeta.stat().st_mtime > 3600:
+                    shutil.rmtree(carpeta, ignore_errors=True)
+            elif carpeta != self.carpeta:
+                versiones.append(carpeta)
+        versiones.sort(key=lambda c: c.stat().st_mtime, reverse=True)
+        for carpeta in versiones[MAXIMO_VERSIONES - 1:]:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    # Escribir esta versión con las particiones del cubo
+    def escribir(self, cubo):
+        temporal = self._temporal()
+        for dia, parte in cubo.groupby(cubo["hora"].dt.date):
+            self._escribir_dia(temporal, dia, parte)
+        self._publicar(temporal)
+
+    # Escribir esta versión como la de `previas` más un cubo parcial (con
+    # conteos negativos para descontar): solo se recalculan las particiones de
+    # los días del cubo, las demás se enlazan desde la versión anterior
+    def sumar(self, previas, cubo):
+        anterior = ParticionesSeries(self.fuente, previas, self.base)
+        conteos = list(FUENTES[self.fuente]["conteos"])
+        temporal = self._temporal()
+        partes = dict(iter(cubo.groupby(cubo["hora"].dt.date)))
+        for dia in anterior.dias():
+            if dia not in partes:
+                try:
+                    os.link(anterior._ruta(dia), self._ruta(dia, temporal))
+                except OSError:
+                    shutil.copy2(anterior._ruta(dia), self._ruta(dia, temporal))
+        for dia, parte in partes.items():
+            ruta = anterior._ruta(dia)
+            if ruta.exists():
+                parte = pd.concat([pd.read_parquet(ruta), parte], ignore_index=True)
+            self._escribir_dia(temporal, dia, _sumar_cubo(parte, conteos))
+        self._publicar(temporal)
+
+
+# Cubo de una fuente en memoria, con las mismas consultas que
+# ParticionesSeries (cuando no hay particiones escritas para la versión)
+class CuboEnMemoria:
+    def __init__(self, fuente, cubo):
+        self.fuente = fuente
+        self.cubo = cubo
+
+    def dias(self):
+        return sorted(self.cubo["hora"].dt.date.unique())
+
+    def leer(self, desde=None, hasta=None):
+        return _recortar(self.cubo, desde, hasta).reset_index(drop=True)
+
+
+# Versiones de las entradas de la última versión escrita de una fuente (None
+# si no hay)
+def versiones_escritas(fuente):
+    archivo = carpeta_series() / fuente / "actual.json"
+    if not archivo.exists():
+        return None
+    return json.loads(archivo.read_text())["versiones"]
+
+
+# Escribir las particiones de la versión servida si faltan (refresco.py, al
+# armar una versión nueva)
+def asegurar_particiones(fuente):
+    particiones_fuente = ParticionesSeries(fuente, carga_datos.version_servida(archivos_fuente(fuente)))
+    if not particiones_fuente.existe():
+        particiones_fuente.escribir(calcular_cubo(fuente))
+    return particiones_fuente
+
+
+# Particiones de la versión servida. Solo lee: si esa versión no está escrita
+# (la ingesta o el refresco todavía no pasaron) el cubo se calcula en memoria.
+def particiones(fuente):
+    def calcular():
+        particiones_fuente = ParticionesSeries(fuente, carga_datos.version_servida(archivos_fuente(fuente)))
+        if particiones_fuente.existe():
+            return particiones_fuente
+        return CuboEnMemoria(fuente, calcular_cubo(fuente))
+
+    return carga_datos.calcular_derivado(("particiones", fuente), archivos_fuente(fuente), calcular)
+
+
+# --- Consultas ---
+
+# Instante UTC de una fecha o texto (sin zona se toma como UTC)
+def instante_utc(valor):
+    if valor is None:
+        return None
+    instante = pd.Timestamp(valor)
+    return instante.tz_localize("UTC") if instante.tz is None else instante.tz_convert("UTC")
+
+
+# Periodos (día u hora) de [desde, hasta); sin límites, los de los periodos
+# observados
+def _periodos(frecuencia, desde, hasta, observados):
+    paso = FRECUENCIAS[frecuencia]
+    inicio = instante_utc(desde).floor(paso) if desde is not None else observados.min()
+    fin = instante_utc(hasta) - pd.Timedelta(1, "ns") if hasta is not None else observados.max()
+    if pd.isna(inicio) or pd.isna(fin):
+        return pd.DatetimeIndex([], tz="UTC")
+    return pd.date_range(inicio, fin.floor(paso), freq=paso)
+
+
+# Serie de la fuente por día u hora en [desde, hasta), desglosada por las
+# dimensiones pedidas. Tabla larga (periodo, dimensiones..., conteos) solo con
+# los periodos con eventos de cada grupo; sin desglose trae todos los periodos
+# del rango (en cero donde no hubo eventos), lista para ventana_movil.
+def agregar_serie(cubo, fuente, frecuencia="dia", desglose=(), desde=None, hasta=None):
+    conteos = list(FUENTES[fuente]["conteos"])
+    desglose = list(desglose)
+    periodo = cubo["hora"].dt.floor(FRECUENCIAS[frecuencia]).rename("periodo")
+    larga = cubo.groupby([periodo, *desglose], dropna=False)[conteos].sum().reset_index()
+    if desglose:
+        return larga
+    return completar_periodos(larga, fuente, frecuencia, (), desde, hasta)
+
+
+# Rellenar con ceros los periodos sin eventos de cada grupo de la serie, para
+# los grupos que se van a dibujar (ver figuras.top_n_grupos) y no para todos
+def completar_periodos(serie, fuente, frecuencia="dia", desglose=(), desde=None, hasta=None):
+    conteos = list(FUENTES[fuente]["conteos"])
+    desglose = list(desglose)
+    grilla = pd.DataFrame({"periodo": _periodos(frecuencia, desde, hasta, serie["periodo"])})
+    # merge empareja también las dimensiones NA
+    if desglose:
+        grilla = grilla.merge(serie[desglose].drop_duplicates(), how="cross")
+    completa = grilla.merge(serie, on=["periodo", *desglose], how="left")
+    return completa.fillna({c: 0 for c in conteos}).astype({c: "int64" for c in conteos})
+
+
+# Ventana móvil: suma de los últimos `ventana` periodos de cada grupo (de una
+# serie con todos sus periodos, ver completar_periodos)
+def ventana_movil(serie, fuente, ventana, desglose=()):
+    conteos = list(FUENTES[fuente]["conteos"])
+    desglose = list(desglose)
+    if not desglose:
+        movil = serie[conteos].rolling(ventana, min_periods=1).sum()
+    else:
+        movil = serie.groupby(desglose, dropna=False)[conteos].rolling(ventana, min_periods=1).sum()
+        movil = movil.reset_index(level=list(range(len(desglose))), drop=True)
+    return serie.assign(**{c: movil[c].astype("int64") for c in conteos})
+
+
+# Serie de la fuente. El rango se acota a los días con particiones, así la
+# serie completa cubre días enteros desde el primer evento hasta el último.
+# Los resultados se guardan en una LRU chica por versión de las entradas y
+# parámetros: cada rango que elige un usuario es una entrada nueva, y en la
+# caché de derivados viviría lo que dura la versión.
+def serie(fuente, frecuencia="dia", desglose=(), desde=None, hasta=None):
+    desglose = tuple(desglose)
+    inicio, fin = instante_utc(desde), instante_utc(hasta)
+    clave = (carga_datos.version_servida(archivos_fuente(fuente)), fuente, frecuencia, desglose, inicio, fin)
+    with _lock:
+        en_cache = _series.get(clave)
+        if en_cache is not None:
+            _series.move_to_end(clave)
+            instrumentacion.acierto("series")
+            return en_cache
+    instrumentacion.fallo("series")
+    with instrumentacion.medir("series.serie"):
+        particiones_fuente = particiones(fuente)
+        dias = particiones_fuente.dias()
+        if dias:
+            primero = instante_utc(dias[0])
+            ultimo = instante_utc(dias[-1]) + pd.Timedelta(days=1)
+            inicio = primero if inicio is None else max(inicio, primero)
+            fin = ultimo if fin is None else min(fin, ultimo)
+        resultado = agregar_serie(particiones_fuente.leer(inicio, fin), fuente, frecuencia, desglose, inicio, fin)
+    with _lock:
+        _series[clave] = resultado
+        while len(_series) > MAXIMO_SERIES:
+            _series.popitem(last=False)
+    return resultado
+
+
+def limpiar():
+    with _lock:
+        _series.clear()
+
+
+# Totales por cohorte: postulantes y suma de cada contador de un archivo
+# *_collapsed.csv, agrupados por las dimensiones pedidas (por defecto el día
+# de cohorte)
+def cohortes(fuente, desglose=("day",)):
+    archivo, contadores = COHORTES[fuente]
+    desglose = list(desglose)
+
+    def calcular():
+        presentes = carga_datos.columnas_entrada(archivo)
+        columnas = [c for c in contadores if c in presentes]
+        df = carga_datos.leer_entrada(archivo, [*desglose, *columnas])
+        grupos = df.groupby(desglose, dropna=False)
+        tabla = grupos[columnas].sum()
+        tabla.insert(0, "postulantes", grupos.size())
+        return tabla.reset_index()
+
+    return carga_datos.calcular_derivado(("cohortes", fuente, tuple(desglose)), [archivo], calcular)
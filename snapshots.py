@@ -0,0 +1,63 @@
+import json
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Los snapshots viven junto a los CSV: inputs/snapshots/<archivo>.parquet
+CARPETA_SNAPSHOTS = "snapshots"
+_CLAVE_FUENTE = b"jardines_fuente"
+
+
+def ruta_snapshot(ruta_csv):
+    ruta_csv = Path(ruta_csv)
+    return ruta_csv.parent / CARPETA_SNAPSHOTS / (ruta_csv.stem + ".parquet")
+
+
+# Hash del CSV con el que se generó el snapshot (None si no existe o es ilegible)
+def hash_fuente(ruta_csv):
+    ruta = ruta_snapshot(ruta_csv)
+    if not ruta.exists():
+        return None
+    try:
+        metadata = pq.read_schema(ruta).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    fuente = metadata.get(_CLAVE_FUENTE)
+    if fuente is None:
+        return None
+    return json.loads(fuente)["hash"]
+
+
+# Leer el snapshot de un CSV solo si corresponde a su contenido actual.
+# Devuelve None cuando no hay snapshot vigente, para que el llamador use el CSV.
+def leer_snapshot(ruta_csv, hash_csv, columnas=None):
+    if hash_fuente(ruta_csv) != hash_csv:
+        return None
+    ruta = ruta_snapshot(ruta_csv)
+    if columnas is not None:
+        disponibles = set(pq.read_schema(ruta).names)
+        columnas = [c for c in columnas if c in disponibles]
+    return pq.read_table(ruta, columns=columnas).to_pandas()
+
+
+# Columnas del snapshot de un CSV si corresponde a ese hash (None si no)
+def columnas_snapshot(ruta_csv, hash_csv):
+    if hash_fuente(ruta_csv) != hash_csv:
+        return None
+    return pq.read_schema(ruta_snapshot(ruta_csv)).names
+
+
+# Escribir el snapshot de forma atómica (archivo temporal + os.replace)
+def escribir_snapshot(ruta_csv, df, hash_csv):
+    ruta = ruta_snapshot(ruta_csv)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(tabla.schema.metadata or {})
+    metadata[_CLAVE_FUENTE] = json.dumps({"archivo": Path(ruta_csv).name, "hash": hash_csv})
+    tabla = tabla.replace_schema_metadata(metadata)
+    temporal = ruta.with_suffix(".parquet.tmp")
+    pq.write_table(tabla, temporal, compression="zstd")
+    os.replace(temporal, ruta)
+    return ruta
@@ -4,15 +4,32 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-import subprocess
+import json
+import os
+import time
 from datetime import datetime
 import pytz
 from pathlib import Path
 
+import carga_datos
+import consultas
+import figuras
+import geoagregados
+import ingesta_incremental
+import instrumentacion
+import metricas
+import precalculados
+import refresco
+import series_tiempo
+import validacion
+import version_datos
+
 # Configuración de rutas
 BASE_PATH = Path(__file__).parent.resolve()
 BASE_PATH_INPUTS = BASE_PATH / "inputs"
 
+inicio_rerun = time.perf_counter()
+
 # Configuración de la página
 st.set_page_config(
     page_title="Dashboard Completo - Jardines",
@@ -20,6 +37,27 @@ st.set_page_config(
     layout="wide"
 )
 
+# Modo precalculado (JARDINES_PRECALCULADO=1): la app solo lee el paquete de
+# resultados de precalculo.py; si no, calcula sobre inputs/ (metricas.py) con
+# el refresco de datos en segundo plano (un hilo por proceso)
+modo_precalculado = precalculados.activo()
+resultados = precalculados if modo_precalculado else metricas
+if not modo_precalculado:
+    refresco.iniciar()
+
+
+# Versión de los datos en uso (la del paquete en modo precalculado)
+def version_en_uso():
+    return precalculados.version_datos_paquete() if modo_precalculado else version_datos.version_datos()
+
+
+# Figura memorizada por versión de los datos servidos (el paquete en modo
+# precalculado) y parámetros del gráfico; ver figuras.py. La versión se
+# consulta en cada llamada porque los fragmentos se vuelven a ejecutar solos.
+def figura(nombre, construir, *parametros):
+    version = precalculados.paquete_actual().version if modo_precalculado else version_datos.version_datos().clave
+    return figuras.figura(nombre, version, parametros, construir)
+
 # BLOQUE DE CSS GLOBAL
 st.markdown("""
     <style>
@@ -169,61 +207,18 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Función para obtener la última hora de actualización desde Git
-def obtener_ultima_actualizacion():
-    fecha_a_mostrar = None
-    mensaje_fecha = "Última Actualización:"
-
-    # Intentar obtener la fecha del último commit de Git
-    try:
-        # Ruta del archivo relativa al repositorio
-        file_path_relative_to_repo = Path("inputs") / "mongo_applicants_merged.csv"
-        
-        # Comando git log para obtener la fecha del último commit
-        result = subprocess.run(
-            ['git', 'log', '-1', '--format=%cd', '--date=iso-strict', str(file_path_relative_to_repo)],
-            cwd=BASE_PATH,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        git_date_str = result.stdout.strip()
-        if git_date_str:
-            # Parsear la fecha obtenida de git y convertir a zona horaria de Chile
-            fecha_utc = datetime.fromisoformat(git_date_str)
-            zona_horaria_chile = pytz.timezone('America/Santiago')
-            fecha_a_mostrar = fecha_utc.astimezone(zona_horaria_chile)
-            mensaje_fecha = "Última Actualización:"
-        else:
-            st.warning(f"Git log no retornó fecha para {file_path_relative_to_repo}.")
-            
-    except FileNotFoundError:
-        st.warning("Error: Comando 'git' no encontrado en el servidor.")
-        mensaje_fecha = "Última Actualización (Error Git - No encontrado):"
-    except subprocess.CalledProcessError as e:
-        st.warning(f"Error al ejecutar comando Git: {e}")
-        mensaje_fecha = "Última Actualización (Error Git):"
-    except Exception as e:
-        st.warning(f"Error inesperado al obtener fecha de Git: {e}")
-        mensaje_fecha = "Última Actualización (Error Inesperado):"
-
-    # Si no se pudo obtener la fecha de Git, usar la fecha de modificación del archivo como respaldo
-    if fecha_a_mostrar is None:
-        try:
-            archivo_mongo = BASE_PATH_INPUTS / "mongo_applicants_merged.csv"
-            if archivo_mongo.exists():
-                fecha_utc = datetime.fromtimestamp(archivo_mongo.stat().st_mtime, tz=pytz.utc)
-                zona_horaria_chile = pytz.timezone('America/Santiago')
-                fecha_a_mostrar = fecha_utc.astimezone(zona_horaria_chile)
-                mensaje_fecha = "Última Actualización (del archivo en Servidor - UTC):"
-            else:
-                mensaje_fecha = "Última Actualización: Archivo no encontrado"
-        except Exception as e:
-            st.warning(f"Error al obtener la fecha de última actualización del archivo: {e}")
-            mensaje_fecha = "Última Actualización: Error Archivo"
-
-    return fecha_a_mostrar, mensaje_fecha
+# Última hora de actualización de las notas (fecha de git o del archivo servido,
+# calculada una vez por versión de datos en version_datos.py)
+def obtener_ultima_actualizacion(version):
+    frescura = version.archivo("mongo_applicants_merged.csv")
+    if not frescura.existe:
+        return None, "Última Actualización: Archivo no encontrado"
+    if frescura.error_git:
+        st.warning(frescura.error_git)
+    zona_horaria_chile = pytz.timezone('America/Santiago')
+    if frescura.origen == "git":
+        return frescura.fecha.astimezone(zona_horaria_chile), "Última Actualización:"
+    return frescura.fecha.astimezone(zona_horaria_chile), "Última Actualización (del archivo en Servidor - UTC):"
 
 # Header azul bonito
 st.markdown("""
@@ -232,34 +227,97 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Agregar botón de actualización al principio
-if st.button("Actualizar Datos"):
-   st.cache_data.clear()
+# Agregar botón de actualización al principio: lleva el resumen de favoritos y
+# las series al día con las filas nuevas o modificadas, y el refresco arma la
+# versión nueva releyendo completos los archivos que cambiaron (los demás
+# siguen cacheados por su huella)
+if modo_precalculado:
+    paquete = precalculados.paquete_actual()
+    creado = datetime.fromisoformat(paquete.manifiesto["creado"]).astimezone(pytz.timezone('America/Santiago'))
+    st.caption(f"Resultados precalculados: paquete {paquete.version}, generado el {creado.strftime('%d/%m/%Y %H:%M:%S')}")
+elif st.button("Actualizar Datos"):
+    try:
+        informes = ingesta_incremental.actualizar()
+        refresco.revisar_ahora()
+        st.success(" · ".join(
+            f"{i['archivo']}: {i['nuevas']} nuevas, {i['modificadas']} modificadas" for i in informes
+        ))
+    except Exception as e:
+        st.warning(f"No se pudo completar la actualización incremental: {e}")
 
 # Obtener y mostrar la última hora de actualización
-fecha_a_mostrar, mensaje_fecha = obtener_ultima_actualizacion()
+version_actual = version_en_uso()
+fecha_a_mostrar, mensaje_fecha = obtener_ultima_actualizacion(version_actual)
 if fecha_a_mostrar:
     st.info(f"{mensaje_fecha} {fecha_a_mostrar.strftime('%d/%m/%Y %H:%M:%S')}")
 else:
     st.info(mensaje_fecha)
 
-# Crear pestañas para organizar el contenido
-tab1, tab2 = st.tabs(["Notas de Usuarios", "Estadísticas de Uso"])
+# Versión de los datos que se está sirviendo
+version = refresco.version_servida()
+if version:
+    publicada = version["publicada"].astimezone(pytz.timezone('America/Santiago'))
+    st.caption(f"Datos en uso: versión {version['numero']}, cargada el {publicada.strftime('%d/%m/%Y %H:%M:%S')}")
+    if version["error"] is not None:
+        st.warning(f"No se pudo cargar la versión más reciente de los datos: {version['error']}")
 
-with tab1:
-    # Título simple adicional
-    st.title('Notas')
+# Entradas servidas que no cumplen su esquema (validacion.py, una revisión por
+# versión de cada archivo): no se cargan y las secciones que las usan muestran
+# el error sin calcular nada. El paquete precalculado ya se generó validado.
+if not modo_precalculado:
+    for validado in validacion.validar_servidas().values():
+        if not validado.valido:
+            st.error(f"{validado.nombre} no cumple el esquema esperado: {'; '.join(validado.errores)}")
+
+# Frescura de cada archivo de entrada
+with st.expander("Frescura de los datos"):
+    st.dataframe(pd.DataFrame([
+        {
+            'Archivo': f.nombre,
+            'Última actualización': f.fecha.astimezone(pytz.timezone('America/Santiago')).strftime('%d/%m/%Y %H:%M:%S')
+            if f.fecha else "No encontrado",
+            'Origen': f.origen or "-",
+            'Tamaño (KB)': round(f.tamaño / 1024, 1) if f.existe else None,
+            'Hash': f.hash[:12] if f.existe else None,
+        }
+        for f in version_actual.archivos.values()
+    ]), hide_index=True)
 
-    # Leer el archivo
-    file_path = 'inputs/mongo_applicants_merged.csv'
-    df = pd.read_csv(file_path)
+# Cobertura de los cruces entre archivos: qué parte de las notas, favoritos e
+# historial encuentra su postulante y su sede (índice de entidades)
+with st.expander("Cobertura de los cruces"):
+    try:
+        cobertura = resultados.seccion_cobertura()
+        st.dataframe(cobertura.assign(Cobertura=(100 * cobertura['Cobertura']).round(1))
+                     .rename(columns={'Cobertura': 'Cobertura (%)'}), hide_index=True)
+    except FileNotFoundError as e:
+        st.error(f"No se encontró el archivo: {e.filename}")
+    except Exception as e:
+        st.error(f"Error al calcular la cobertura de los cruces: {e}")
 
-    # Filtrar solo las filas que tienen email (excluir None, NaN, vacíos)
-    df_con_email = df.dropna(subset=['email'])
+# Navegación entre vistas: a diferencia de st.tabs, solo se ejecuta la vista
+# elegida, así interactuar con las notas no recalcula las estadísticas
+VISTAS = ["Notas de Usuarios", "Estadísticas de Uso"]
+vista = st.radio("Vista:", VISTAS, horizontal=True, label_visibility="collapsed", key="vista")
 
-    # Contadores
-    usuarios_unicos = df_con_email['user'].nunique()
-    total_notas = len(df_con_email)
+
+# Interruptor de una sección de estadísticas: si está apagada no se calcula ni
+# se dibuja nada. Está dentro del fragmento, así que cambiarlo solo vuelve a
+# ejecutar esa sección.
+def seccion_visible(titulo, clave):
+    return st.toggle(f"Mostrar {titulo}", value=True, key=f"mostrar_{clave}")
+
+
+# Vista de notas (los filtros y la paginación solo re-ejecutan este fragmento)
+@st.fragment
+@instrumentacion.medido("vista.notas")
+def vista_notas():
+    # Título simple adicional
+    st.title('Notas')
+
+    # Contadores y opciones de filtro (índice de notas o SQL, según el backend)
+    backend = precalculados.backend_notas() if modo_precalculado else consultas.backend()
+    usuarios_unicos, total_notas, correos, sedes = backend.opciones_notas()
 
     # Mostrar contadores en la parte superior
     col1, col2 = st.columns(2)
@@ -268,42 +326,57 @@ with tab1:
     with col2:
         st.metric("Total de notas", total_notas)
 
-    # Renombrar columnas para mostrar
-    df_mostrar = df_con_email[['timestamp','user', 'email', 'data', 'campus_name', 'campusId']].copy()
-    df_mostrar = df_mostrar.rename(columns={
-        'campus_name': 'Nombre sede',
-        'campusId': 'campus_code',
-        'user': 'Usuario', 
-        'email': 'Correo',
-        'data': 'Nota',
-        'timestamp': 'Fecha'
-    })
-
-    # Ordenar por fecha (más reciente primero)
-    df_mostrar = df_mostrar.sort_values('Fecha', ascending=False)
-
-    # Filtro por usuario
-    usuarios_unicos = sorted(df_mostrar['Correo'].dropna().unique())
-    usuario_seleccionado = st.selectbox(
-        "Filtrar por usuario:",
-        ["Todos los usuarios"] + usuarios_unicos
-    )
-
-    # Aplicar filtro si se selecciona un usuario específico
-    if usuario_seleccionado != "Todos los usuarios":
-        df_filtrado = df_mostrar[df_mostrar['Correo'] == usuario_seleccionado]
-    else:
-        df_filtrado = df_mostrar
+    # Filtros: usuario, sede y texto de la nota
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        usuario_seleccionado = st.selectbox(
+            "Filtrar por usuario:",
+            ["Todos los usuarios"] + correos
+        )
+    with col2:
+        sede_seleccionada = st.selectbox(
+            "Filtrar por sede:",
+            [None] + list(sedes),
+            format_func=lambda codigo: "Todas las sedes" if codigo is None else sedes[codigo]
+        )
+    with col3:
+        texto_buscado = st.text_input("Buscar en la nota:").strip()
+
+    # Paginación: solo se envía al navegador la página visible
+    col1, col2 = st.columns(2)
+    with col1:
+        tamaño_pagina = st.selectbox("Notas por página:", [25, 50, 100, 200], index=1)
+
+    correo = None if usuario_seleccionado == "Todos los usuarios" else usuario_seleccionado
+    total_filtradas = backend.contar_notas(correo, sede_seleccionada, texto_buscado)
+    total_paginas = metricas.paginacion_notas(total_filtradas, tamaño_pagina)['total_paginas']
+    with col2:
+        # La clave depende de los filtros y de la versión de los datos para
+        # volver a la página 1 al cambiarlos
+        version = version_en_uso().clave[0]
+        pagina = st.number_input(
+            "Página:", min_value=1, max_value=total_paginas, value=1, step=1,
+            key=f"pagina_notas_{version}_{correo}_{sede_seleccionada}_{texto_buscado}_{tamaño_pagina}"
+        )
+
+    df_pagina = backend.pagina_notas(correo, sede_seleccionada, texto_buscado, pagina, tamaño_pagina)
+    paginacion = metricas.paginacion_notas(total_filtradas, tamaño_pagina, pagina, len(df_pagina))
+    st.caption(f"Mostrando {paginacion['desde']}–{paginacion['hasta']} "
+               f"de {total_filtradas} notas (página {pagina} de {total_paginas})")
 
     # Mostrar tabla con columnas renombradas (sin índice)
-    st.dataframe(df_filtrado, hide_index=True)
+    st.dataframe(df_pagina, hide_index=True)
 
-with tab2:
-    st.title('Estadísticas de Uso de la Aplicación')
-    
-    # Leer datos de Mixpanel
+
+# Agregados de Mixpanel (cubo precalculado o SQL, según el backend)
+@st.fragment
+@instrumentacion.medido("seccion.uso")
+def seccion_uso():
+    if not seccion_visible('Uso de la Aplicación', 'uso'):
+        return
     try:
-        df_mixpanel = pd.read_csv('inputs/mixpanel_applicants_collapsed.csv')
+        uso = resultados.seccion_uso()
+        principales = uso['principales']
         
         # Métricas principales
         st.subheader('Métricas Principales')
@@ -311,322 +384,505 @@ with tab2:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            # Combinar usuarios únicos de Mixpanel y Explored Campus
-            usuarios_mixpanel = set(df_mixpanel['user'].dropna())
-            
-            # Leer datos de Explored Campus
-            try:
-                df_explored = pd.read_csv('inputs/explored_campus_collapsed.csv')
-                usuarios_explored = set(df_explored['user'].dropna())
-            except:
-                usuarios_explored = set()
-            
-            # Combinar y contar únicos
-            total_usuarios_unicos = len(usuarios_mixpanel.union(usuarios_explored))
-            st.metric("Total Usuarios", total_usuarios_unicos)
-            
-
+            # Usuarios únicos de Mixpanel y Explored Campus
+            st.metric("Total Usuarios", principales['total_usuarios'])
             
         with col2:
-            total_interacciones = df_mixpanel[['click_dashboard_menu', 'click_reg_user-log-in_log-in-button', 
-                                             'click_school_pin', 'open_school_profile', 'favorite_school_from_list']].sum().sum()
-            st.metric("Total Interacciones", f"{total_interacciones:,}")
+            st.metric("Total Interacciones", f"{principales['total_interacciones']:,}")
             
         with col3:
-            avg_interacciones = total_interacciones / total_usuarios_unicos if total_usuarios_unicos > 0 else 0
-            st.metric("Promedio Interacciones/Usuario", f"{avg_interacciones:.1f}")
+            st.metric("Promedio Interacciones/Usuario", f"{principales['promedio_interacciones']:.1f}")
         
         # Análisis de comportamiento
         st.subheader('Análisis de Comportamiento')
         
-        # Calcular métricas de comportamiento
-        comportamiento_metrics = {
-            'Clicks Dashboard Menu': df_mixpanel['click_dashboard_menu'].sum(),
-            'Clicks Login Button': df_mixpanel['click_reg_user-log-in_log-in-button'].sum(),
-            'Clicks School Pin': df_mixpanel['click_school_pin'].sum(),
-            'Perfiles Abiertos': df_mixpanel['open_school_profile'].sum(),
-            'Perfiles Cerrados': df_mixpanel['close_school_profile'].sum(),
-            'Favoritos Agregados': df_mixpanel['favorite_school_from_list'].sum(),
-            'Favoritos Removidos': df_mixpanel['remove_favorite_school_from_list'].sum(),
-            'Logins': df_mixpanel['login'].sum(),
-            'Filtros de Mapa': df_mixpanel['map_filter_click'].sum(),
-            'Clicks en Grado': df_mixpanel['map_grade_click'].sum()
-        }
+        comportamiento_metrics = uso['comportamiento']
         
         # Crear gráfico de barras para comportamiento
-        fig_comportamiento = px.bar(
+        fig_comportamiento = figura('comportamiento', lambda: px.bar(
             x=list(comportamiento_metrics.keys()),
             y=list(comportamiento_metrics.values()),
             title="Interacciones por Tipo",
             color=list(comportamiento_metrics.values()),
             color_continuous_scale='Blues'
-        )
-        fig_comportamiento.update_layout(
+        ).update_layout(
             xaxis_title="Tipo de Interacción",
             yaxis_title="Cantidad",
             showlegend=False,
             height=400
-        )
+        ))
         st.plotly_chart(fig_comportamiento, use_container_width=True)
         
-        # Tabla de usuarios y su comportamiento
+        # Tabla de usuarios y su comportamiento (más activos primero)
         st.subheader('Tabla de Comportamiento por Usuario')
-        
-        # Crear tabla con métricas de comportamiento por usuario
-        df_comportamiento_usuarios = df_mixpanel.groupby('email').agg({
-            'click_dashboard_menu': 'sum',
-            'click_reg_user-log-in_log-in-button': 'sum',
-            'click_school_pin': 'sum',
-            'open_school_profile': 'sum',
-            'close_school_profile': 'sum',
-            'favorite_school_from_list': 'sum',
-            'remove_favorite_school_from_list': 'sum',
-            'login': 'sum',
-            'map_filter_click': 'sum',
-            'map_grade_click': 'sum'
-        }).reset_index()
-        
-        # Calcular total de interacciones por usuario
-        df_comportamiento_usuarios['total_interacciones'] = df_comportamiento_usuarios.drop('email', axis=1).sum(axis=1)
-        
-        # Ordenar por total de interacciones (más activos primero)
-        df_comportamiento_usuarios = df_comportamiento_usuarios.sort_values('total_interacciones', ascending=False)
-        
-        # Renombrar columnas para mejor visualización
-        df_comportamiento_usuarios = df_comportamiento_usuarios.rename(columns={
-            'email': 'Usuario',
-            'click_dashboard_menu': 'Clicks Menú',
-            'click_reg_user-log-in_log-in-button': 'Clicks Login',
-            'click_school_pin': 'Clicks Pins',
-            'open_school_profile': 'Perfiles Abiertos',
-            'close_school_profile': 'Perfiles Cerrados',
-            'favorite_school_from_list': 'Favoritos Agregados',
-            'remove_favorite_school_from_list': 'Favoritos Removidos',
-            'login': 'Logins',
-            'map_filter_click': 'Filtros Mapa',
-            'map_grade_click': 'Clicks Grado',
-            'total_interacciones': 'Total Interacciones'
-        })
-        
-        # Mostrar tabla
-        st.dataframe(df_comportamiento_usuarios, hide_index=True)
+        st.dataframe(uso['tabla_comportamiento'], hide_index=True)
         
         # Análisis de contenido visitado
         st.subheader('Contenido Más Visitado')
         
-        contenido_metrics = {
-            'Liderazgo Escolar': df_mixpanel['sp_school_leadership'].sum(),
-            'Rendimiento Escolar': df_mixpanel['sp_school_performance'].sum(),
-            'Fotos Escolares': df_mixpanel['sp_school_photo'].sum(),
-            'Precios': df_mixpanel['sp_school_price'].sum(),
-            'Programas': df_mixpanel['sp_school_programs'].sum(),
-            'Estudiantes': df_mixpanel['sp_school_students'].sum()
-        }
+        contenido_metrics = uso['contenido']
         
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_contenido = px.pie(
+            fig_contenido = figura('contenido', lambda: px.pie(
                 values=list(contenido_metrics.values()),
                 names=list(contenido_metrics.keys()),
                 title="Distribución de Contenido Visitado"
-            )
+            ))
             st.plotly_chart(fig_contenido, use_container_width=True)
             
         with col2:
             # Top usuarios más activos
             st.subheader('Usuarios Más Activos')
-            df_usuarios_activos = df_mixpanel.groupby('email').agg({
-                'click_dashboard_menu': 'sum',
-                'click_school_pin': 'sum',
-                'open_school_profile': 'sum',
-                'favorite_school_from_list': 'sum'
-            }).sum(axis=1).sort_values(ascending=False).head(10)
+            df_usuarios_activos = uso['usuarios_activos']
             
-            fig_usuarios = px.bar(
+            fig_usuarios = figura('usuarios_activos', lambda: px.bar(
                 x=df_usuarios_activos.values,
                 y=df_usuarios_activos.index,
                 orientation='h',
                 title="Top 10 Usuarios Más Activos"
-            )
-            fig_usuarios.update_layout(height=400)
+            ).update_layout(height=400))
             st.plotly_chart(fig_usuarios, use_container_width=True)
         
-
-        
         # Estadísticas por área
-        if 'area_id' in df_mixpanel.columns:
+        actividad_por_area = uso['actividad_por_area']
+        if actividad_por_area is not None:
             st.subheader('Actividad por Área')
-            actividad_por_area = df_mixpanel.groupby('area_id').agg({
-                'click_dashboard_menu': 'sum',
-                'click_school_pin': 'sum',
-                'open_school_profile': 'sum',
-                'favorite_school_from_list': 'sum'
-            }).sum(axis=1).sort_values(ascending=False)
             
-            fig_area = px.bar(
-                x=actividad_por_area.index,
-                y=actividad_por_area.values,
+            # Solo las áreas con más actividad; el resto va sumado en "Otros"
+            areas = figuras.top_n(actividad_por_area)
+            fig_area = figura('actividad_area', lambda: px.bar(
+                x=areas.index,
+                y=areas.values,
                 title="Actividad por Área ID"
-            )
+            ).update_layout(xaxis_type='category'))
             st.plotly_chart(fig_area, use_container_width=True)
-        
+            
+    except FileNotFoundError:
+        st.error("No se encontró el archivo mixpanel_applicants_collapsed.csv")
+    except Exception as e:
+        st.error(f"Error al procesar los datos de Mixpanel: {e}")
+
+
+# Análisis de Exploración de Campus
+@st.fragment
+@instrumentacion.medido("seccion.exploracion")
+def seccion_exploracion():
+    if not seccion_visible('Exploración de Campus', 'exploracion'):
+        return
+    st.subheader('Análisis de Exploración de Campus')
     
+    try:
+        exploracion = resultados.seccion_exploracion()
+        estadisticas = exploracion['estadisticas']
         
-        # Análisis de Exploración de Campus
-        st.subheader('Análisis de Exploración de Campus')
+        col1, col2, col3, col4 = st.columns(4)
         
-        try:
-            df_explored = pd.read_csv('inputs/explored_campus_collapsed.csv')
-            
-            col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Clicks en Tarjetas Campus", f"{estadisticas['clicks_tarjetas']:,}")
             
-            with col1:
-                total_campus_cards = df_explored['click_campus_card'].sum()
-                st.metric("Clicks en Tarjetas Campus", f"{total_campus_cards:,}")
-                
-            with col2:
-                total_campus_pins = df_explored['click_campus_pin'].sum()
-                st.metric("Clicks en Pins Campus", f"{total_campus_pins:,}")
-                
-            with col3:
-                total_exploraciones = total_campus_cards + total_campus_pins
-                st.metric("Total Exploraciones", f"{total_exploraciones:,}")
-                
-            with col4:
-                usuarios_explorando = len(df_explored[(df_explored['click_campus_card'] > 0) | (df_explored['click_campus_pin'] > 0)])
-                st.metric("Usuarios Explorando", usuarios_explorando)
+        with col2:
+            st.metric("Clicks en Pins Campus", f"{estadisticas['clicks_pins']:,}")
             
-            # Comparación de tipos de exploración
-            col1, col2 = st.columns(2)
+        with col3:
+            st.metric("Total Exploraciones", f"{estadisticas['total_exploraciones']:,}")
             
-            with col1:
-                st.subheader('Comparación de Exploración')
-                
-                exploracion_data = {
-                    'Clicks en Tarjetas': df_explored['click_campus_card'].sum(),
-                    'Clicks en Pins': df_explored['click_campus_pin'].sum()
-                }
-                
-                fig_exploracion = px.pie(
-                    values=list(exploracion_data.values()),
-                    names=list(exploracion_data.keys()),
-                    title="Distribución de Tipos de Exploración",
-                    color_discrete_sequence=['#FF6B6B', '#4ECDC4']
-                )
-                st.plotly_chart(fig_exploracion, use_container_width=True)
+        with col4:
+            st.metric("Usuarios Explorando", estadisticas['usuarios_explorando'])
+        
+        # Comparación de tipos de exploración
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader('Comparación de Exploración')
             
-            with col2:
-                st.subheader('Top Exploradores')
-                
-                # Calcular actividad total de exploración por usuario
-                df_explored['actividad_exploracion'] = df_explored['click_campus_card'] + df_explored['click_campus_pin']
-                top_exploradores = df_explored.nlargest(10, 'actividad_exploracion')[['email', 'actividad_exploracion']]
-                top_exploradores = top_exploradores.sort_values('actividad_exploracion', ascending=True)
-                
-                fig_exploradores = px.bar(
-                    x=top_exploradores['actividad_exploracion'],
-                    y=top_exploradores['email'],
-                    orientation='h',
-                    title="Top 10 Usuarios Más Exploradores",
-                    color=top_exploradores['actividad_exploracion'],
-                    color_continuous_scale='Greens'
-                )
-                fig_exploradores.update_layout(height=400)
-                st.plotly_chart(fig_exploradores, use_container_width=True)
+            fig_exploracion = figura('tipos_exploracion', lambda: px.pie(
+                values=[estadisticas['clicks_tarjetas'], estadisticas['clicks_pins']],
+                names=['Clicks en Tarjetas', 'Clicks en Pins'],
+                title="Distribución de Tipos de Exploración",
+                color_discrete_sequence=['#FF6B6B', '#4ECDC4']
+            ))
+            st.plotly_chart(fig_exploracion, use_container_width=True)
+        
+        with col2:
+            st.subheader('Top Exploradores')
             
-        except FileNotFoundError:
-            st.error("No se encontró el archivo explored_campus_collapsed.csv")
-        except Exception as e:
-            st.error(f"Error al procesar los datos de exploración: {e}")
+            top_exploradores = exploracion['top_exploradores']
+            fig_exploradores = figura('top_exploradores', lambda: px.bar(
+                x=top_exploradores['actividad_exploracion'],
+                y=top_exploradores['email'],
+                orientation='h',
+                title="Top 10 Usuarios Más Exploradores",
+                color=top_exploradores['actividad_exploracion'],
+                color_continuous_scale='Greens'
+            ).update_layout(height=400))
+            st.plotly_chart(fig_exploradores, use_container_width=True)
+        
+    except FileNotFoundError:
+        st.error("No se encontró el archivo explored_campus_collapsed.csv")
+    except Exception as e:
+        st.error(f"Error al procesar los datos de exploración: {e}")
+
+
+# Análisis de Favoritos
+@st.fragment
+@instrumentacion.medido("seccion.favoritos")
+def seccion_favoritos():
+    if not seccion_visible('Favoritos', 'favoritos'):
+        return
+    st.subheader('Análisis de Favoritos')
+    
+    try:
+        favoritos = resultados.seccion_favoritos()
+        estadisticas = favoritos['estadisticas']
         
-        # Análisis de Favoritos
-        st.subheader('Análisis de Favoritos')
+        col1, col2, col3, col4 = st.columns(4)
         
-        try:
-            df_favorites = pd.read_csv('inputs/favorite_collapsed.csv')
+        with col1:
+            st.metric("Total Favoritos", f"{estadisticas['total_favoritos']:,}")
             
-            col1, col2, col3, col4 = st.columns(4)
+        with col2:
+            st.metric("Usuarios con Favoritos", estadisticas['usuarios_con_favoritos'])
             
-            with col1:
-                total_favoritos = df_favorites['total_favorites'].sum()
-                st.metric("Total Favoritos", f"{total_favoritos:,}")
-                
-            with col2:
-                usuarios_con_favoritos = len(df_favorites[df_favorites['total_favorites'] > 0])
-                st.metric("Usuarios con Favoritos", usuarios_con_favoritos)
-                
-            with col3:
-                promedio_favoritos = df_favorites['total_favorites'].mean()
-                st.metric("Promedio Favoritos/Usuario", f"{promedio_favoritos:.1f}")
-                
-            with col4:
-                max_favoritos = df_favorites['total_favorites'].max()
-                st.metric("Máximo Favoritos", max_favoritos)
+        with col3:
+            st.metric("Promedio Favoritos/Usuario", f"{estadisticas['promedio_favoritos']:.1f}")
+            
+        with col4:
+            st.metric("Máximo Favoritos", estadisticas['maximo_favoritos'])
+        
+        # Top usuarios con más favoritos
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader('Top Usuarios con Más Favoritos')
+            top_favoritos = favoritos['top_favoritos']
             
-            # Top usuarios con más favoritos
-            col1, col2 = st.columns(2)
+            fig_top_favoritos = figura('top_favoritos', lambda: px.bar(
+                x=top_favoritos['total_favorites'],
+                y=top_favoritos['email'],
+                orientation='h',
+                title="Top 10 Usuarios con Más Favoritos",
+                color=top_favoritos['total_favorites'],
+                color_continuous_scale='Reds'
+            ).update_layout(height=400))
+            st.plotly_chart(fig_top_favoritos, use_container_width=True)
+        
+        with col2:
+            st.subheader('Distribución de Favoritos')
             
-            with col1:
-                st.subheader('Top Usuarios con Más Favoritos')
-                top_favoritos = df_favorites.nlargest(10, 'total_favorites')[['email', 'total_favorites']]
-                top_favoritos = top_favoritos.sort_values('total_favorites', ascending=True)
-                
-                fig_top_favoritos = px.bar(
-                    x=top_favoritos['total_favorites'],
-                    y=top_favoritos['email'],
-                    orientation='h',
-                    title="Top 10 Usuarios con Más Favoritos",
-                    color=top_favoritos['total_favorites'],
-                    color_continuous_scale='Reds'
-                )
-                fig_top_favoritos.update_layout(height=400)
-                st.plotly_chart(fig_top_favoritos, use_container_width=True)
+            # Usuarios por rango de favoritos
+            distribucion = favoritos['distribucion']
             
-            with col2:
-                st.subheader('Distribución de Favoritos')
-                
-                # Crear rangos de favoritos
-                df_favorites['rango_favoritos'] = pd.cut(df_favorites['total_favorites'], 
-                                                       bins=[0, 5, 10, 20, 30, 50, 100], 
-                                                       labels=['0-5', '6-10', '11-20', '21-30', '31-50', '50+'])
-                
-                distribucion = df_favorites['rango_favoritos'].value_counts().sort_index()
-                
-                fig_distribucion = px.pie(
-                    values=distribucion.values,
-                    names=distribucion.index,
-                    title="Distribución de Usuarios por Cantidad de Favoritos"
-                )
-                st.plotly_chart(fig_distribucion, use_container_width=True)
+            fig_distribucion = figura('distribucion_favoritos', lambda: px.pie(
+                values=distribucion.values,
+                names=distribucion.index,
+                title="Distribución de Usuarios por Cantidad de Favoritos"
+            ))
+            st.plotly_chart(fig_distribucion, use_container_width=True)
+        
+    except FileNotFoundError:
+        st.error("No se encontró el archivo favorite_collapsed.csv")
+    except Exception as e:
+        st.error(f"Error al procesar los datos de favoritos: {e}")
+
+
+# Análisis geográfico de favoritos: los postulantes se agrupan en celdas en el
+# servidor y al navegador solo llega una burbuja por celda
+@st.fragment
+@instrumentacion.medido("seccion.mapa")
+def seccion_mapa():
+    if not seccion_visible('Mapa de Favoritos', 'mapa'):
+        return
+    st.subheader('Favoritos por Ubicación')
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        agrupacion = st.selectbox("Agrupar por:", list(geoagregados.AGRUPACIONES), key="agrupacion_mapa")
+    with col2:
+        zoom = st.select_slider("Zoom:", options=list(geoagregados.ZOOMS),
+                                value=geoagregados.ZOOM_POR_DEFECTO, key="zoom_mapa")
+    
+    try:
+        df_celdas = resultados.mapa_favoritos(agrupacion, zoom)
+        if df_celdas is not None:
+            fig_favoritos_mapa = figura('mapa_favoritos', lambda: px.scatter_mapbox(
+                df_celdas,
+                lat='lat',
+                lon='lng',
+                size='total_favorites',
+                color='total_favorites',
+                hover_name='celda',
+                hover_data={'postulantes': True, 'lat': False, 'lng': False},
+                zoom=zoom,
+                title="Mapa de Favoritos por Zona",
+                color_continuous_scale='Reds'
+            ).update_layout(
+                mapbox_style="open-street-map",
+                height=500
+            ), agrupacion, zoom)
+            st.plotly_chart(fig_favoritos_mapa, use_container_width=True)
+            st.caption(f"{len(df_celdas):,} celdas · {df_celdas['postulantes'].sum():,} postulantes")
+        
+    except FileNotFoundError:
+        st.error("No se encontró el archivo favorite_collapsed.csv")
+    except Exception as e:
+        st.error(f"Error al procesar los datos de favoritos: {e}")
+
+
+# Historial de Favoritos (a partir de favorite.csv y favorite_campus_history.csv)
+@st.fragment
+@instrumentacion.medido("seccion.historial_favoritos")
+def seccion_historial_favoritos():
+    if not seccion_visible('Historial de Favoritos', 'historial'):
+        return
+    st.subheader('Historial de Favoritos')
+    
+    try:
+        historial = resultados.seccion_historial_favoritos()
+        estadisticas = historial['estadisticas']
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Favoritos Vigentes", f"{estadisticas['favoritos_vigentes']:,}")
             
-            # Análisis geográfico de favoritos
-            st.subheader('Favoritos por Ubicación')
+        with col2:
+            st.metric("Colegios Favoritos", f"{estadisticas['colegios_favoritos']:,}")
             
-            if 'lat' in df_favorites.columns and 'lng' in df_favorites.columns:
-                fig_favoritos_mapa = px.scatter_mapbox(
-                    df_favorites,
-                    lat='lat',
-                    lon='lng',
-                    size='total_favorites',
-                    color='total_favorites',
-                    hover_name='formatted_address',
-                    zoom=10,
-                    title="Mapa de Favoritos por Usuario",
-                    color_continuous_scale='Reds'
-                )
-                fig_favoritos_mapa.update_layout(
-                    mapbox_style="open-street-map",
-                    height=500
-                )
-                st.plotly_chart(fig_favoritos_mapa, use_container_width=True)
+        with col3:
+            st.metric("Favoritos Agregados (historial)", f"{estadisticas['agregados']:,}")
             
-        except FileNotFoundError:
-            st.error("No se encontró el archivo favorite_collapsed.csv")
-        except Exception as e:
-            st.error(f"Error al procesar los datos de favoritos: {e}")
+        with col4:
+            st.metric("Favoritos Removidos (historial)", f"{estadisticas['removidos']:,}")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            rangos = historial['rangos']
+            fig_rangos = figura('rangos_favoritos', lambda: px.bar(
+                x=rangos.index.astype(str),
+                y=rangos.values,
+                title="Favoritos por Posición en la Lista"
+            ).update_layout(xaxis_title="Posición", yaxis_title="Favoritos", height=400))
+            st.plotly_chart(fig_rangos, use_container_width=True)
             
-    except FileNotFoundError:
-        st.error("No se encontró el archivo mixpanel_applicants_collapsed.csv")
+        with col2:
+            linea_tiempo = historial['linea_tiempo']
+            fig_linea_tiempo = figura('linea_tiempo_favoritos', lambda: px.line(
+                linea_tiempo,
+                x=linea_tiempo.index,
+                y=['agregados', 'removidos', 'subidas', 'bajadas'],
+                title="Movimientos de Favoritos por Día",
+                markers=True
+            ).update_layout(xaxis_title="Día", yaxis_title="Eventos", height=400))
+            st.plotly_chart(fig_linea_tiempo, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.write("**Sedes con más Favoritos**")
+            st.dataframe(historial['tabla_sedes'], hide_index=True)
+
+        with col2:
+            # Favoritos por área del postulante (índice de entidades); los
+            # usuarios que no están en los archivos de postulantes van en "Sin dato"
+            por_area = historial['favoritos_por_area']
+            areas = figuras.top_n(por_area.set_index('Área')['Favoritos Vigentes'])
+            fig_areas = figura('favoritos_area', lambda: px.bar(
+                x=areas.index,
+                y=areas.values,
+                title="Favoritos Vigentes por Área"
+            ).update_layout(xaxis_title="Área", yaxis_title="Favoritos", height=400, xaxis_type='category'))
+            st.plotly_chart(fig_areas, use_container_width=True)
+        
+    except FileNotFoundError as e:
+        st.error(f"No se encontró el archivo de historial de favoritos: {e.filename}")
     except Exception as e:
-        st.error(f"Error al procesar los datos de Mixpanel: {e}")
+        st.error(f"Error al procesar el historial de favoritos: {e}")
+
+
+# Horas como texto corto (minutos si es menos de una hora)
+def formato_horas(horas):
+    if horas is None:
+        return "-"
+    return f"{horas * 60:.0f} min" if horas < 1 else f"{horas:.1f} h"
+
+
+# Rotación de favoritos: altas netas, abandono, cambios de posición y tiempo
+# hasta remover, sobre el historial completo (rotacion_favoritos.py)
+@st.fragment
+@instrumentacion.medido("seccion.rotacion")
+def seccion_rotacion():
+    if not seccion_visible('Rotación de Favoritos', 'rotacion'):
+        return
+    st.subheader('Rotación de Favoritos')
+
+    try:
+        rotacion = resultados.seccion_rotacion()
+        totales = rotacion['totales']
+
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric("Favoritos Netos (historial)", f"{totales['netos']:,}")
+
+        with col2:
+            tasa = totales['tasa_abandono']
+            st.metric("Tasa de Abandono", "-" if tasa is None else f"{tasa:.1%}")
+
+        with col3:
+            volatilidad = totales['volatilidad']
+            st.metric("Cambios de Posición por Alta", "-" if volatilidad is None else f"{volatilidad:.2f}")
+
+        with col4:
+            st.metric("Mediana hasta Remover", formato_horas(totales['horas_remover_mediana']))
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            tiempo_remover = rotacion['tiempo_remover']
+            fig_tiempo = figura('tiempo_remover', lambda: px.bar(
+                x=tiempo_remover.index,
+                y=tiempo_remover.values,
+                title="Tiempo hasta Remover un Favorito"
+            ).update_layout(xaxis_title="Tiempo desde que se agregó", yaxis_title="Favoritos removidos",
+                            height=400))
+            st.plotly_chart(fig_tiempo, use_container_width=True)
+
+        with col2:
+            sedes_netas = rotacion['sedes_netas']
+            fig_netas = figura('sedes_netas', lambda: px.bar(
+                x=sedes_netas.values,
+                y=sedes_netas.index.astype(str),
+                orientation='h',
+                title="Sedes con más Favoritos Netos"
+            ).update_layout(xaxis_title="Agregados - removidos", yaxis_title="Sede", height=400,
+                            yaxis={'categoryorder': 'total ascending'}))
+            st.plotly_chart(fig_netas, use_container_width=True)
+
+        st.dataframe(rotacion['tabla_sedes'], hide_index=True)
+
+    except FileNotFoundError as e:
+        st.error(f"No se encontró el archivo de historial de favoritos: {e.filename}")
+    except Exception as e:
+        st.error(f"Error al calcular la rotación de favoritos: {e}")
+
+
+# Actividad en el tiempo: series por día u hora (particiones diarias de
+# series_tiempo.py, solo se leen las del rango) y totales por cohorte
+@st.fragment
+@instrumentacion.medido("seccion.series")
+def seccion_series():
+    if not seccion_visible('Actividad en el Tiempo', 'series'):
+        return
+    st.subheader('Actividad en el Tiempo')
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        fuente = metricas.FUENTES_SERIES[st.selectbox("Eventos:", list(metricas.FUENTES_SERIES), key="fuente_series")]
+    with col2:
+        frecuencia = metricas.FRECUENCIAS_SERIES[st.radio("Frecuencia:", list(metricas.FRECUENCIAS_SERIES),
+                                                          horizontal=True, key="frecuencia_series")]
+    with col3:
+        desglose = metricas.DESGLOSES_SERIES[st.selectbox("Desglosar por:", list(metricas.DESGLOSES_SERIES),
+                                                          key="desglose_series")]
+    with col4:
+        ventana = st.number_input("Ventana móvil (periodos):", min_value=1, max_value=30, value=1, step=1,
+                                  key="ventana_series")
+
+    try:
+        # Rango de días (por defecto todo para la serie diaria y la última
+        # semana para la horaria); solo se leen las particiones de esos días
+        dias = resultados.dias_series(fuente)
+        if dias is None:
+            st.info("No hay eventos con fecha para esta fuente.")
+            return
+        primero, ultimo = dias
+        inicio = primero if frecuencia == 'dia' else max(primero, ultimo - pd.Timedelta(days=6))
+        rango = st.date_input("Rango:", value=(inicio, ultimo), min_value=primero, max_value=ultimo,
+                              key=f"rango_series_{fuente}_{frecuencia}")
+        desde, hasta = (rango[0], rango[-1]) if rango else (inicio, ultimo)
+
+        # La serie se lee y se arma solo si la figura no está memorizada
+        def construir_series():
+            serie = resultados.seccion_series(fuente, frecuencia, desglose, desde, hasta + pd.Timedelta(days=1))
+            dimensiones = [] if desglose is None else [desglose]
+            conteos = list(series_tiempo.FUENTES[fuente]['conteos'])
+            # Una línea por cada uno de los grupos con más eventos; el resto en "Otros"
+            if desglose is not None:
+                serie = figuras.top_n_grupos(serie, desglose, conteos)
+                serie = series_tiempo.completar_periodos(serie, fuente, frecuencia, dimensiones, desde,
+                                                         hasta + pd.Timedelta(days=1))
+            if ventana > 1:
+                serie = series_tiempo.ventana_movil(serie, fuente, ventana, dimensiones)
+            larga = serie.melt(id_vars=['periodo', *dimensiones], value_vars=conteos,
+                               var_name='evento', value_name='eventos')
+            return px.line(
+                larga,
+                x='periodo',
+                y='eventos',
+                color=desglose or 'evento',
+                line_dash='evento' if desglose is not None and len(conteos) > 1 else None,
+                title="Eventos por Día" if frecuencia == 'dia' else "Eventos por Hora",
+                markers=frecuencia == 'dia'
+            ).update_layout(xaxis_title="Periodo (UTC)", yaxis_title="Eventos", height=400)
+
+        fig_series = figura('series', construir_series, fuente, frecuencia, desglose, ventana, desde, hasta)
+        st.plotly_chart(fig_series, use_container_width=True)
+
+        st.write("**Postulantes por Cohorte**")
+        st.dataframe(resultados.seccion_cohortes(), hide_index=True)
+
+    except FileNotFoundError as e:
+        st.error(f"No se encontró el archivo: {e.filename}")
+    except Exception as e:
+        st.error(f"Error al calcular la actividad en el tiempo: {e}")
+
+
+if vista == "Notas de Usuarios":
+    vista_notas()
+else:
+    st.title('Estadísticas de Uso de la Aplicación')
+    seccion_uso()
+    seccion_exploracion()
+    seccion_favoritos()
+    seccion_mapa()
+    seccion_historial_favoritos()
+    seccion_rotacion()
+    seccion_series()
+
+instrumentacion.registrar_tiempo("rerun", time.perf_counter() - inicio_rerun)
+
+# Panel de rendimiento (opcional): con ?admin=1 en la URL o JARDINES_ADMIN=1
+if st.query_params.get("admin") == "1" or os.environ.get("JARDINES_ADMIN") == "1":
+    with st.sidebar:
+        st.header("Rendimiento")
+        medicion = instrumentacion.exportar()
+        st.metric("Memoria máxima del proceso (MB)", f"{medicion['memoria_maxima_mb']:.0f}")
+
+        st.subheader("Tiempos")
+        st.dataframe(pd.DataFrame([
+            {'Medición': nombre, 'Llamadas': t['llamadas'], 'Promedio (ms)': round(t['promedio_ms'], 1),
+             'Máximo (ms)': round(t['maximo_ms'], 1), 'Última (ms)': round(t['ultimo_ms'], 1),
+             'MB': None if t['bytes'] is None else round(t['bytes'] / 2**20, 2)}
+            for nombre, t in sorted(medicion['tiempos'].items())
+        ]), hide_index=True)
+
+        st.subheader("Cachés")
+        st.dataframe(pd.DataFrame([
+            {'Caché': nombre, 'Aciertos': c['aciertos'], 'Fallos': c['fallos'],
+             'Tasa de aciertos': f"{c['tasa_aciertos']:.0%}"}
+            for nombre, c in sorted(medicion['contadores'].items())
+        ]), hide_index=True)
+
+        st.subheader("Frames en memoria")
+        st.dataframe(pd.DataFrame([
+            {'Archivo': nombre, 'MB': round(bytes_ / 2**20, 2)}
+            for nombre, bytes_ in sorted(carga_datos.memoria_residente().items())
+        ]), hide_index=True)
+
+        st.download_button("Descargar métricas (JSON)", json.dumps(medicion, indent=2),
+                           file_name="rendimiento.json", mime="application/json")
+        if st.button("Reiniciar métricas"):
+            instrumentacion.reiniciar()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Los módulos del dashboard están en la raíz del repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,26 @@
+import pytest
+
+import carga_datos
+import consultas
+import datos_sinteticos
+
+pytest.importorskip("duckdb")
+
+
+# Los seis archivos de inputs/ generados en una carpeta temporal; al terminar
+# se vuelve a la carpeta de entradas que estaba en uso
+@pytest.fixture(scope="module")
+def entradas_sinteticas(tmp_path_factory):
+    anterior = carga_datos.BASE_PATH_INPUTS
+    carpeta = tmp_path_factory.mktemp("sinteticos")
+    datos_sinteticos.generar(carpeta, aplicantes=2_000, eventos=6_000, notas=1_500, semilla=7)
+    carga_datos.usar_carpeta_entradas(carpeta)
+    yield carpeta
+    carga_datos.usar_carpeta_entradas(anterior)
+
+
+# El backend DuckDB tiene que devolver lo mismo que el de pandas en todas las
+# consultas del dashboard
+def test_backends_devuelven_lo_mismo(entradas_sinteticas):
+    diferencias = consultas.comparar_backends(consultas.ConsultasPandas(), consultas.ConsultasDuckDB())
+    assert diferencias == [], "\n".join(diferencias)
@@ -0,0 +1,173 @@
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Contenido de las notas: la columna `data` del export de mongo trae el repr de
+# Python de un dict ({'content': 'texto'}). Acá se parsea una sola vez por
+# versión del archivo y se indexa el texto para buscar por palabra.
+
+# Clave del texto de la nota dentro del payload
+CLAVE_CONTENIDO = "content"
+
+# Forma habitual del payload: solo el contenido, sin escapes (comillas simples,
+# o dobles si el texto tiene un apóstrofo)
+_SOLO_CONTENIDO = re.compile(r"""^\{'content': (?:'([^'\\]*)'|"([^"\\]*)")\}$""")
+
+# Separador de palabras (todo lo que no es letra, número ni _)
+_SEPARADOR = r"[^\pL\pN_]+"
+
+# Sobre esta fracción de notas candidatas el índice no ayuda: se recorren todas
+_MAXIMO_CANDIDATAS = 0.25
+_SELECTIVIDAD = 8
+
+# Último carácter posible: cota superior para buscar prefijos en el vocabulario
+_MAXIMO = "\U0010ffff"
+
+
+def _literal(texto):
+    try:
+        valor = ast.literal_eval(texto)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        valor = None
+    # Si no es un dict, el texto completo queda como contenido
+    return valor if isinstance(valor, dict) else {CLAVE_CONTENIDO: texto}
+
+
+# Palabras de cada texto (arreglo Arrow) y la fila de la que sale cada una.
+# Textos y consultas se separan con esta misma función.
+def _palabras(textos):
+    listas = pc.split_pattern_regex(textos, _SEPARADOR)
+    palabras = pc.list_flatten(listas)
+    filas = pc.list_parent_indices(listas)
+    no_vacias = pc.not_equal(palabras, "")
+    return palabras.filter(no_vacias), filas.filter(no_vacias)
+
+
+def _columna(valores):
+    serie = pd.Series(valores, dtype=object).convert_dtypes()
+    return serie.astype("string") if serie.dtype == object else serie
+
+
+# Payloads parseados: una columna por clave (el contenido primero), con el
+# índice de la serie original. Se parsea cada payload distinto una sola vez:
+# los de la forma habitual con una expresión regular sobre todos a la vez y el
+# resto con ast.literal_eval (nunca eval).
+def parsear_payloads(serie):
+    codigos, distintos = pd.factorize(serie.astype("string"))
+    simples = pd.Series(distintos, dtype="string").str.extract(_SOLO_CONTENIDO)
+    contenido = simples[0].fillna(simples[1])
+    otros = contenido.isna().to_numpy()
+    registros = [_literal(texto) for texto in distintos[otros]]
+
+    claves = [CLAVE_CONTENIDO]
+    for registro in registros:
+        claves.extend(c for c in registro if c not in claves)
+    columnas = {}
+    for clave in claves:
+        valores = np.full(len(distintos), None, dtype=object)
+        if clave == CLAVE_CONTENIDO:
+            valores[~otros] = contenido[~otros].to_numpy(dtype=object)
+        valores[otros] = pd.Series([registro.get(clave) for registro in registros], dtype=object).to_numpy()
+        columnas[clave] = _columna(valores)
+    # Código -1 (payload vacío): fila sin valores
+    parseados = pd.DataFrame(columnas).reindex(codigos)
+    parseados.index = serie.index
+    return parseados
+
+
+# Índice invertido del texto de las notas: para cada palabra (en minúsculas),
+# las posiciones de las notas que la contienen, todas en un solo arreglo
+# (las de la palabra i van de inicio[i] a inicio[i + 1]). Una búsqueda de
+# texto libre se resuelve con las palabras de la consulta y luego se verifica
+# la subcadena exacta solo en esas candidatas, así el resultado es el mismo
+# que str.contains sobre todo el texto.
+class IndiceTexto:
+    def __init__(self, textos):
+        self.textos = textos.astype("string").str.lower().reset_index(drop=True)
+        palabras, filas = _palabras(pa.array(self.textos, type=pa.large_string()))
+        vocabulario = pc.unique(palabras)
+        vocabulario = vocabulario.take(pc.sort_indices(vocabulario))
+        codigos = pc.index_in(palabras, value_set=vocabulario).to_numpy().astype(np.int64)
+        # Pares (palabra, fila) ordenados y sin repetir
+        pares = np.sort(codigos * max(len(self.textos), 1) + filas.to_numpy())
+        nuevos = np.ones(len(pares), dtype=bool)
+        nuevos[1:] = pares[1:] != pares[:-1]
+        pares = pares[nuevos]
+        terminos, self._posiciones = np.divmod(pares, max(len(self.textos), 1))
+        self._inicio = np.searchsorted(terminos, np.arange(len(vocabulario) + 1))
+        self._vocabulario = pd.Series(vocabulario.to_pylist(), dtype="string")
+        self.vocabulario = self._vocabulario.to_numpy(dtype=object)
+
+    def __len__(self):
+        return len(self.textos)
+
+    # Cantidad de posiciones de un conjunto de palabras (selectividad)
+    def _tamaño(self, terminos):
+        return int((self._inicio[terminos + 1] - self._inicio[terminos]).sum())
+
+    # Notas que contienen alguna de las palabras (posiciones ordenadas)
+    def _union(self, terminos):
+        inicios = self._inicio[terminos]
+        largos = self._inicio[terminos + 1] - inicios
+        total = int(largos.sum())
+        indices = np.repeat(inicios - np.cumsum(largos) + largos, largos) + np.arange(total)
+        mascara = np.zeros(len(self.textos), dtype=bool)
+        mascara[self._posiciones[indices]] = True
+        return np.flatnonzero(mascara)
+
+    def _donde(self, mascara):
+        return np.flatnonzero(mascara.to_numpy(dtype=bool, na_value=False))
+
+    def _prefijo(self, prefijo):
+        desde = np.searchsorted(self.vocabulario, prefijo, side="left")
+        hasta = np.searchsorted(self.vocabulario, prefijo + _MAXIMO, side="left")
+        return np.arange(desde, hasta)
+
+    def _exacta(self, palabra):
+        indice = np.searchsorted(self.vocabulario, palabra)
+        existe = indice < len(self.vocabulario) and self.vocabulario[indice] == palabra
+        return np.array([indice] if existe else [], dtype=np.intp)
+
+    # Posiciones candidatas para la consulta (en minúsculas), o None si conviene
+    # recorrer todas las notas (la consulta no tiene palabras o son demasiado
+    # comunes). Una subcadena del texto contiene sus palabras del medio
+    # completas; la primera es final de una palabra y la última, comienzo.
+    def candidatas(self, consulta):
+        palabras = _palabras(pa.array([consulta], type=pa.large_string()))[0].to_pylist()
+        if not palabras:
+            return None
+        if len(palabras) == 1:
+            grupos = [self._donde(self._vocabulario.str.contains(palabras[0], regex=False))]
+        else:
+            grupos = [self._donde(self._vocabulario.str.endswith(palabras[0])), self._prefijo(palabras[-1])]
+            grupos.extend(self._exacta(palabra) for palabra in palabras[1:-1])
+        grupos.sort(key=self._tamaño)
+        if self._tamaño(grupos[0]) > len(self.textos) * _MAXIMO_CANDIDATAS:
+            return None
+        candidatas = None
+        for grupo in grupos:
+            # Cruzar con un grupo mucho más grande que las candidatas cuesta
+            # más que verificarlas directamente
+            if candidatas is not None and self._tamaño(grupo) > len(candidatas) * _SELECTIVIDAD:
+                break
+            posiciones = self._union(grupo)
+            candidatas = posiciones if candidatas is None else np.intersect1d(candidatas, posiciones,
+                                                                             assume_unique=True)
+            if not len(candidatas):
+                break
+        return candidatas
+
+    # Posiciones (ordenadas, dentro de las dadas) cuyo texto contiene la consulta
+    def buscar(self, consulta, posiciones=None):
+        consulta = consulta.lower()
+        candidatas = self.candidatas(consulta)
+        if candidatas is None:
+            candidatas = np.arange(len(self.textos)) if posiciones is None else posiciones
+        elif posiciones is not None:
+            candidatas = np.intersect1d(posiciones, candidatas, assume_unique=True)
+        coincide = self.textos.iloc[candidatas].str.contains(consulta, regex=False)
+        return candidatas[coincide.to_numpy(dtype=bool, na_value=False)]
@@ -0,0 +1,287 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+import carga_datos
+import esquemas
+
+logger = logging.getLogger(__name__)
+
+# Validación de las entradas antes de cargarlas: con el encabezado y una
+# muestra de las primeras filas se revisa que cada archivo traiga las columnas
+# declaradas en esquemas.ESQUEMAS, que los valores se puedan convertir a sus
+# tipos y que las columnas con "nulos_maximos" no pasen de esa fracción de
+# vacíos; las "claves" se leen completas (solo esas columnas) para revisar que
+# no se repitan. Columnas no declaradas son solo un aviso.
+#
+# Se valida una vez por versión (hash) de cada archivo: el resultado se guarda
+# en inputs/almacen/validacion/ junto al hash. Un archivo inválido no se carga
+# (carga_datos lanza EntradaInvalida antes de leerlo, refresco.py sigue
+# sirviendo la versión anterior y precalculo.py no genera el paquete) y se
+# copia a inputs/cuarentena/ para revisarlo:
+#
+#     python validacion.py
+
+MUESTRA_FILAS = 10_000
+CARPETA_CUARENTENA = "cuarentena"
+
+# Textos que pandas lee como booleanos en las columnas "bool"
+_BOOLEANOS = {"True", "False", "true", "false", "TRUE", "FALSE", "1", "0"}
+
+
+# errores: lo que impide cargar el archivo; avisos: diferencias que no
+# afectan al dashboard (columnas nuevas)
+@dataclass(frozen=True)
+class ResultadoValidacion:
+    nombre: str
+    hash: str
+    validado: str
+    filas_muestra: int
+    errores: tuple
+    avisos: tuple
+
+    @property
+    def valido(self):
+        return not self.errores
+
+
+class EntradaInvalida(ValueError):
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        super().__init__("; ".join(
+            f"{r.nombre} no cumple el esquema: {', '.join(r.errores)}" for r in self.resultados
+        ))
+
+
+def carpeta_validacion():
+    return carga_datos.BASE_PATH_ALMACEN / "validacion"
+
+
+def carpeta_cuarentena():
+    return carga_datos.BASE_PATH_INPUTS / CARPETA_CUARENTENA
+
+
+# Valores de la muestra que no se pueden convertir al tipo declarado. La
+# muestra se lee con la inferencia de tipos del parser: si una columna ya salió
+# numérica (o booleana) no hay que revisar valor por valor.
+def _invalidos(serie, tipo, zona=None):
+    presentes = serie.dropna()
+    if tipo == "fecha":
+        convertidos = pd.to_datetime(presentes.astype("string"), format="ISO8601", utc=zona == "UTC",
+                                     errors="coerce")
+        return presentes[convertidos.isna()]
+    if tipo == "bool":
+        if pd.api.types.is_bool_dtype(presentes):
+            return presentes.iloc[:0]
+        return presentes[~presentes.astype("string").isin(_BOOLEANOS)]
+    if tipo in ("int64", "Int64", "float64"):
+        if pd.api.types.is_numeric_dtype(presentes):
+            numeros = presentes
+            malos = pd.Series(False, index=presentes.index)
+        else:
+            numeros = pd.to_numeric(presentes.astype("string"), errors="coerce")
+            malos = numeros.isna()
+        if tipo != "float64" and pd.api.types.is_float_dtype(numeros):
+            malos |= numeros.notna() & (numeros % 1 != 0)
+        return presentes[malos]
+    return presentes.iloc[:0]
+
+
+def _ejemplos(valores):
+    return ", ".join(repr(v) for v in valores.unique()[:3])
+
+
+# Revisar un archivo de inputs/ (sin cargarlo completo)
+def validar_archivo(nombre, ruta, hash_csv):
+    esquema = esquemas.ESQUEMAS.get(nombre, {})
+    errores, avisos = [], []
+    try:
+        muestra = pd.read_csv(ruta, nrows=MUESTRA_FILAS, low_memory=False)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        muestra = pd.DataFrame()
+        errores.append(f"no se pudo leer el CSV ({e})")
+    if not errores:
+        requeridas = esquemas.columnas_requeridas(nombre)
+        faltantes = [c for c in requeridas if c not in muestra.columns]
+        if faltantes:
+            errores.append(f"faltan las columnas {faltantes}")
+        declaradas = {*requeridas, *esquema.get("descartar", [])}
+        nuevas = [c for c in muestra.columns if c not in declaradas]
+        if nuevas and esquema:
+            avisos.append(f"columnas no declaradas {nuevas}")
+        if muestra.empty:
+            errores.append("no tiene filas")
+
+        tipos = {c: t for c, t in esquema.get("tipos", {}).items() if c in requeridas and c in muestra.columns}
+        tipos.update({c: "fecha" for c in esquema.get("fechas", {}) if c in muestra.columns})
+        for columna, tipo in tipos.items():
+            # int64 y bool no admiten vacíos al leer (Int64 sí)
+            if tipo in ("int64", "bool") and muestra[columna].isna().any():
+                errores.append(f"{columna}: vacíos en una columna {tipo}")
+            malos = _invalidos(muestra[columna], tipo, esquema.get("fechas", {}).get(columna))
+            if len(malos):
+                errores.append(f"{columna}: {len(malos)} valores no son {tipo} ({_ejemplos(malos)})")
+
+        for columna, maximo in esquema.get("nulos_maximos", {}).items():
+            if columna in muestra.columns and len(muestra):
+                fraccion = muestra[columna].isna().mean()
+                if fraccion > maximo:
+                    errores.append(f"{columna}: {fraccion:.1%} vacíos (máximo {maximo:.0%})")
+
+        claves = [c for c in esquema.get("claves", []) if c in muestra.columns]
+        if claves and len(muestra):
+            completas = pd.read_csv(ruta, usecols=claves, dtype=str, engine="pyarrow")
+            repetidas = int(completas.dropna().duplicated().sum())
+            if repetidas:
+                errores.append(f"{repetidas} filas con clave {claves} repetida")
+
+    return ResultadoValidacion(
+        nombre=nombre, hash=hash_csv, validado=datetime.now(timezone.utc).isoformat(),
+        filas_muestra=len(muestra), errores=tuple(errores), avisos=tuple(avisos),
+    )
+
+
+# Escribir el JSON de un resultado con un temporal propio: validan a la vez
+# los procesos de paralelo.py y el hilo de refresco
+def _escribir_resultado(resultado, ruta):
+    with tempfile.NamedTemporaryFile("w", dir=ruta.parent, suffix=".tmp", delete=False,
+                                     encoding="utf-8") as f:
+        json.dump(asdict(resultado), f, indent=2, ensure_ascii=False)
+    os.replace(f.name, ruta)
+
+
+def guardar_resultado(resultado, carpeta):
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    _escribir_resultado(resultado, carpeta / f"{resultado.nombre}.json")
+
+
+# Resultado guardado de un archivo; None si no hay o es de otra versión
+def cargar_resultado(nombre, carpeta, hash_csv):
+    archivo = Path(carpeta) / f"{nombre}.json"
+    if not archivo.exists():
+        return None
+    datos = json.loads(archivo.read_text())
+    if datos["hash"] != hash_csv:
+        return None
+    return ResultadoValidacion(**{**datos, "errores": tuple(datos["errores"]), "avisos": tuple(datos["avisos"])})
+
+
+# Copia del archivo inválido (y su resultado) en inputs/cuarentena/
+def poner_en_cuarentena(resultado, ruta):
+    carpeta = carpeta_cuarentena()
+    carpeta.mkdir(parents=True, exist_ok=True)
+    destino = carpeta / f"{Path(ruta).stem}.{resultado.hash[:12]}{Path(ruta).suffix}"
+    if not destino.exists():
+        with tempfile.NamedTemporaryFile(dir=carpeta, suffix=".tmp", delete=False) as f:
+            temporal = f.name
+        shutil.copy2(ruta, temporal)
+        os.replace(temporal, destino)
+    _escribir_resultado(resultado, destino.with_suffix(".json"))
+    return destino
+
+
+# resultados: (nombre, hash) -> ResultadoValidacion, por proceso; un lock por
+# archivo para que dos hilos no validen la misma versión a la vez
+_resultados = {}
+_locks = {}
+_lock = threading.Lock()
+
+
+# Resultado de un archivo en la versión dada por su hash (se valida una sola
+# vez por versión; los inválidos se ponen en cuarentena)
+def resultado(nombre, ruta, hash_csv):
+    with _lock:
+        lock = _locks.setdefault(nombre, threading.Lock())
+    with lock:
+        return _resultado(nombre, ruta, hash_csv)
+
+
+def _resultado(nombre, ruta, hash_csv):
+    en_cache = _resultados.get((nombre, hash_csv))
+    if en_cache is not None:
+        return en_cache
+    en_cache = cargar_resultado(nombre, carpeta_validacion(), hash_csv)
+    if en_cache is None:
+        en_cache = validar_archivo(nombre, ruta, hash_csv)
+        guardar_resultado(en_cache, carpeta_validacion())
+        if not en_cache.valido:
+            destino = poner_en_cuarentena(en_cache, ruta)
+            logger.error("%s no cumple el esquema (copia en %s): %s", nombre, destino, "; ".join(en_cache.errores))
+        for aviso in en_cache.avisos:
+            logger.warning("%s: %s", nombre, aviso)
+    _resultados[(nombre, hash_csv)] = en_cache
+    return en_cache
+
+
+# Lanzar EntradaInvalida si el archivo en esta versión no es válido
+def exigir_valida(nombre, ruta, hash_csv):
+    validado = resultado(nombre, ruta, hash_csv)
+    if not validado.valido:
+        raise EntradaInvalida([validado])
+    return validado
+
+
+# Resultados de las entradas con estas huellas (ruta -> huella; por defecto
+# las actuales)
+def validar_entradas(fijadas=None):
+    if fijadas is None:
+        fijadas = carga_datos.huellas_actuales()
+    return {Path(ruta).name: resultado(Path(ruta).name, ruta, huella[3]) for ruta, huella in fijadas.items()}
+
+
+# Lanzar EntradaInvalida si alguna de las entradas no es válida
+def exigir_validas(fijadas=None):
+    resultados = validar_entradas(fijadas)
+    invalidos = [r for r in resultados.values() if not r.valido]
+    if invalidos:
+        raise EntradaInvalida(invalidos)
+    return resultados
+
+
+# Resultados de las entradas que se están sirviendo (las de la versión publicada)
+def validar_servidas():
+    resultados = {}
+    for nombre in carga_datos.ARCHIVOS_ENTRADA:
+        ruta = carga_datos.ruta_entrada(nombre)
+        try:
+            huella = carga_datos.huella_servida(ruta)
+        except FileNotFoundError:
+            continue
+        resultados[nombre] = resultado(nombre, ruta, huella[3])
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida inputs/*.csv contra los esquemas declarados")
+    parser.add_argument("--datos", help="carpeta con los seis CSV (por defecto inputs/)")
+    args = parser.parse_args(argv)
+    if args.datos:
+        carga_datos.usar_carpeta_entradas(Path(args.datos))
+    resultados = validar_entradas()
+    for nombre in carga_datos.ARCHIVOS_ENTRADA:
+        if nombre not in resultados:
+            print(f"{nombre}: no encontrado")
+            continue
+        validado = resultados[nombre]
+        print(f"{nombre}: {'válido' if validado.valido else 'INVÁLIDO'} ({validado.filas_muestra:,} filas de muestra)")
+        for linea in validado.errores:
+            print(f"  error: {linea}")
+        for linea in validado.avisos:
+            print(f"  aviso: {linea}")
+    faltantes = len(carga_datos.ARCHIVOS_ENTRADA) - len(resultados)
+    return 1 if faltantes or any(not r.valido for r in resultados.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import subprocess
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import carga_datos
+import instrumentacion
+
+# Versión de los datos servidos y frescura de cada archivo de inputs/.
+# La fecha del último commit de cada archivo se pide a git una sola vez por
+# versión de datos (no en cada rerun); entre cambios, consultar la versión
+# cuesta un stat() por archivo.
+
+
+@dataclass(frozen=True)
+class FrescuraArchivo:
+    nombre: str
+    existe: bool
+    hash: str = None
+    tamaño: int = None
+    modificado: datetime = None   # mtime del archivo servido (UTC)
+    commit: datetime = None       # fecha del último commit que lo tocó
+    error_git: str = None
+
+    # Fecha a mostrar: la del commit si git la conoce, si no la del archivo
+    @property
+    def fecha(self):
+        return self.commit or self.modificado
+
+    @property
+    def origen(self):
+        if self.commit is not None:
+            return "git"
+        return "archivo" if self.modificado is not None else None
+
+
+# clave: hashes de las entradas servidas (None si falta el archivo); sirve de
+# clave de invalidación para cualquier caché que dependa de los datos
+@dataclass(frozen=True)
+class VersionDatos:
+    clave: tuple
+    archivos: dict
+
+    def archivo(self, nombre):
+        return self.archivos[nombre]
+
+
+@instrumentacion.medido("git.log")
+def _fecha_commit(ruta):
+    resultado = subprocess.run(
+        ['git', 'log', '-1', '--format=%cd', '--date=iso-strict', '--', ruta.name],
+        cwd=ruta.parent, capture_output=True, text=True, check=True,
+    )
+    texto = resultado.stdout.strip()
+    return datetime.fromisoformat(texto) if texto else None
+
+
+def _frescura(nombre, huella, en_disco):
+    if huella is None:
+        return FrescuraArchivo(nombre, existe=False)
+    ruta = carga_datos.ruta_entrada(nombre)
+    commit, error_git = None, None
+    # La fecha de git describe el archivo en disco: solo vale si es el servido
+    if en_disco is not None and en_disco[3] == huella[3]:
+        try:
+            commit = _fecha_commit(ruta)
+            if commit is None:
+                error_git = f"Git log no retornó fecha para {nombre}."
+        except FileNotFoundError:
+            error_git = "Comando 'git' no encontrado en el servidor."
+        except subprocess.CalledProcessError as e:
+            error_git = f"Error al ejecutar comando Git: {e}"
+    return FrescuraArchivo(
+        nombre, existe=True, hash=huella[3], tamaño=huella[2],
+        modificado=datetime.fromtimestamp(huella[1] / 1e9, tz=timezone.utc),
+        commit=commit, error_git=error_git,
+    )
+
+
+def _huella(funcion, nombre):
+    try:
+        return funcion(carga_datos.ruta_entrada(nombre))
+    except FileNotFoundError:
+        return None
+
+
+_version = None
+_lock = threading.Lock()
+
+
+# Versión actual (se recalcula solo cuando cambia alguna huella servida o en disco)
+def version_datos():
+    global _version
+    servidas = {n: _huella(carga_datos.huella_servida, n) for n in carga_datos.ARCHIVOS_ENTRADA}
+    en_disco = {n: _huella(carga_datos.huella_archivo, n) for n in carga_datos.ARCHIVOS_ENTRADA}
+    clave_cache = (tuple(servidas.values()), tuple(en_disco.values()))
+    with _lock:
+        if _version is not None and _version[0] == clave_cache:
+            instrumentacion.acierto("version_datos")
+            return _version[1]
+        instrumentacion.fallo("version_datos")
+        version = VersionDatos(
+            clave=tuple(None if h is None else h[3] for h in servidas.values()),
+            archivos={n: _frescura(n, servidas[n], en_disco[n]) for n in carga_datos.ARCHIVOS_ENTRADA},
+        )
+        _version = (clave_cache, version)
+        return version